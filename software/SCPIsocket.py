@@ -1,7 +1,10 @@
 import socket
 import struct
 import time
+from collections import deque
+import json
 import numpy as np
+from profiler import profiler
 
 class DataSocket:
     """
@@ -17,9 +20,19 @@ class DataSocket:
     def __init__(self):
         self.runthethread = None
         self.issending = False
+        self.connected = False
+        # Events acquired since the client last asked, so it sees every event and not just the displayed one
+        self.frames = deque(maxlen=256)
 
-    def data_seqnum(self):
-        return self.hspro.state.nevents.to_bytes(4, "little")
+    def queue_event(self, xydata):
+        """Called by the main window for every decoded event while a client is connected."""
+        if not self.connected: return
+        s = self.hspro.state
+        self.frames.append({'seqnum': s.nevents, 'ydata': xydata.y.copy(), 'totdistcorr': list(s.totdistcorr)})
+
+    def data_seqnum(self, frame=None):
+        seqnum = self.hspro.state.nevents if frame is None else frame['seqnum']
+        return seqnum.to_bytes(4, "little")
 
     def data_numchan(self):
         s = self.hspro.state
@@ -39,14 +52,20 @@ class DataSocket:
     def data_wfms_per_s(self):
         return struct.pack('d', self.hspro.state.lastrate)
 
-    def data_channel(self, chan_index):
+    def data_channel(self, chan_index, frame=None):
         s = self.hspro.state
         hspro_chan_index = chan_index
         board = hspro_chan_index // s.num_chan_per_board
-        memdepth = self.hspro.xydata[hspro_chan_index][1].size
+        if frame is None:
+            ydata = self.hspro.xydata.y[hspro_chan_index]
+            totdistcorr = s.totdistcorr[board]
+        else:
+            ydata = frame['ydata'][hspro_chan_index]
+            totdistcorr = frame['totdistcorr'][board]
+        memdepth = ydata.size
         scale = s.max_y / pow(2, 15)
         offset = 0.0
-        trigphase = -s.totdistcorr[board] * 1e6 * s.nsunits  # convert to fs
+        trigphase = -totdistcorr * 1e6 * s.nsunits  # convert to fs
 
         res = bytearray([chan_index])
         res += memdepth.to_bytes(8, "little")
@@ -56,7 +75,7 @@ class DataSocket:
         res += bytearray([0])  # Clipping
 
         # Package the waveform samples as 16-bit signed integers
-        waveform_data = self.hspro.xydata[hspro_chan_index][1] / scale
+        waveform_data = ydata / scale
         if self.hspro.state.dotwochannel[board]: # set second half to 0 since it's stale old data from single channel mode
             midpoint = len(waveform_data) // 2
             waveform_data[midpoint:] = 0
@@ -86,11 +105,16 @@ class DataSocket:
                     if conn:
                         with conn:
                             print(f"SCPI: Connected by {addr}")
-                            while self.runthethread:
-                                data = conn.recv(1024)
-                                if not data:
-                                    break  # Client disconnected
-                                self.handle_commands(conn, data)
+                            self.frames.clear()
+                            self.connected = True
+                            try:
+                                while self.runthethread:
+                                    data = conn.recv(1024)
+                                    if not data:
+                                        break  # Client disconnected
+                                    self.handle_commands(conn, data)
+                            finally:
+                                self.connected = False
             except (ConnectionResetError, BrokenPipeError):
                 print("SCPI: Connection closed by remote host.")
             except OSError as e:
@@ -113,21 +137,24 @@ class DataSocket:
                 while s.isdrawing: time.sleep(0.001)
                 self.issending = True
 
+                # Send the oldest queued event, or the current one if the client is keeping up
+                frame = self.frames.popleft() if self.frames else None
+
                 num_channels_val = s.num_board * s.num_chan_per_board
                 num_channels_bytes = num_channels_val.to_bytes(2, "little")
 
                 payload = bytearray()
-                payload += self.data_seqnum()
+                payload += self.data_seqnum(frame)
                 payload += num_channels_bytes
                 payload += self.data_fspersample()
                 payload += self.data_triggerpos()
                 payload += self.data_wfms_per_s()
                 for c in range(num_channels_val):
-                    payload += self.data_channel(c)
+                    payload += self.data_channel(c, frame)
                 conn.sendall(payload)
 
                 self.issending = False
-                s.nevents += 1
+                if frame is None: s.nevents += 1
 
             elif com_str == '*IDN?':
                 conn.sendall(b"DrAndyHaas,HaasoscopePro,v1.0,2025\n")
@@ -157,3 +184,29 @@ class DataSocket:
                 if not s.isrolling: self.hspro.rolling_clicked()
                 if not s.getone: self.hspro.single_clicked()
                 if s.paused: self.hspro.dostartstop()
+
+            elif com_str == 'PROFILE?':
+                # Timing statistics per pipeline stage: name,count,mean_ms,p50_ms,p99_ms,max_ms records separated by ;
+                conn.sendall((profiler.summary_text().replace("\n", ";") + "\n").encode('utf-8'))
+
+            elif com_str == 'PROFILE:TRACE?':
+                # The recent spans as Chrome trace JSON, on one line
+                conn.sendall((json.dumps(profiler.chrome_trace()) + "\n").encode('utf-8'))
+
+            elif com_str == 'PROFILE:ON':
+                profiler.enabled = True
+
+            elif com_str == 'PROFILE:OFF':
+                profiler.enabled = False
+
+            elif com_str == 'PROFILE:RESET':
+                profiler.reset()
+
+            elif com_str == 'MEASURE:STATS?':
+                # Statistics of each measurement since its last reset: name,channel,count,last,mean,std,min,max,p50,p99
+                # records separated by ;
+                text = self.hspro.measurements.statistics_text()
+                conn.sendall((text.replace("\n", ";") + "\n").encode('utf-8'))
+
+            elif com_str == 'MEASURE:STATS:RESET':
+                self.hspro.measurements.reset_statistics()
@@ -2,6 +2,8 @@
 Provides a low-level wrapper around the ftd2xx library for communicating
 with an FTDI FT232H chip in Synchronous 245 FIFO mode.
 """
+import ctypes
+
 try:
     import ftd2xx
 
@@ -10,6 +12,13 @@ except ImportError:
     ftd2xx = None
     FTD2XX_IMPORTED = False
 
+try:
+    # Low-level FT_Read binding, so we can read straight into a caller-owned buffer
+    from ftd2xx.ftd2xx import _ft as _ftd2xx_lib, call_ft as _ftd2xx_call
+except ImportError:
+    _ftd2xx_lib = None
+    _ftd2xx_call = None
+
 
 def open_ft_usb_device(device_name: str, serial: bytes) -> tuple:
     """
@@ -52,6 +61,7 @@ class UsbFt232hSync245mode:
             serial (bytes): The serial number of the device.
         """
         self.beta = None
+        self.access_guard = None  # Set by HardwareController to serialize access with the acquisition thread
         self._usb, message = open_ft_usb_device(device_name, serial)
         print(message)
 
@@ -102,6 +112,7 @@ class UsbFt232hSync245mode:
         Returns:
             int: The total number of bytes sent.
         """
+        if self.access_guard: self.access_guard.claim()
         return self._usb.write(data)
 
     def recv(self, recv_len: int) -> bytes:
@@ -111,4 +122,32 @@ class UsbFt232hSync245mode:
         Returns:
             bytes: The received data.
         """
+        if self.access_guard: self.access_guard.claim()
         return self._usb.read(recv_len)
+
+    def recv_into(self, buffer, recv_len: int = None) -> int:
+        """
+        Receives data from the device directly into a writable buffer (e.g. a reusable bytearray),
+        without allocating a new bytes object per read.
+
+        Args:
+            buffer: A writable buffer at least recv_len bytes long.
+            recv_len (int): Number of bytes to read, defaults to the size of the buffer.
+
+        Returns:
+            int: The number of bytes received, fewer than recv_len on timeout.
+        """
+        if self.access_guard: self.access_guard.claim()
+        view = memoryview(buffer).cast('B')
+        if recv_len is None: recv_len = len(view)
+        if _ftd2xx_lib is None:
+            data = self._usb.read(recv_len)
+            view[:len(data)] = data
+            return len(data)
+        b_read = _ftd2xx_lib.DWORD()
+        cbuf = (ctypes.c_char * recv_len).from_buffer(view)
+        try:
+            _ftd2xx_call(_ftd2xx_lib.FT_Read, self._usb.handle, cbuf, recv_len, ctypes.byref(b_read))
+        finally:
+            del cbuf  # release the export on the buffer
+        return b_read.value
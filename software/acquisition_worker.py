@@ -0,0 +1,195 @@
+# acquisition_worker.py
+
+import threading
+import time
+from collections import deque
+from pyqtgraph.Qt import QtCore
+
+
+class UsbAccessGuard:
+    """
+    Serializes USB access between the acquisition worker and the GUI thread.
+
+    The worker holds the lock for a whole get_event() transaction. The GUI thread claims it
+    on its first send/recv and keeps it until control returns to the Qt event loop, so a
+    slot's whole command sequence (including replies) is never interleaved with event readout.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._gui_holds = False
+
+    def claim(self):
+        """Called from send/recv on every USB handle. Only has an effect on the GUI thread."""
+        if self._gui_holds or threading.current_thread() is not threading.main_thread():
+            return
+        self.lock.acquire()
+        self._gui_holds = True
+        QtCore.QTimer.singleShot(0, self._release)
+
+    def _release(self):
+        if self._gui_holds:
+            self._gui_holds = False
+            self.lock.release()
+
+
+class RxBufferPool:
+    """
+    Reusable receive buffers for one board, filled in place by usb.recv_into().
+
+    Buffers stay owned by a RawEvent until the GUI has decoded it and hands them back with
+    release(), so in steady state event readout allocates nothing. Buffers of a stale size
+    (after a depth change) are dropped rather than reused.
+    """
+
+    def __init__(self, max_free=16):
+        self.free = []
+        self.max_free = max_free
+        self.lock = threading.Lock()
+
+    def acquire(self, size):
+        with self.lock:
+            while self.free:
+                buf = self.free.pop()
+                if len(buf) == size:
+                    return buf
+        return bytearray(size)
+
+    def release(self, buf):
+        with self.lock:
+            if len(self.free) < self.max_free:
+                self.free.append(buf)
+
+
+class RawEvent:
+    """
+    A raw event as read from the boards, plus the per-event state the decoder needs: the EventReadout
+    that came with it from get_event(), which is passed to the decoder rather than put into the state.
+    """
+    __slots__ = ('data_map', 'rx_len', 'timestamp', 'config', 'readout', 'distcorr', 'totdistcorr', 'settings')
+
+    def __init__(self, data_map, rx_len, readout, state):
+        self.data_map = data_map
+        self.rx_len = rx_len
+        self.timestamp = time.time()
+        self.config = acquisition_config(state)
+        self.readout = readout
+        self.distcorr = None  # The trigger stabilizer state and decode settings, only kept for history events
+        self.totdistcorr = None
+        self.settings = None
+
+    def for_history(self, state, settings):
+        """
+        A copy for the history buffer, to be re-decoded when it's selected. It owns its payloads, since
+        the readout buffers go back to the pool, and also keeps the trigger stabilizer state the decoder
+        is about to start from and the decode settings (see data_processor.decode_settings) it is about
+        to be decoded with. Call right before decoding.
+        """
+        event = RawEvent.__new__(RawEvent)
+        event.data_map = {board: bytes(data) for board, data in self.data_map.items()}
+        event.rx_len = self.rx_len
+        event.timestamp = self.timestamp
+        event.config = self.config
+        event.readout = self.readout
+        event.distcorr = list(state.distcorr)
+        event.totdistcorr = list(state.totdistcorr)
+        event.settings = settings
+        return event
+
+    @property
+    def nbytes(self):
+        return sum(len(data) for data in self.data_map.values())
+
+
+def acquisition_config(state):
+    """The settings that determine the layout of a raw event; events from another config can't be decoded."""
+    return (state.expect_samples, state.expect_samples_extra, tuple(state.dotwochannel),
+            state.downsamplemerging, state.downsamplefactor)
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    Keeps arming and reading the boards on its own thread, pushing RawEvents into a bounded ring.
+
+    The GUI drains the ring with pop_all(). When the ring is full the worker waits, so every
+    acquired event reaches the consumer (recorder, history, SCPI) even if the display skips it.
+    """
+
+    def __init__(self, controller, state, ring_size=64):
+        super().__init__(daemon=True)
+        self.controller = controller
+        self.state = state
+        self.ring = deque()
+        self.ring_size = ring_size
+        self.cond = threading.Condition()
+        self.running = True
+        self.error = None  # (title, message) of a fatal readout error, reported by the GUI thread
+
+    def run(self):
+        s = self.state
+        while self.running:
+            if s.paused or self.error is not None or (s.getone and self.ring):
+                time.sleep(0.01)
+                continue
+            with self.cond:
+                while self.running and len(self.ring) >= self.ring_size:
+                    self.cond.wait(0.1)
+            if not self.running:
+                break
+            try:
+                with self.controller.usb_guard.lock:
+                    if s.paused:
+                        continue
+                    if s.skip_next_event:
+                        # Get and discard the next event to avoid glitches after a mode change
+                        s.skip_next_event = False
+                        self.controller.get_event()
+                        self.clear()
+                        continue
+                    raw_data_map, rx_len, readout = self.controller.get_event()
+                    if self.controller.got_exception:
+                        self.error = ("Hardware Communication Exception",
+                                      "Got an exception when fetching event data.\n\n"
+                                      "Please check the USB connection and restart the application.")
+                        continue
+                    if not raw_data_map:
+                        continue
+                    # Snapshot and queue while still holding the lock, so a GUI command sequence
+                    # that runs right after can flush everything acquired before it
+                    event = RawEvent(raw_data_map, rx_len, readout, s)
+                    with self.cond:
+                        self.ring.append(event)
+                        self.cond.notify_all()
+            except Exception as e:
+                self.error = ("Hardware Communication Error",
+                              f"Lost communication with the device.\n\n"
+                              f"Details: {e}\n\n"
+                              "Please check the USB connection and restart the application.")
+
+    def wait_for_event(self, timeout):
+        """Blocks the caller for up to timeout seconds until at least one event is queued."""
+        with self.cond:
+            if not self.ring:
+                self.cond.wait(timeout)
+            return len(self.ring) > 0
+
+    def pop_all(self, max_events=None):
+        """Takes queued events off the ring, oldest first."""
+        with self.cond:
+            n = len(self.ring) if max_events is None else min(max_events, len(self.ring))
+            events = [self.ring.popleft() for _ in range(n)]
+            self.cond.notify_all()
+        return events
+
+    def clear(self):
+        """Drops all queued events, e.g. after settings changed under them."""
+        with self.cond:
+            self.ring.clear()
+            self.cond.notify_all()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=2.0)
@@ -28,11 +28,10 @@ class AutocalibrationCollector:
         do_meanrms_calibration(self.main_window)
 
         # Get data from the current event
-        c1data = self.main_window.xydata[self.c1]
-        c2data = self.main_window.xydata[self.c2]
-        y1 = c1data[1]
-        y2 = c2data[1]
-        self.sample_spacing = c1data[0][1] - c1data[0][0]
+        xydata = self.main_window.xydata
+        y1 = xydata.y[self.c1]
+        y2 = xydata.y[self.c2]
+        self.sample_spacing = xydata.dx[self.c1]
         self.TAD_PER_HALF_SAMPLE = 138.4 / (self.sample_spacing / 2.0)
 
         vline = self.main_window.plot_manager.otherlines['vline'].value()
@@ -147,18 +146,15 @@ def do_meanrms_calibration(main_window, doprint=False):
             c2_idx = (board_idx + 1) * s.num_chan_per_board
 
             # Get y-data for both channels within the fit window
-            xf1 = main_window.xydata[c1_idx][0]
-            xf2 = main_window.xydata[c2_idx][0]
-            yf1 = main_window.xydata[c1_idx][1]
-            yf2 = main_window.xydata[c2_idx][1]
+            xydata = main_window.xydata
 
             fitwidth = (s.max_x - s.min_x) * s.downsamplezoom * 0.4
             vline = main_window.plot_manager.otherlines['vline'].value()
             #hline = self.main_window.plot_manager.otherlines['hline'].value()
             #xc1 = xf1[(xf1 > vline - fitwidth) & (xf1 < vline + fitwidth)]
             #xc2 = xf2[(xf2> vline - fitwidth) & (xf2 < vline + fitwidth)]
-            yc1 = yf1[(xf1 > vline - fitwidth) & (xf1 < vline + fitwidth)]
-            yc2 = yf2[(xf2 > vline - fitwidth) & (xf2 < vline + fitwidth)]
+            yc1 = xydata.y[c1_idx][xydata.index_range(c1_idx, vline - fitwidth, vline + fitwidth)]
+            yc2 = xydata.y[c2_idx][xydata.index_range(c2_idx, vline - fitwidth, vline + fitwidth)]
 
             if len(yc1) < 10 or len(yc2) < 10:
                 #print("Mean/RMS calibration failed: not enough data in window.")
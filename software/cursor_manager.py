@@ -5,12 +5,16 @@ import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore
 from PyQt5.QtGui import QColor
 import numpy as np
+from edge_index import EdgeIndex
 
 
 class CursorManager:
     """Manages cursor lines and value readouts."""
 
-    def __init__(self, plot, state, linepens, ui=None, otherlines=None, lines=None):
+    # How close (in pixels) the time cursor has to be to an edge of the waveform to snap onto it
+    EDGE_SNAP_PIXELS = 8
+
+    def __init__(self, plot, state, linepens, ui=None, otherlines=None, lines=None, plot_manager=None):
         """Initialize cursor manager.
 
         Args:
@@ -20,6 +24,7 @@ class CursorManager:
             ui: The UI object (for accessing actionTime_relative, actionSnap_to_waveform)
             otherlines: Dictionary of other plot lines (for accessing vline position)
             lines: List of plot lines (for snapping to waveform data)
+            plot_manager: The PlotManager (for the full-resolution data and edges of the lines when snapping)
         """
         self.plot = plot
         self.state = state
@@ -27,6 +32,7 @@ class CursorManager:
         self.ui = ui
         self.otherlines = otherlines
         self.lines = lines
+        self.plot_manager = plot_manager
         self.cursor_lines = {}
         self.cursor_labels = {}
         self.cursor_arrows = {}  # Store arrow markers for cursor line ends
@@ -391,7 +397,7 @@ class CursorManager:
         self.cursor_labels['trigger_thresh'].setVisible(True)
 
     def snap_cursor_to_waveform(self, t_cursor_name, v_cursor_name):
-        """Snap cursor to nearest waveform point.
+        """Snap cursor to nearest waveform point, or onto the 50% crossing of an edge close to it.
 
         Args:
             t_cursor_name: Name of the time cursor ('t1' or 't2')
@@ -413,10 +419,12 @@ class CursorManager:
         if self.state.activexychannel >= len(self.lines):
             return
 
-        # Get waveform data from active channel
+        # Get waveform data from active channel, at full resolution if the line shows a decimated version
         active_line = self.lines[self.state.activexychannel]
-        x_data = active_line.xData
-        y_data = active_line.yData
+        if self.plot_manager is not None:
+            x_data, y_data = self.plot_manager.full_data(active_line)
+        else:
+            x_data, y_data = active_line.xData, active_line.yData
 
         if x_data is None or y_data is None or len(x_data) == 0:
             return
@@ -424,10 +432,27 @@ class CursorManager:
         # Get current time cursor position
         t_pos = self.cursor_lines[t_cursor_name].value()
 
-        # Find nearest x point on waveform
-        idx = np.argmin(np.abs(x_data - t_pos))
-        snap_x = x_data[idx]
-        snap_y = y_data[idx]
+        # Snap onto an edge if one crosses its 50% level near the cursor, otherwise to the nearest x point
+        edge_t = None
+        edges = None
+        if self.plot_manager is not None:
+            # The shared index, unless the event shown isn't the latest one processed (see RenderScheduler)
+            stabilized = self.plot_manager.stabilized_data[self.state.activexychannel]
+            if stabilized is not None and stabilized[1] is y_data:
+                edges = self.plot_manager.edge_index(self.state.activexychannel)
+            elif len(y_data) > 1:
+                edges = EdgeIndex.from_xy(x_data, y_data)
+        if edges is not None:
+            level = edges.level(0.5)
+            edge_t = edges.nearest(level, t_pos)
+            if edge_t is not None and abs(edge_t - t_pos) > self.EDGE_SNAP_PIXELS * self.plot.getViewBox().viewPixelSize()[0]:
+                edge_t = None
+        if edge_t is not None:
+            snap_x, snap_y = edge_t, level
+        else:
+            idx = np.argmin(np.abs(x_data - t_pos))
+            snap_x = x_data[idx]
+            snap_y = y_data[idx]
 
         # Set flag to prevent recursion
         self._snapping_in_progress = True
@@ -1,12 +1,15 @@
 # data_processor.py
 
 import numpy as np
-import struct
 import warnings
 import math
+from types import SimpleNamespace
 from scipy.signal import butter, filtfilt, find_peaks
 from scipy.optimize import curve_fit
 from scipy.fft import fft, fftfreq
+from profiler import profiler
+from edge_index import EdgeIndex
+from measurement_engine import STATISTICS, EVENT_MEASUREMENTS, measure_traces
 
 
 # #############################################################################
@@ -104,36 +107,55 @@ def find_crossing_distance(y_data, y_threshold, x_ref, x0=0.0, dx=1.0, rising=Tr
     Returns:
         Distance from x_ref to the closest crossing, or None if no crossing found.
     """
-    # Find all indices where the data crosses the threshold
-    crossings = np.where(np.diff(np.sign(y_data - y_threshold)))[0]
-    if crossings.size == 0:
-        return None
-
-    # Linearly interpolate to find the exact x-intersection for all crossings
-    y1 = y_data[crossings]
-    y2 = y_data[crossings + 1]
-    x1 = x0 + crossings * dx
-
-    # Filter crossings by direction
-    delta_y = y2 - y1
-    if rising:
-        # Rising edge: y2 > y1 (delta_y > 0)
-        valid_crossings = delta_y > 0
-    else:
-        # Falling edge: y2 < y1 (delta_y < 0)
-        valid_crossings = delta_y < 0
+    crossing = EdgeIndex(y_data, x0, dx).nearest(y_threshold, x_ref, rising)
+    return None if crossing is None else crossing - x_ref
+
+
+# #############################################################################
+# Per-event Readout State
+# #############################################################################
+
+class EventReadout:
+    """
+    The per-event state read from the boards along with an event's data: where each board triggered,
+    its trigger phase and downsample merging counter, and the first self-triggering board (noextboard).
+    Made by HardwareController.get_event() on the acquisition thread and only read after that, so the
+    decoder gets it with the event instead of from the ScopeState fields the readout threads write.
+    """
+
+    __slots__ = ('sample_triggered', 'triggerphase', 'downsamplemergingcounter', 'noextboard')
 
-    if not np.any(valid_crossings):
-        return None
+    def __init__(self, num_board):
+        self.sample_triggered = [0] * num_board
+        self.triggerphase = [0] * num_board
+        self.downsamplemergingcounter = [0] * num_board
+        self.noextboard = -1
 
-    fraction = (y_threshold - y1[valid_crossings]) / delta_y[valid_crossings]
-    all_x_intersects = x1[valid_crossings] + fraction * dx
+    def trigger_reference(self, state, board_idx):
+        """The board whose trigger position and phase the board's samples are aligned with."""
+        if state.doexttrig[board_idx] and self.noextboard != -1:
+            return self.noextboard  # externally triggered boards use the self-triggering board's reference
+        return board_idx
 
-    # Find the intersection point that is closest to the reference x_ref
-    closest_idx = np.argmin(np.abs(all_x_intersects - x_ref))
-    closest_x_intersect = all_x_intersects[closest_idx]
 
-    return closest_x_intersect - x_ref
+# The state attributes DataProcessor.process_board_data reads, besides the per-event readout and stabilizer state
+DECODE_SETTINGS = ('num_board', 'num_chan_per_board', 'waveform_dtype', 'samplerate', 'nsunits', 'expect_samples',
+                   'expect_samples_extra', 'dotwochannel', 'dooversample', 'doexttrig', 'downsamplefactor',
+                   'downsamplemerging', 'triggershift', 'toff', 'lvdstrigdelay', 'extrigboardmeancorrection',
+                   'extrigboardstdcorrection', 'yscale', 'lpf', 'trig_stabilizer_enabled', 'triggerpos', 'triggerlevel',
+                   'triggerdelta', 'triggerchan', 'fallingedge', 'distcorrtol', 'distcorrsamp', 'min_x', 'max_x')
+
+
+def decode_settings(state, previous=None):
+    """
+    A snapshot of the decode settings of the state, which a DataProcessor can use as its state to decode an event
+    later as it was decoded live. Returns previous (an earlier snapshot) if none of the settings changed since.
+    """
+    settings = {name: getattr(state, name) for name in DECODE_SETTINGS}
+    settings = {name: tuple(value) if isinstance(value, list) else value for name, value in settings.items()}
+    if previous is not None and vars(previous) == settings:
+        return previous
+    return SimpleNamespace(**settings)
 
 
 # #############################################################################
@@ -147,92 +169,116 @@ class DataProcessor:
         self.state = state
         self.nsubsamples = 50  # 10*4 (clks) + 8 (strs) + 2 (beef)
         self.lastclk = -1
+        self._block_index_cache = {}
 
-    def process_board_data(self, data, board_idx, xy_data_array):
+    def process_board_data(self, data, board_idx, xy_data_array, readout, stabilizer=None):
         """
         Processes raw byte data for a single board, unpacking, scaling,
-        filtering, and stabilizing it.
+        filtering, and stabilizing it. xy_data_array is the WaveformData to fill.
+        readout is the EventReadout that came with the data. stabilizer is the (distcorr, totdistcorr)
+        pair of per-board lists the trigger stabilizer updates, by default the ones in the state.
         """
         state = self.state
 
         # Use trigger reference from non-externally triggered board if needed
-        if state.doexttrig[board_idx] and state.noextboard != -1:
-            board_to_use = state.noextboard
-            state.sample_triggered[board_idx] = state.sample_triggered[board_to_use]
-            state.triggerphase[board_idx] = state.triggerphase[board_to_use]
+        reference = readout.trigger_reference(state, board_idx)
+        sample_triggered = readout.sample_triggered[reference]
+        triggerphase = readout.triggerphase[reference] // (2 if state.dotwochannel[board_idx] else 1)
+
+        # View the raw 16-bit words as one row per hardware sample block:
+        # 40 ADC words, 4 clocks, 4 strobes, 1 flag word and the BEEF marker
+        nblocks = state.expect_samples + state.expect_samples_extra
+        blocks = np.frombuffer(data, dtype='<i2', count=nblocks * self.nsubsamples).reshape(nblocks, self.nsubsamples)
 
-        sample_triggered = state.sample_triggered[board_idx]
-        triggerphase = state.triggerphase[board_idx] // (2 if state.dotwochannel[board_idx] else 1)
+        if np.any(blocks[:, 49] != -16657):
+            print("Error: Beef marker not found!")
+            raise RuntimeError(f"Data corrupted. No BEEF.")
+        nbadclkA, nbadclkB, nbadclkC, nbadclkD, nbadstr = self._check_clocks_and_strobes(blocks)
 
-        # Unpack raw 16-bit integers and scale to plotting units
-        unpackedsamples = struct.unpack('<' + 'h' * (len(data) // 2), data)
-        npunpackedsamples = np.array(unpackedsamples, dtype='float') * state.yscale
+        # Scale the ADC words to plotting units, directly in the waveform dtype
+        adcsamples = np.multiply(blocks[:, :40], state.yscale, dtype=xy_data_array.dtype)
 
         # If this board is the secondary in an oversampling pair (e.g., board 1, 3, etc.),
         # apply the correction factors calculated from its primary partner (e.g., board 0, 2).
         if state.dooversample[board_idx] and board_idx % 2 == 1:
             primary_board_idx = board_idx - 1
             # Additive mean correction
-            npunpackedsamples += state.extrigboardmeancorrection[primary_board_idx]
+            adcsamples += state.extrigboardmeancorrection[primary_board_idx]
             # Multiplicative RMS (standard deviation) correction
-            npunpackedsamples *= state.extrigboardstdcorrection[primary_board_idx]
+            adcsamples *= state.extrigboardstdcorrection[primary_board_idx]
 
         # Calculate the total sample offset based on trigger position and hardware delays
-        downsampleoffset = self._calculate_downsample_offset(sample_triggered, board_idx)
+        downsampleoffset = self._calculate_downsample_offset(sample_triggered, readout.downsamplemergingcounter[board_idx],
+                                                             board_idx)
 
         # Map the sequential ADC samples into the correct time-ordered array slots
-        datasize = xy_data_array[board_idx * 2][1].size
-        nbadclkA, nbadclkB, nbadclkC, nbadclkD, nbadstr = 0, 0, 0, 0, 0
-        for s in range(0, state.expect_samples + state.expect_samples_extra):
-
-            # Check clock and strobe validity
-            vals = unpackedsamples[s * self.nsubsamples + 40: s * self.nsubsamples + 50]
-            if vals[9] != -16657:
-                print("Error: Beef marker not found!")
-                raise RuntimeError(f"Data corrupted. No BEEF.")
-            if vals[8] != 0 or (self.lastclk != 341 and self.lastclk != 682):
-                for n in range(0, 8):
-                    val = vals[n]
-                    if n < 4:
-                        if val != 341 and val != 682:  # Expected clock patterns
-                            if n == 0: nbadclkA += 1
-                            if n == 1: nbadclkB += 1
-                            if n == 2: nbadclkC += 1
-                            if n == 3: nbadclkD += 1
-                        self.lastclk = val
-                    elif val not in {0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512}:  # Strobe should be one-hot
-                        nbadstr += 1
-
-            # CORRECTED: Use the per-board state to decide how to unpack data
-            if state.dotwochannel[board_idx]:
-                samp, nsamp, nstart = s * 20 - downsampleoffset - triggerphase, 20, 0
-                if samp < 0: nsamp, nstart, samp = 20 + samp, -samp, 0
-                if samp + nsamp >= datasize: nsamp = datasize - samp
-                if 0 < nsamp <= 20:
-                    c1_idx, c2_idx = board_idx * 2, board_idx * 2 + 1
-                    xy_data_array[c1_idx][1][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+20+nstart: s*self.nsubsamples+20+nstart+nsamp]
-                    xy_data_array[c2_idx][1][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+nstart: s*self.nsubsamples+nstart+nsamp]
-            else:
-                # Note: The data array is always allocated for 40 samples for simplicity.
-                # For single-channel boards, we only fill the first channel's array.
-                samp, nsamp, nstart = s * 40 - downsampleoffset - triggerphase, 40, 0
-                if samp < 0: nsamp, nstart, samp = 40 + samp, -samp, 0
-                if samp + nsamp >= datasize: nsamp = datasize - samp
-                if 0 < nsamp <= 40:
-                    c_idx = board_idx * 2
-                    xy_data_array[c_idx][1][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+nstart: s*self.nsubsamples+nstart+nsamp]
+        datasize = xy_data_array.num_samples
+        if state.dotwochannel[board_idx]:
+            # Each block holds 20 samples of channel 1 (words 20-39) and 20 of channel 0 (words 0-19)
+            dest = self._block_sample_index(nblocks, 20) - downsampleoffset - triggerphase
+            valid = (dest >= 0) & (dest < datasize)
+            c1_idx, c2_idx = board_idx * 2, board_idx * 2 + 1
+            xy_data_array.y[c1_idx][dest[valid]] = adcsamples[:, 20:40][valid]
+            xy_data_array.y[c2_idx][dest[valid]] = adcsamples[:, 0:20][valid]
+        else:
+            # Note: The data array is always allocated for 40 samples for simplicity.
+            # For single-channel boards, we only fill the first channel's array.
+            dest = self._block_sample_index(nblocks, 40) - downsampleoffset - triggerphase
+            valid = (dest >= 0) & (dest < datasize)
+            c_idx = board_idx * 2
+            xy_data_array.y[c_idx][dest[valid]] = adcsamples[valid]
 
         # Apply post-processing steps
         self._apply_lpf(board_idx, xy_data_array)
-        self._apply_board_stabilizer(board_idx, xy_data_array)
+        distcorr, totdistcorr = stabilizer if stabilizer is not None else (state.distcorr, state.totdistcorr)
+        self._apply_board_stabilizer(board_idx, xy_data_array, readout.noextboard, distcorr, totdistcorr)
 
         return nbadclkA, nbadclkB, nbadclkC, nbadclkD, nbadstr
 
-    def _calculate_downsample_offset(self, sample_triggered, board_idx):
+    def _block_sample_index(self, nblocks, nperblock):
+        """Returns the (nblocks, nperblock) array of sequential sample indices, cached per shape."""
+        key = (nblocks, nperblock)
+        if self._block_index_cache.get('key') != key:
+            index = np.arange(nblocks)[:, None] * nperblock + np.arange(nperblock)
+            self._block_index_cache = {'key': key, 'index': index}
+        return self._block_index_cache['index']
+
+    def _check_clocks_and_strobes(self, blocks):
+        """
+        Counts bad clock and strobe words for all blocks at once.
+
+        A block is only checked if its flag word is set, or if the last clock word seen
+        (carried over from the last checked block, even across events) was not a valid pattern.
+        """
+        clocks = blocks[:, 40:44]
+        strobes = blocks[:, 44:48]
+        goodclk = (clocks == 341) | (clocks == 682)  # Expected clock patterns
+        # Strobe should be one-hot (or zero)
+        goodstr = (strobes >= 0) & (strobes <= 512) & ((strobes & (strobes - 1)) == 0)
+
+        # A checked block leaves its last clock word behind, so block s is checked if a
+        # "start" (flag word set, or a bad clock carried in from the previous event) happened
+        # at or after the last checked block whose clock D word was good.
+        nblocks = blocks.shape[0]
+        starts = blocks[:, 48] != 0
+        if self.lastclk != 341 and self.lastclk != 682:
+            starts[0] = True
+        nstarts = np.cumsum(starts)
+        lastgood = np.where(goodclk[:, 3], np.arange(nblocks), -1)
+        lastgood = np.maximum.accumulate(np.concatenate(([-1], lastgood[:-1])))
+        nstarts_before = np.where(lastgood >= 0, nstarts[np.maximum(lastgood, 0)], 0)
+        checked = nstarts > nstarts_before
+
+        if np.any(checked):
+            self.lastclk = int(clocks[np.flatnonzero(checked)[-1], 3])
+        nbadclk = np.count_nonzero(~goodclk[checked], axis=0)
+        nbadstr = int(np.count_nonzero(~goodstr[checked]))
+        return int(nbadclk[0]), int(nbadclk[1]), int(nbadclk[2]), int(nbadclk[3]), nbadstr
+
+    def _calculate_downsample_offset(self, sample_triggered, downsamplemergingcounter, board_idx):
         """Calculates the total sample offset for data alignment."""
         state = self.state
-        offset = 2 * (sample_triggered + (state.downsamplemergingcounter[
-                                              board_idx] - 1) % state.downsamplemerging * 10) // state.downsamplemerging
+        offset = 2 * (sample_triggered + (downsamplemergingcounter - 1) % state.downsamplemerging * 10) // state.downsamplemerging
         offset += 20 * state.triggershift
         if not state.dotwochannel[board_idx]:
             offset *= 2
@@ -251,6 +297,7 @@ class DataProcessor:
 
         return int(offset)
 
+    @profiler.timed('lpf')
     def _apply_lpf(self, board_idx, xy_data_array):
         """Applies a digital low-pass filter if configured."""
         state = self.state
@@ -261,17 +308,18 @@ class DataProcessor:
         if state.lpf[c1_idx]:
             normal_cutoff = min(state.lpf[c1_idx] * 1e6 / nyquist, 0.99)
             fb, fa = butter(5, normal_cutoff, btype='low', analog=False)
-            xy_data_array[c1_idx][1] = filtfilt(fb, fa, xy_data_array[c1_idx][1])
+            xy_data_array.y[c1_idx] = filtfilt(fb, fa, xy_data_array.y[c1_idx])
 
         if state.dotwochannel[board_idx]:
             c2_idx = c1_idx + 1
             if state.lpf[c2_idx]:
                 normal_cutoff = min(state.lpf[c2_idx] * 1e6 / nyquist, 0.99)
                 fb, fa = butter(5, normal_cutoff, btype='low', analog=False)
-                xy_data_array[c2_idx][1] = filtfilt(fb, fa, xy_data_array[c2_idx][1])
+                xy_data_array.y[c2_idx] = filtfilt(fb, fa, xy_data_array.y[c2_idx])
 
-    def _apply_board_stabilizer(self, board_idx, xy_data_array):
-        """Applies board-level trigger stabilization."""
+    @profiler.timed('stabilizer')
+    def _apply_board_stabilizer(self, board_idx, xy_data_array, noextboard, distcorr, totdistcorr):
+        """Applies board-level trigger stabilization, updating the distcorr and totdistcorr lists."""
         s = self.state
         if not s.trig_stabilizer_enabled: # or s.downsamplefactor>1: # disable at less zoom?
             return
@@ -286,115 +334,40 @@ class DataProcessor:
         hline_threshold = hline_pos + s.triggerdelta[board_idx] * s.yscale*256
 
         # --- This is the Board-level alignment logic from the original drawchannels() ---
-        if abs(s.totdistcorr[board_idx]) > s.distcorrtol * s.downsamplefactor:
-            for i in range(s.num_chan_per_board):
-                xy_data_array[board_idx * s.num_chan_per_board + i][0] += s.totdistcorr[board_idx]
-            s.totdistcorr[board_idx] = 0
+        # The board's time axis is always the one from time_changed() shifted by -totdistcorr,
+        # so only its x0 is set, from totdistcorr, once that is updated below
+        if abs(totdistcorr[board_idx]) > s.distcorrtol * s.downsamplefactor:
+            totdistcorr[board_idx] = 0
             #print("board",board_idx,"totdistcorr cleared")
 
         distcorrtemp = None
         if s.doexttrig[board_idx]:
-            if s.noextboard != -1: distcorrtemp = s.distcorr[s.noextboard]
+            if noextboard != -1: distcorrtemp = distcorr[noextboard]
         else:
             triggering_chan_idx = board_idx * s.num_chan_per_board + s.triggerchan[board_idx]
-            thed = xy_data_array[triggering_chan_idx]
+            x0, dx = xy_data_array.x0[triggering_chan_idx], xy_data_array.dx[triggering_chan_idx]
 
             fitwidth = (s.max_x - s.min_x)
-            xc = thed[0][(thed[0] > vline_time - fitwidth) & (thed[0] < vline_time + fitwidth)]
-            if xc.size > 2:
-                fitwidth *= s.distcorrsamp / xc.size
+            window = xy_data_array.index_range(triggering_chan_idx, vline_time - fitwidth, vline_time + fitwidth)
+            nc = window.stop - window.start
+            if nc > 2:
+                fitwidth *= s.distcorrsamp / nc
                 if s.dotwochannel[board_idx]: fitwidth /= 2 # the samples are spaced out twice as much, so to use the same time interval we use half the samples
-                xc = thed[0][(thed[0] > vline_time - fitwidth) & (thed[0] < vline_time + fitwidth)]
-                yc = thed[1][(thed[0] > vline_time - fitwidth) & (thed[0] < vline_time + fitwidth)]
+                window = xy_data_array.index_range(triggering_chan_idx, vline_time - fitwidth, vline_time + fitwidth)
+                yc = xy_data_array.y[triggering_chan_idx][window]
 
-                # For falling edges, invert both the signal and the threshold
-                threshold_to_use = hline_threshold
-                if s.fallingedge[board_idx]:
-                    yc = -yc
-                    threshold_to_use = -hline_threshold
-
-                if xc.size > 1:
-                    distcorrtemp = find_crossing_distance(yc, threshold_to_use, vline_time, xc[0], xc[1] - xc[0])
+                if yc.size > 1:
+                    distcorrtemp = find_crossing_distance(yc, hline_threshold, vline_time, x0 + window.start * dx, dx,
+                                                          rising=not s.fallingedge[board_idx])
                     #print("board",board_idx,"distcorrtemp", distcorrtemp)
 
         if distcorrtemp is not None and abs(distcorrtemp) < s.distcorrtol * s.downsamplefactor:
-            s.distcorr[board_idx] = distcorrtemp
-            for i in range(s.num_chan_per_board):
-                xy_data_array[board_idx * s.num_chan_per_board + i][0] -= s.distcorr[board_idx]
-            s.totdistcorr[board_idx] += s.distcorr[board_idx]
-            #print("board",board_idx,"totdistcorr", s.totdistcorr[board_idx])
-
-    def _calculate_pulse_width(self, x_data, y_data, vline, threshold):
-        """Calculate the width of the pulse nearest to the trigger point (vline).
-
-        Args:
-            x_data: Time data
-            y_data: Signal data
-            vline: Trigger position (time)
-            threshold: Signal threshold (typically 50% between min and max)
-
-        Returns:
-            Pulse width in nanoseconds, or 0 if no pulse found
-        """
-        if len(y_data) < 2:
-            return 0.0
-
-        # Find all threshold crossings
-        crossings = np.where(np.diff(np.sign(y_data - threshold)))[0]
-
-        if len(crossings) < 2:
-            # Need at least 2 crossings for a pulse
-            return 0.0
-
-        # Find the crossing closest to vline
-        closest_crossing_idx = np.argmin(np.abs(x_data[crossings] - vline))
-        crossing_pos = crossings[closest_crossing_idx]
-
-        # Determine if this is a rising or falling edge
-        is_rising = y_data[crossing_pos + 1] > y_data[crossing_pos]
-
-        # Find the next opposite-direction crossing
-        next_crossing_idx = None
-        for i in range(closest_crossing_idx + 1, len(crossings)):
-            next_pos = crossings[i]
-            next_is_rising = y_data[next_pos + 1] > y_data[next_pos]
-            if next_is_rising != is_rising:
-                next_crossing_idx = i
-                break
-
-        # If no opposite crossing found, try looking backwards
-        if next_crossing_idx is None:
-            for i in range(closest_crossing_idx - 1, -1, -1):
-                prev_pos = crossings[i]
-                prev_is_rising = y_data[prev_pos + 1] > y_data[prev_pos]
-                if prev_is_rising != is_rising:
-                    next_crossing_idx = i
-                    break
-
-        if next_crossing_idx is None:
-            # No opposite crossing found
-            return 0.0
-
-        # Interpolate to find exact crossing times
-        def interpolate_crossing(idx):
-            y1 = y_data[crossings[idx]]
-            y2 = y_data[crossings[idx] + 1]
-            x1 = x_data[crossings[idx]]
-            x2 = x_data[crossings[idx] + 1]
-            # Linear interpolation: x = x1 + (threshold - y1) / (y2 - y1) * (x2 - x1)
-            if abs(y2 - y1) > 1e-10:
-                fraction = (threshold - y1) / (y2 - y1)
-                return x1 + fraction * (x2 - x1)
-            else:
-                return x1
-
-        crossing_time = interpolate_crossing(closest_crossing_idx)
-        next_crossing_time = interpolate_crossing(next_crossing_idx)
-
-        # Calculate pulse width in nanoseconds
-        pulse_width_ns = abs(next_crossing_time - crossing_time)
+            distcorr[board_idx] = distcorrtemp
+            totdistcorr[board_idx] += distcorr[board_idx]
+            #print("board",board_idx,"totdistcorr", totdistcorr[board_idx])
 
-        return pulse_width_ns
+        first = board_idx * s.num_chan_per_board
+        xy_data_array.x0[first:first + s.num_chan_per_board] = -totdistcorr[board_idx]
 
     def calculate_fft(self, y_data, board_idx):
         """Calculates the FFT for a given channel's y-data."""
@@ -421,7 +394,19 @@ class DataProcessor:
 
         return freq, abs(Y)
 
-    def calculate_measurements(self, x_data, y_data, vline, do_risetime_calc=False, use_edge_fit=True, channel_index=None, needs_freq=True):
+    def sampling_rate(self, channel_index, resampled=True):
+        """The samples per second of a channel's trace, after the display resampling unless resampled is False."""
+        state = self.state
+        board_index = channel_index // state.num_chan_per_board
+        sampling_rate = (state.samplerate * 1e9) / state.downsamplefactor
+        if state.dotwochannel[board_index]: sampling_rate /= 2
+        # Account for interleaved mode - doubles the sample rate
+        if state.dointerleaved[board_index]: sampling_rate *= 2
+        # Account for resampling - if resampling is applied, it increases sample density and effective sampling rate
+        if resampled and state.doresamp[channel_index] > 1: sampling_rate *= state.doresamp[channel_index]
+        return sampling_rate
+
+    def calculate_measurements(self, x_data, y_data, vline, do_risetime_calc=False, use_edge_fit=True, channel_index=None, needs_freq=True, edges=None, statistics=STATISTICS):
         """Calculates all requested measurements and returns fit results if requested.
 
         Args:
@@ -432,7 +417,10 @@ class DataProcessor:
             use_edge_fit: If True, use edge-based fitting (works for any signal).
                          If False, use piecewise fitting (works for square waves).
             channel_index: Index of the channel being measured (if None, uses activexychannel)
-            needs_freq: Whether to calculate frequency (expensive FFT operation). Defaults to True for backward compatibility.
+            needs_freq: Whether to calculate frequency (from the edges, or an FFT if there are too few). Defaults to True for backward compatibility.
+            edges: The EdgeIndex of the data, if it's already been made (see PlotManager.edge_index)
+            statistics: Which of the STATISTICS (Mean, RMS, ..., Duty cycle) to include, none if they're
+                        measured separately with measure_traces()
         """
         if len(y_data) < 2: return {}, None
         state = self.state
@@ -442,42 +430,30 @@ class DataProcessor:
             channel_index = state.activexychannel
 
         VperD = state.VperD[channel_index]
-        board_index = channel_index // state.num_chan_per_board
 
-        # Calculate min/max once to avoid redundant computation
-        y_min = np.min(y_data)
-        y_max = np.max(y_data)
+        # The crossings are found once and shared by the frequency, pulse width and risetime
+        if edges is None:
+            edges = EdgeIndex.from_xy(x_data, y_data)
 
-        measurements = {
-            "Mean": 1000 * VperD * np.mean(y_data),
-            "RMS": 1000 * VperD * np.std(y_data),
-            "Max": 1000 * VperD * y_max,
-            "Min": 1000 * VperD * y_min,
-            "Vpp": 1000 * VperD * (y_max - y_min)
-        }
+        measurements = {}
+        if statistics:
+            record = measure_traces({channel_index: y_data}, statistics, {channel_index: 1000 * VperD})[0]
+            measurements.update((name, float(record[name])) for name in record.dtype.names[1:])
 
-        # Only calculate frequency if needed (expensive FFT operation)
+        # Only calculate frequency if needed
         if needs_freq:
-            sampling_rate = (state.samplerate * 1e9) / state.downsamplefactor
-            if state.dotwochannel[board_index]: sampling_rate /= 2
-            # Account for interleaved mode - doubles the sample rate
-            if state.dointerleaved[board_index]: sampling_rate *= 2
-            # Account for resampling - if resampling is applied, it increases sample density and effective sampling rate
-            if state.doresamp[channel_index] > 1: sampling_rate *= state.doresamp[channel_index]
-            found_freq = find_fundamental_frequency_scipy(y_data, sampling_rate)
-            measurements["Freq"] = found_freq
+            sampling_rate = self.sampling_rate(channel_index)
+            # From the average period between edges, sub-sample accurate, or the FFT if there are too few edges
+            period = edges.period()
+            if period:
+                measurements["Freq"] = sampling_rate / period
+            else:
+                measurements["Freq"] = find_fundamental_frequency_scipy(y_data, sampling_rate)
         else:
             measurements["Freq"] = 0.0
 
-        # Calculate duty cycle (percentage of time signal is above 50% threshold)
-        threshold = (y_min + y_max) / 2
-        above_threshold = np.sum(y_data > threshold)
-        duty_cycle = (above_threshold / len(y_data)) * 100 if len(y_data) > 0 else 0
-        measurements["Duty cycle"] = duty_cycle
-
         # Calculate pulse width (width of pulse nearest to trigger point)
-        pulse_width = self._calculate_pulse_width(x_data, y_data, vline, threshold)
-        measurements["Pulse width"] = pulse_width
+        measurements["Pulse width"] = edges.pulse_width(vline)
 
         # Initialize fit results to None
         fit_results = None
@@ -486,7 +462,7 @@ class DataProcessor:
             if use_edge_fit:
                 # New edge-based approach: find steep slope near trigger
                 measurements, fit_results = self._calculate_risetime_edge(
-                    x_data, y_data, vline, measurements
+                    x_data, y_data, vline, measurements, edges
                 )
             else:
                 # Original piecewise approach for square waves
@@ -496,7 +472,47 @@ class DataProcessor:
 
         return measurements, fit_results
 
-    def _calculate_risetime_edge(self, x_data, y_data, vline, measurements):
+    @profiler.timed('event measurements')
+    def measure_events(self, traces, measurements):
+        """Calculates measurements of a batch of events, for the measure all events mode.
+
+        Args:
+            traces: Dictionary {channel_index: list of the decoded samples of the channel in each event},
+                    filtered as in PlotManager.update_plots but not resampled
+            measurements: Names from EVENT_MEASUREMENTS to calculate
+
+        Returns:
+            Dictionary {(measurement name, channel_index): array of the value in each event}, in mV for the
+            voltages, % for the duty cycle, Hz for Freq and ns for Period
+        """
+        state = self.state
+        results = {}
+        statistics = [name for name in measurements if name in STATISTICS]
+        if statistics:
+            # The statistics of all events and channels together, the rows of each channel following each other
+            batch, scales = {}, {}
+            for channel_index, events in traces.items():
+                for i, y in enumerate(events):
+                    batch[(channel_index, i)] = y
+                    scales[(channel_index, i)] = 1000 * state.VperD[channel_index]
+            records = measure_traces(batch, statistics, scales)
+            start = 0
+            for channel_index, events in traces.items():
+                for name in statistics:
+                    results[(name, channel_index)] = records[name][start:start + len(events)]
+                start += len(events)
+        if "Freq" in measurements or "Period" in measurements:
+            for channel_index, events in traces.items():
+                sampling_rate = self.sampling_rate(channel_index, resampled=False)
+                freqs = np.zeros(len(events))
+                for i, y in enumerate(events):
+                    period = EdgeIndex(y).period()
+                    freqs[i] = sampling_rate / period if period else find_fundamental_frequency_scipy(y, sampling_rate)
+                results[("Freq", channel_index)] = freqs
+                results[("Period", channel_index)] = np.divide(1e9, freqs, out=np.zeros(len(events)), where=freqs > 0)
+        return results
+
+    def _calculate_risetime_edge(self, x_data, y_data, vline, measurements, edges):
         """Calculate rise time by fitting a line to the steepest edge near the trigger point."""
         state = self.state
         fitwidth = (state.max_x - state.min_x) * state.fitwidthfraction
@@ -506,8 +522,10 @@ class DataProcessor:
         error_label = f"{time_label} error"
 
         # Get data around trigger point
-        xc = x_data[(x_data > vline - fitwidth) & (x_data < vline + fitwidth)]
-        yc = y_data[(x_data > vline - fitwidth) & (x_data < vline + fitwidth)]
+        start = np.searchsorted(x_data, vline - fitwidth, side='right')
+        stop = np.searchsorted(x_data, vline + fitwidth, side='left')
+        xc = x_data[start:stop]
+        yc = y_data[start:stop]
 
         if xc.size < 5:
             measurements[time_label] = math.nan
@@ -524,20 +542,19 @@ class DataProcessor:
         hline_pos = (state.triggerlevel - 127) * state.yscale * 256
         hline_threshold = hline_pos + state.triggerdelta[state.activeboard] * state.yscale * 256
 
-        # Find where the signal crosses the trigger threshold
+        # Find where the signal crosses the trigger threshold closest to vline
         # This narrows our search significantly
-        crossings = np.where(np.diff(np.sign(yc - hline_threshold)))[0]
+        crossing_time = edges.nearest(hline_threshold, vline)
+        closest_crossing_idx = None
+        if crossing_time is not None:
+            closest_crossing_idx = int((crossing_time - edges.x0) / edges.dx) - start
 
-        if len(crossings) == 0:
+        if closest_crossing_idx is None or not 0 <= closest_crossing_idx < xc.size - 1:
             # No crossing found, return NaN
             measurements[time_label] = math.nan
             measurements[error_label] = math.nan
             return measurements, None
 
-        # Find crossing closest to vline
-        vline_idx = np.argmin(np.abs(xc - vline))
-        closest_crossing_idx = crossings[np.argmin(np.abs(crossings - vline_idx))]
-
         # Define search region: scale with data size for faster signals
         # Use 10% of data or at least 5 samples, whichever is larger
         search_range = max(5, xc.size // 10)
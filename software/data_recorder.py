@@ -1,15 +1,110 @@
 # data_recorder.py
 
+import os
+import sys
 import time
+import queue
+import argparse
+import threading
+import numpy as np
+from waveform_data import WaveformData
+from profiler import profiler
+
+# Binary recording format (.hsr), little-endian:
+#   header: header_dtype(num_channels), whose size is in its header_size field
+#   then one fixed-size record_dtype(...) record per event, so event n starts at header_size + n * record_size
+# A file only holds events of one layout (channels, samples, format, time step); the recorder starts
+# the next part when it changes. num_events is filled in when the file is closed; for a file that
+# wasn't closed properly, readers count the complete records instead.
+MAGIC = b'HSPREC01'
+FORMAT_VERSION = 1
+SAMPLE_FORMATS = {'float32': '<f4', 'int16': '<i2'}
+
+
+def header_dtype(num_channels):
+    return np.dtype([
+        ('magic', 'S8'),
+        ('version', '<u4'),
+        ('header_size', '<u4'),
+        ('num_events', '<u8'),
+        ('record_size', '<u8'),
+        ('num_channels', '<u4'),
+        ('num_samples', '<u4'),
+        ('sample_format', 'S8'),
+        ('yscale', '<f8'),  # int16 samples are in ADC counts, multiply by this to get volts
+        ('nsunits', '<f8'),  # x values are in ns / nsunits, like in the GUI
+        ('dx', '<f8', (num_channels,)),
+    ])
+
+
+def record_dtype(num_channels, num_samples, sample_format):
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('seqnum', '<u8'),
+        ('vline', '<f8'),
+        ('x0', '<f8', (num_channels,)),
+        ('visible', 'u1', (num_channels,)),
+        ('y', SAMPLE_FORMATS[sample_format], (num_channels, num_samples)),
+    ], align=True)
+
+
+NUM_EVENTS_OFFSET = header_dtype(1).fields['num_events'][1]
+
+
+class RecordWriter(threading.Thread):
+    """
+    Writes recorded events to a file from its own thread, so the GUI thread only copies each event once.
+    The queue is bounded: if the disk can't keep up, record_event() blocks, and the acquisition ring
+    behind it fills up and holds off readout, rather than events being dropped.
+    """
+
+    def __init__(self, filename, queue_size=256, buffer_size=4 * 1024 * 1024):
+        super().__init__(daemon=True)
+        self.file = open(filename, 'wb', buffering=buffer_size)  # opened here so start() can report failures
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.num_events = None
+        self.error = None
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.error is None:
+                try:
+                    with profiler.span('recorder write'):
+                        self.file.write(data)
+                except OSError as e:
+                    self.error = e  # keep draining the queue, so the GUI thread never blocks on it
+        try:
+            if self.error is None and self.num_events is not None:
+                self.file.seek(NUM_EVENTS_OFFSET)
+                self.file.write(np.uint64(self.num_events).tobytes())
+            self.file.close()
+        except OSError as e:
+            self.error = e
+
+    def put(self, data):
+        self.queue.put(data)
+
+    def close(self, num_events):
+        """Writes what is still queued, fills in the event count of the header and closes the file."""
+        self.num_events = num_events
+        self.queue.put(None)
+        self.join()
 
 
 class DataRecorder:
     def __init__(self, state):
         self.state = state
         self.is_recording = False
-        self.file_handle = None
+        self.file_handle = None  # for csv
+        self.writer = None  # for the binary formats
+        self.filename = ""
+        self.format = None  # state.recorder_format when the recording was started
+        self.layout = None  # (num_channels, num_samples, dx) of the binary file being written
         self.event_count = 0
-        self.event_count_max = 1000
+        self.event_count_max = 1000  # events per csv file
         self.file_part = 0
         self.base_filename = ""
 
@@ -27,9 +122,17 @@ class DataRecorder:
         self.file_part += 1
         self.event_count = 0
 
+        if self.file_part == 1:
+            self.format = self.state.recorder_format
         try:
-            filename = f"{self.base_filename}_part_{self.file_part}.csv"
-            self.file_handle = open(filename, 'w')
+            if self.format == 'csv':
+                self.filename = f"{self.base_filename}_part_{self.file_part}.csv"
+                self.file_handle = open(self.filename, 'w')
+            else:
+                self.filename = f"{self.base_filename}_part_{self.file_part}.hsr"
+                self.writer = RecordWriter(self.filename)
+                self.writer.start()
+                self.layout = None  # the header is written with the first event
             self.is_recording = True
             #print(f"Recording started to {filename}")
             return True
@@ -42,17 +145,93 @@ class DataRecorder:
         if self.is_recording and self.file_handle:
             self.file_handle.close()
             #print(f"Recording stopped. File {self.file_handle.name} closed.")
+        if self.writer is not None:
+            self.writer.close(self.event_count)
+            if self.writer.error is not None:
+                print(f"Recording to {self.filename} failed: {self.writer.error}")
         self.file_handle = None
+        self.writer = None
         self.is_recording = False
         # Reset file part counter when recording is manually stopped
         if reset: self.file_part = 0
 
-    def record_event(self, xydata, vline_val, visible_lines):
+    def _num_samples(self):
+        # Determine the number of valid samples based on the mode of the first board
+        # This is a simplification; assumes all boards are in the same mode.
+        board_idx = 0
+        if self.state.dotwochannel[board_idx]:
+            return self.state.expect_samples * 20  # xydata.num_samples // 2
+        else:
+            return self.state.expect_samples * 40  # xydata.num_samples
+
+    @profiler.timed('recorder')
+    def record_event(self, xydata, vline_val, visible_lines, timestamp=None):
+        """Writes the data for the current event to the file, in the format state.recorder_format had at start()."""
+        if not self.is_recording:
+            return
+        if self.format == 'csv':
+            self._record_event_csv(xydata, vline_val, visible_lines)
+        else:
+            self._record_event_binary(xydata, vline_val, visible_lines, timestamp)
+
+    def _record_event_binary(self, xydata, vline_val, visible_lines, timestamp):
+        if self.writer is None:
+            return
+        if self.writer.error is not None:
+            print(f"Recording to {self.filename} failed: {self.writer.error}")
+            self.stop()
+            return
+
+        s = self.state
+        sample_format = self.format
+        num_channels = s.num_board * s.num_chan_per_board
+        num_samples = self._num_samples()
+        layout = (num_channels, num_samples, tuple(xydata.dx[:num_channels]))
+
+        # A file only holds one layout, so start the next part if it changed
+        if self.layout is not None and layout != self.layout:
+            self.stop(reset=False)
+            self.start()
+            if self.writer is None:
+                return
+        if self.layout is None:
+            self.layout = layout
+            header = np.zeros((), dtype=header_dtype(num_channels))
+            header['magic'] = MAGIC
+            header['version'] = FORMAT_VERSION
+            header['header_size'] = header.nbytes
+            header['record_size'] = record_dtype(num_channels, num_samples, sample_format).itemsize
+            header['num_channels'] = num_channels
+            header['num_samples'] = num_samples
+            header['sample_format'] = sample_format.encode()
+            header['yscale'] = s.yscale
+            header['nsunits'] = s.nsunits
+            header['dx'] = xydata.dx[:num_channels]
+            self.writer.put(header.tobytes())
+
+        record = np.empty((), dtype=record_dtype(num_channels, num_samples, sample_format))
+        record['timestamp'] = time.time() if timestamp is None else timestamp
+        record['seqnum'] = s.nevents
+        record['vline'] = vline_val
+        record['x0'] = xydata.x0[:num_channels]
+        visible = np.zeros(num_channels, dtype=np.uint8)
+        visible[:len(visible_lines)] = visible_lines[:num_channels]
+        record['visible'] = visible
+        y = xydata.y[:num_channels, :num_samples]
+        if sample_format == 'int16':
+            # ADC counts, which is lossless unless the LPF or the oversampling corrections changed the samples
+            np.clip(np.rint(y / s.yscale), -32768, 32767, out=record['y'], casting='unsafe')
+        else:
+            record['y'] = y
+        self.writer.put(record)
+        self.event_count += 1
+
+    def _record_event_csv(self, xydata, vline_val, visible_lines):
         """
         Writes the data for the current event to the file in a CSV-like format.
         Format: vline_pos, x0, y0, x1, y1, ..., xN, yN, on/off_ch1, on/off_ch2, ...
         """
-        if not self.is_recording or self.file_handle is None:
+        if self.file_handle is None:
             return
 
         # Check if we need to roll over to a new file
@@ -63,30 +242,130 @@ class DataRecorder:
 
         s = self.state
         num_channels = s.num_board * s.num_chan_per_board
-        line_parts = [str(vline_val)]
+        num_samples = self._num_samples()
+        x_data = [xydata.x(i, num_samples) for i in range(num_channels)]
+        y_data = [xydata.y[i][:num_samples] for i in range(num_channels)]
+        self.file_handle.write(format_csv_line(vline_val, x_data, y_data, visible_lines))
+        self.event_count += 1
 
-        # Determine the number of valid samples based on the mode of the first board
-        # This is a simplification; assumes all boards are in the same mode.
-        board_idx = 0
-        if s.dotwochannel[board_idx]:
-            num_samples = self.state.expect_samples * 20  # xydata.shape[2] // 2
+
+def format_csv_line(vline_val, x_data, y_data, visible_lines):
+    """One event as a line of the csv format, from per-channel x and y arrays."""
+    line_parts = [str(vline_val)]
+    for x_ch, y_ch in zip(x_data, y_data):
+        for x, y in zip(x_ch, y_ch):
+            line_parts.append(f"{x:.4f}")
+            line_parts.append(f"{y:.4f}")
+
+    # Append visibility status for each line
+    for is_visible in visible_lines:
+        if is_visible:
+            line_parts.append("on")
         else:
-            num_samples = self.state.expect_samples * 40  # xydata.shape[2]
+            line_parts.append("off")
+    return ','.join(line_parts) + '\n'
 
-        for i in range(num_channels):
-            x_data = xydata[i][0][:num_samples]
-            y_data = xydata[i][1][:num_samples]
 
-            for x, y in zip(x_data, y_data):
-                line_parts.append(f"{x:.4f}")
-                line_parts.append(f"{y:.4f}")
+class RecordingReader:
+    """
+    Reads a binary recording (.hsr) written by DataRecorder.
 
-        # Append visibility status for each line
-        for is_visible in visible_lines:
-            if is_visible:
-                line_parts.append("on")
-            else:
-                line_parts.append("off")
+    The event records are memory-mapped, so opening even a multi-GB file is instant, and only the
+    pages of the events (or the channels and samples of an event) that are accessed get read.
 
-        self.file_handle.write(','.join(line_parts) + '\n')
-        self.event_count += 1
+        reader = RecordingReader("HaasoscopePro_data_..._part_1.hsr")
+        reader[1234]['xydata'].y[0]  # WaveformData, with y in volts
+        reader.samples(1234, channels=slice(2, 4), start=1000, stop=2000)
+        for event in reader: ...
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            start = np.frombuffer(f.read(header_dtype(0).itemsize), dtype=header_dtype(0), count=1)[0]
+            if start['magic'] != MAGIC:
+                raise ValueError(f"{filename} is not a HaasoscopePro recording")
+            if start['version'] > FORMAT_VERSION:
+                raise ValueError(f"{filename} has format version {start['version']}, newer than this software")
+            f.seek(0)
+            self.header = np.frombuffer(f.read(int(start['header_size'])), dtype=header_dtype(int(start['num_channels'])),
+                                        count=1)[0]
+        self.num_channels = int(self.header['num_channels'])
+        self.num_samples = int(self.header['num_samples'])
+        self.sample_format = self.header['sample_format'].decode()
+        self.record_dtype = record_dtype(self.num_channels, self.num_samples, self.sample_format)
+        self.header_size = int(self.header['header_size'])
+        self.dx = self.header['dx'].copy()
+        num_complete = max(os.path.getsize(filename) - self.header_size, 0) // self.record_dtype.itemsize
+        # num_events is 0 if the file wasn't closed, and a truncated file can have fewer records
+        self.num_events = min(int(self.header['num_events']), num_complete) or num_complete
+        if self.num_events:
+            self.records = np.memmap(filename, dtype=self.record_dtype, mode='r', offset=self.header_size,
+                                     shape=(self.num_events,))
+        else:
+            self.records = np.zeros(0, dtype=self.record_dtype)
+
+    def __len__(self):
+        return self.num_events
+
+    def read_records(self, start, count):
+        """The raw structured records of events start to start + count, as a view of the file."""
+        return self.records[start:start + count]
+
+    def timestamp(self, n):
+        """The timestamp of event n, reading nothing else of it."""
+        return float(self.records['timestamp'][n])
+
+    def samples(self, n, channels=slice(None), start=0, stop=None):
+        """The y samples (in volts) of a range of channels and samples of event n, reading only those."""
+        y = self.records['y'][n, channels, start:stop]
+        if self.sample_format == 'int16':
+            return (y * self.header['yscale']).astype(np.float32)
+        return np.array(y)
+
+    def event(self, record):
+        """A record as a dict like the history buffer entries, with the samples as a float WaveformData."""
+        if self.sample_format == 'int16':
+            y = (record['y'] * self.header['yscale']).astype(np.float32)
+        else:
+            y = record['y'].copy()
+        return {
+            'timestamp': float(record['timestamp']),
+            'seqnum': int(record['seqnum']),
+            'vline': float(record['vline']),
+            'visible': record['visible'].astype(bool),
+            'xydata': WaveformData.from_arrays(y, record['x0'].copy(), self.dx),
+        }
+
+    def __getitem__(self, n):
+        if n < 0: n += self.num_events
+        if not 0 <= n < self.num_events:
+            raise IndexError(f"event {n} out of range, the file has {self.num_events}")
+        return self.event(self.records[n])
+
+    def __iter__(self):
+        for n in range(self.num_events):
+            yield self.event(self.records[n])
+
+
+def export_csv(filename, csv_filename=None):
+    """Converts a binary recording to the csv format the recorder used to write."""
+    reader = RecordingReader(filename)
+    csv_filename = csv_filename or os.path.splitext(filename)[0] + ".csv"
+    with open(csv_filename, 'w') as f:
+        for event in reader:
+            xydata = event['xydata']
+            x_data = [xydata.x(i, dtype=np.float64) for i in range(reader.num_channels)]
+            f.write(format_csv_line(event['vline'], x_data, xydata.y, event['visible']))
+    return csv_filename, len(reader)
+
+
+if __name__ == '__main__':
+    # Usage (from the software directory): python data_recorder.py recording.hsr [recording.csv]
+    parser = argparse.ArgumentParser(description="Export a HaasoscopePro binary recording (.hsr) to csv")
+    parser.add_argument("filename")
+    parser.add_argument("csv_filename", nargs='?')
+    args = parser.parse_args()
+    out, n = export_csv(args.filename, args.csv_filename)
+    print(f"Wrote {n} events to {out}")
+    sys.exit(0)
@@ -26,11 +26,12 @@ class UsbSocketAdapter:
         self.serial = socket_addr.encode()  # Store address as "serial"
         self.socket_addr = socket_addr
         self.beta = None
+        self.access_guard = None  # Set by HardwareController to serialize access with the acquisition thread
         self._socket: Optional[socket.socket] = None
         self._recv_timeout = 250  # ms
         self._send_timeout = 2000  # ms
         self.good = False
-        self._buffer = b""  # Internal buffer for any excess data from recv
+        self._buffer = bytearray()  # Internal buffer for any excess data from recv
 
         # Try to connect
         self._connect()
@@ -43,6 +44,7 @@ class UsbSocketAdapter:
 
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._socket.connect((host, port))
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # commands are small, send them right away
 
             # Set socket timeouts
             self._socket.settimeout(self._recv_timeout / 1000.0)
@@ -85,7 +87,7 @@ class UsbSocketAdapter:
 
     def flush_buffer(self):
         """Clear the internal buffer AND drain any data from the socket. Used when expect_samples changes (e.g., during pllreset)."""
-        self._buffer = b""
+        self._buffer.clear()
         # Try to drain any pending data from the socket without blocking
         if self._socket:
             old_timeout = self._socket.gettimeout()
@@ -120,6 +122,7 @@ class UsbSocketAdapter:
         """
         if not self.good or not self._socket:
             return 0
+        if self.access_guard: self.access_guard.claim()
 
         try:
             self._socket.sendall(data)
@@ -141,52 +144,59 @@ class UsbSocketAdapter:
         Returns:
             bytes: Received data (exactly recv_len bytes if available, or less if timeout/error)
         """
+        buffer = bytearray(recv_len)
+        n = self.recv_into(buffer, recv_len)
+        return bytes(buffer) if n == recv_len else bytes(buffer[:n])
+
+    def recv_into(self, buffer, recv_len: Optional[int] = None) -> int:
+        """
+        Receive data from the server directly into a writable buffer (e.g. a reusable bytearray),
+        looping until recv_len bytes are received or timeout. Nothing is allocated per call.
+
+        Args:
+            buffer: A writable buffer at least recv_len bytes long
+            recv_len (int): Number of bytes to receive, defaults to the size of the buffer
+
+        Returns:
+            int: Number of bytes received (recv_len if available, or less if timeout/error)
+        """
         if not self.good or not self._socket:
-            return b""
+            return 0
+        if self.access_guard: self.access_guard.claim()
 
-        try:
-            data = self._buffer  # Start with any leftover data from previous recv
-            self._buffer = b""  # Clear the buffer
-
-            # For large data reads, use a longer timeout to ensure we get all data
-            # This is critical for data transfers during PLL calibration
-            if recv_len > 1000:
-                old_timeout = self._socket.gettimeout()
-                self._socket.settimeout(1.0)  # 1 second for large transfers
-
-            # Read data until we have enough
-            while len(data) < recv_len:
-                remaining = recv_len - len(data)
-                chunk = self._socket.recv(min(remaining, 65536))  # Recv in 64KB chunks
-                if not chunk:
-                    # Socket closed
-                    break
-                data += chunk
+        view = memoryview(buffer).cast('B')
+        if recv_len is None:
+            recv_len = len(view)
 
-            # Restore original timeout for large reads
-            if recv_len > 1000:
-                self._socket.settimeout(old_timeout)
+        # Start with any leftover data from previous reads
+        got = min(len(self._buffer), recv_len)
+        if got:
+            view[:got] = self._buffer[:got]
+            del self._buffer[:got]
 
-            # Return exactly recv_len bytes, save any excess for next call
-            if len(data) > recv_len:
-                self._buffer = data[recv_len:]
-                return data[:recv_len]
-            else:
-                return data
+        # For large data reads, use a longer timeout to ensure we get all data
+        # This is critical for data transfers during PLL calibration
+        old_timeout = self._socket.gettimeout()
+        if recv_len > 1000:
+            self._socket.settimeout(1.0)  # 1 second for large transfers
 
+        try:
+            # Read data until we have enough, straight into the caller's buffer
+            while got < recv_len:
+                n = self._socket.recv_into(view[got:recv_len], min(recv_len - got, 65536))  # Recv in 64KB chunks
+                if not n:
+                    # Socket closed
+                    break
+                got += n
         except socket.timeout:
             # Timeout - for small reads this is ok, but for large reads it's a problem
             # Just return what we have
-            if len(self._buffer) > 0:
-                data = self._buffer[:recv_len]
-                self._buffer = self._buffer[recv_len:]
-                return data
-            return b""
+            pass
         except Exception as e:
             print(f"Receive error: {e}")
             self.good = False
-            if len(self._buffer) > 0:
-                data = self._buffer[:recv_len]
-                self._buffer = self._buffer[recv_len:]
-                return data
-            return b""
+        finally:
+            # Restore original timeout for large reads
+            if recv_len > 1000 and self._socket:
+                self._socket.settimeout(old_timeout)
+        return got
@@ -6,6 +6,7 @@ This package provides testing utilities for HaasoscopeProQt without physical har
 Components:
   - dummy_server: TCP socket server simulating oscilloscope board
   - USB_Socket: Socket adapter implementing USB-compatible interface
+  - readout_benchmark: Round trips per event of the readout path against dummy_server
 """
 
 __version__ = "1.0"
@@ -0,0 +1,196 @@
+"""
+Correctness and speed of the vectorized event decoder against the original per-block loop.
+
+Decodes raw events from the dummy server with DataProcessor.process_board_data and with the
+original decoder (struct.unpack and a Python loop over the sample blocks, kept here as the
+reference), over single and two-channel boards, trigger positions and phases, merging counters,
+external trigger and oversampling corrections, and events with bad clock and strobe words. Asserts
+that both fill the same samples bit for bit in float64 (float32 is compared within float32
+precision, since the new decoder scales directly in the waveform dtype) and count the same bad
+clocks and strobes, then prints the time per event of each.
+
+Usage (from the software directory):
+    python dummy_scope/decoder_benchmark.py --samples 100 1000 --events 200
+"""
+
+import os
+import sys
+import time
+import struct
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dummy_scope.dummy_server import DummyOscilloscopeServer
+from data_processor import DataProcessor, EventReadout
+from scope_state import ScopeState
+from waveform_data import WaveformData
+
+
+class ReferenceDecoder(DataProcessor):
+    """The sample unpacking and clock checks of the original decoder, one block at a time."""
+
+    def process_board_data(self, data, board_idx, xy_data_array, readout, stabilizer=None):
+        state = self.state
+
+        board_to_use = readout.trigger_reference(state, board_idx)
+        sample_triggered = readout.sample_triggered[board_to_use]
+        triggerphase = readout.triggerphase[board_to_use] // (2 if state.dotwochannel[board_idx] else 1)
+
+        # Unpack raw 16-bit integers and scale to plotting units
+        unpackedsamples = struct.unpack('<' + 'h' * (len(data) // 2), data)
+        npunpackedsamples = np.array(unpackedsamples, dtype='float') * state.yscale
+
+        if state.dooversample[board_idx] and board_idx % 2 == 1:
+            primary_board_idx = board_idx - 1
+            npunpackedsamples += state.extrigboardmeancorrection[primary_board_idx]
+            npunpackedsamples *= state.extrigboardstdcorrection[primary_board_idx]
+
+        downsampleoffset = self._calculate_downsample_offset(sample_triggered, readout.downsamplemergingcounter[board_idx],
+                                                             board_idx)
+
+        datasize = xy_data_array.num_samples
+        nbadclkA, nbadclkB, nbadclkC, nbadclkD, nbadstr = 0, 0, 0, 0, 0
+        for s in range(0, state.expect_samples + state.expect_samples_extra):
+
+            # Check clock and strobe validity
+            vals = unpackedsamples[s * self.nsubsamples + 40: s * self.nsubsamples + 50]
+            if vals[9] != -16657:
+                raise RuntimeError(f"Data corrupted. No BEEF.")
+            if vals[8] != 0 or (self.lastclk != 341 and self.lastclk != 682):
+                for n in range(0, 8):
+                    val = vals[n]
+                    if n < 4:
+                        if val != 341 and val != 682:  # Expected clock patterns
+                            if n == 0: nbadclkA += 1
+                            if n == 1: nbadclkB += 1
+                            if n == 2: nbadclkC += 1
+                            if n == 3: nbadclkD += 1
+                        self.lastclk = val
+                    elif val not in {0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512}:  # Strobe should be one-hot
+                        nbadstr += 1
+
+            if state.dotwochannel[board_idx]:
+                samp, nsamp, nstart = s * 20 - downsampleoffset - triggerphase, 20, 0
+                if samp < 0: nsamp, nstart, samp = 20 + samp, -samp, 0
+                if samp + nsamp >= datasize: nsamp = datasize - samp
+                if 0 < nsamp <= 20:
+                    c1_idx, c2_idx = board_idx * 2, board_idx * 2 + 1
+                    xy_data_array.y[c1_idx][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+20+nstart: s*self.nsubsamples+20+nstart+nsamp]
+                    xy_data_array.y[c2_idx][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+nstart: s*self.nsubsamples+nstart+nsamp]
+            else:
+                samp, nsamp, nstart = s * 40 - downsampleoffset - triggerphase, 40, 0
+                if samp < 0: nsamp, nstart, samp = 40 + samp, -samp, 0
+                if samp + nsamp >= datasize: nsamp = datasize - samp
+                if 0 < nsamp <= 40:
+                    c_idx = board_idx * 2
+                    xy_data_array.y[c_idx][samp:samp + nsamp] = npunpackedsamples[s*self.nsubsamples+nstart: s*self.nsubsamples+nstart+nsamp]
+
+        return nbadclkA, nbadclkB, nbadclkC, nbadclkD, nbadstr
+
+
+def make_events(state, num_events, corrupt):
+    """Raw events from the dummy server, with bad clock and strobe words and set flag words if corrupt."""
+    server = DummyOscilloscopeServer()
+    expect_len = (state.expect_samples + state.expect_samples_extra) * 2 * 50
+    events = []
+    for _ in range(num_events):
+        words = np.frombuffer(server._handle_read_data(struct.pack("<II", 0, expect_len)), dtype='<i2').copy()
+        if corrupt:
+            blocks = words.reshape(-1, 50)
+            for _ in range(random.randint(0, 4)):
+                blocks[random.randrange(len(blocks)), 48] = 1  # flag word
+            for _ in range(random.randint(0, 4)):
+                blocks[random.randrange(len(blocks)), random.randrange(40, 48)] = random.choice((0, 3, 340, 1023))
+        events.append(words.tobytes())
+    return events
+
+
+def make_readout(num_boards):
+    readout = EventReadout(num_boards)
+    readout.sample_triggered[:] = [random.randrange(10) for _ in range(num_boards)]
+    readout.triggerphase[:] = [random.randrange(8) for _ in range(num_boards)]
+    readout.downsamplemergingcounter[:] = [random.randrange(4) for _ in range(num_boards)]
+    readout.noextboard = 0
+    return readout
+
+
+def configurations():
+    """(name, setup) pairs, setup adjusting a two-board ScopeState."""
+    def single(state): pass
+
+    def twochannel(state):
+        state.dotwochannel[:] = [True, True]
+
+    def exttrig(state):
+        state.doexttrig[1] = True
+        state.toff[1] = 37
+        state.lvdstrigdelay[1] = 11.5
+
+    def oversample(state):
+        state.dooversample[:] = [True, True]
+        state.extrigboardmeancorrection[0] = 0.0123
+        state.extrigboardstdcorrection[0] = 1.0071
+
+    def merging(state):
+        state.downsamplemerging = 4
+        state.triggershift = 1
+
+    return [("single channel", single), ("two channel", twochannel), ("ext trig", exttrig),
+            ("oversample", oversample), ("merging", merging)]
+
+
+def decode(decoder, events, readouts, num_samples, dtype):
+    """Decodes the events in order (the clock check carries over between them), returning all samples and counts."""
+    ys, counts = [], []
+    elapsed = 0.0
+    for data_map, readout in zip(events, readouts):
+        xydata = WaveformData(4, num_samples, dtype)
+        start = time.perf_counter()
+        for board_idx in (0, 1):
+            counts.append(decoder.process_board_data(data_map[board_idx], board_idx, xydata, readout))
+        elapsed += time.perf_counter() - start
+        ys.append(xydata.y)
+    return np.array(ys), counts, elapsed / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized event decoder against the original per-block loop")
+    parser.add_argument("--samples", type=int, nargs="+", default=[100, 1000], help="expect_samples values to test")
+    parser.add_argument("--events", type=int, default=50, help="Events per configuration")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(f"{'configuration':>15} {'depth':>6} {'dtype':>8} {'reference (ms)':>15} {'vectorized (ms)':>16} {'speedup':>8}")
+    for name, setup in configurations():
+        for depth in args.samples:
+            for dtype in ('float64', 'float32'):
+                state = ScopeState(2, 2)
+                state.expect_samples = depth
+                state.waveform_dtype = dtype
+                state.trig_stabilizer_enabled = False  # same code in both, and it only sets x0
+                setup(state)
+                board_events = [make_events(state, args.events, corrupt=True) for _ in (0, 1)]
+                events = [{0: b0, 1: b1} for b0, b1 in zip(*board_events)]
+                readouts = [make_readout(2) for _ in events]
+                num_samples = 4 * 10 * depth
+
+                y_ref, counts_ref, t_ref = decode(ReferenceDecoder(state), events, readouts, num_samples, 'float64')
+                y_new, counts_new, t_new = decode(DataProcessor(state), events, readouts, num_samples, dtype)
+                assert counts_new == counts_ref, f"{name}: bad clock/strobe counts differ"
+                if dtype == 'float64':
+                    assert np.array_equal(y_new, y_ref), f"{name}, depth {depth}: samples differ"
+                else:
+                    # Scaled (and corrected) in float32 instead of rounded to it at the end
+                    eps = np.finfo(np.float32).eps
+                    assert np.allclose(y_new, y_ref, rtol=4 * eps, atol=4 * eps * np.max(np.abs(y_ref))), \
+                        f"{name}, depth {depth}: float32 samples differ by more than float32 precision"
+                print(f"{name:>15} {depth:6d} {dtype:>8} {t_ref * 1e3:15.3f} {t_new * 1e3:16.3f} {t_ref / t_new:7.1f}x")
+    print("All outputs match the reference decoder.")
+
+
+if __name__ == "__main__":
+    main()
@@ -107,6 +107,8 @@ class DummyOscilloscopeServer:
                 try:
                     self.server_socket.settimeout(1.0)
                     client_socket, client_addr = self.server_socket.accept()
+                    # Replies to pipelined commands are sent back to back, don't let Nagle hold them
+                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                     client_name = f"{client_addr[0]}:{client_addr[1]}"
                     self.clients[client_socket] = client_name
                     print(f"[DUMMY SERVER] Client connected: {client_name}")
@@ -131,6 +133,12 @@ class DummyOscilloscopeServer:
         try:
             while self.running:
                 data = client_socket.recv(8)  # All commands are 8 bytes
+                # Commands may be pipelined by the client, so one may arrive split across reads
+                while data and len(data) < 8:
+                    more = client_socket.recv(8 - len(data))
+                    if not more:
+                        break
+                    data += more
                 if not data or len(data) < 8:
                     break
 
@@ -0,0 +1,130 @@
+"""
+Speed of the persist heatmap accumulation, against the original per-sample loops.
+
+Fills HeatmapManager with persist lines of the dummy server's waveforms (8 channels with 100 lines
+each by default, as with a long persist time on all channels), and times regenerating all channels
+and the remove plus add of one trace that every new event does, with HeatmapManager and with the
+original Python loops (kept here as the reference). Asserts that both give the same counts.
+The image rendering is left out, it is the same for both.
+
+Usage (from the software directory):
+    python dummy_scope/heatmap_benchmark.py --channels 8 --lines 100 --samples 4000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyqtgraph.Qt import QtWidgets
+import pyqtgraph as pg
+from dummy_scope.dummy_server import DummyOscilloscopeServer
+from heatmap_manager import HeatmapManager
+from scope_state import ScopeState
+
+
+def reference_bins(heatmap, x, y, ranges):
+    """The bins of the samples within the x range, as the original loops computed them."""
+    (x_min, x_max), (y_min, y_max) = ranges
+    mask = (x >= x_min) & (x <= x_max)
+    bins_y, bins_x = heatmap.shape
+    x_bins = np.clip(((x[mask] - x_min) / (x_max - x_min) * bins_x).astype(int), 0, bins_x - 1)
+    y_bins = np.clip(((y[mask] - y_min) / (y_max - y_min) * bins_y).astype(int), 0, bins_y - 1)
+    return x_bins, y_bins
+
+
+def reference_add(heatmap, x, y, ranges):
+    x_bins, y_bins = reference_bins(heatmap, x, y, ranges)
+    for xb, yb in zip(x_bins, y_bins):
+        if 0 <= xb < heatmap.shape[1] and 0 <= yb < heatmap.shape[0]:
+            heatmap[yb, xb] += 1
+
+
+def reference_remove(heatmap, x, y, ranges):
+    x_bins, y_bins = reference_bins(heatmap, x, y, ranges)
+    for xb, yb in zip(x_bins, y_bins):
+        if 0 <= xb < heatmap.shape[1] and 0 <= yb < heatmap.shape[0]:
+            heatmap[yb, xb] = max(0, heatmap[yb, xb] - 1)
+
+
+def make_lines(state, num_lines, num_samples):
+    """Persist lines (timestamp, x, y) of a noisy sine from the dummy server's generator."""
+    server = DummyOscilloscopeServer()
+    x = np.arange(num_samples) * (state.max_x - state.min_x) / num_samples + state.min_x
+    lines = []
+    for n in range(num_lines):
+        adc = np.array(server._generate_channel_waveform(0, num_samples, random.uniform(0, 2 * np.pi), 1, 1, 3.2),
+                       dtype=np.float64)
+        lines.append((n, x, adc * state.yscale))
+    return lines
+
+
+def timed(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persist heatmap accumulation against the original per-sample loops")
+    parser.add_argument("--channels", type=int, default=8, help="Channels with a heatmap")
+    parser.add_argument("--lines", type=int, default=100, help="Persist lines per channel")
+    parser.add_argument("--samples", type=int, default=4000, help="Samples per persist line")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    widget = pg.PlotWidget()
+    plot = widget.getPlotItem()
+    state = ScopeState(max(1, args.channels // 2), 2)
+    plot.setRange(xRange=(state.min_x, state.max_x), yRange=(state.min_y, state.max_y), padding=0)
+    manager = HeatmapManager(plot, state)
+    manager.update_image = lambda line_idx: None  # rendering is the same for both
+    lines = [make_lines(state, args.lines, args.samples) for _ in range(args.channels)]
+
+    # Regenerating all channels, e.g. after the view changed
+    new_regen = timed(lambda: [manager.regenerate(ch, lines[ch]) for ch in range(args.channels)], 3)
+    references = {}
+
+    def reference_regenerate():
+        for ch in range(args.channels):
+            heatmap = np.zeros_like(manager.persist_heatmap_data[ch], dtype=np.float64)
+            for _, x, y in lines[ch]:
+                reference_add(heatmap, x, y, manager.persist_heatmap_ranges[ch])
+            references[ch] = heatmap
+
+    old_regen = timed(reference_regenerate, 1)
+    for ch in range(args.channels):
+        assert np.array_equal(manager.persist_heatmap_data[ch], references[ch]), f"channel {ch}: regenerated counts differ"
+
+    # Per event and channel, the oldest persist line is removed and the new one added
+    ranges = manager.persist_heatmap_ranges[0]
+    oldest, newest = lines[0][0], lines[0][-1]
+
+    def new_update():
+        manager.remove_trace(oldest[1], oldest[2], 0)
+        manager.add_trace(newest[1], newest[2], 0)
+
+    def old_update():
+        reference_remove(references[0], oldest[1], oldest[2], ranges)
+        reference_add(references[0], newest[1], newest[2], ranges)
+
+    new_trace = timed(new_update, 10)
+    old_trace = timed(old_update, 10)
+    assert np.array_equal(manager.persist_heatmap_data[0], references[0]), "counts after remove and add differ"
+
+    print(f"{args.channels} channels x {args.lines} persist lines x {args.samples} samples "
+          f"(heatmap {manager.persist_heatmap_data[0].dtype}):")
+    print(f"  regenerate all channels: {old_regen * 1e3:9.1f} ms -> {new_regen * 1e3:7.1f} ms")
+    print(f"  remove + add one trace:  {old_trace * 1e3:9.2f} ms -> {new_trace * 1e3:7.2f} ms")
+    app.processEvents()
+
+
+if __name__ == "__main__":
+    main()
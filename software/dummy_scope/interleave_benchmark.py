@@ -0,0 +1,153 @@
+"""
+Speed of the interleaved (oversampling) merge in PlotManager.update_plots, against the original interp1d.
+
+Sets up 2, 4 and 8 boards as interleaved pairs, fills the boards with the dummy server's waveforms, and
+runs PlotManager.update_plots on them as the main loop does. The original merge (interleaving into
+xydatainterleaved, then an interp1d evaluated on a new linspace of its time axis, kept here as the
+reference) is timed on the same events. Asserts that update_plots puts the merged trace on the same
+time axis with the same samples (within the rounding of the linspace and interp1d), then prints the
+time per event of the reference merge, of the merge in update_plots, and of all of update_plots with
+and without drawing.
+The extra trigger stabilizer is off, it only moves the time axis and is the same for both.
+
+Usage (from the software directory):
+    python dummy_scope/interleave_benchmark.py --boards 2 4 8 --samples 250 1000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+from scipy.interpolate import interp1d
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyqtgraph.Qt import QtWidgets, loadUiType
+from dummy_scope.dummy_server import DummyOscilloscopeServer
+from plot_manager import PlotManager
+from scope_state import ScopeState
+from waveform_data import WaveformData
+
+WindowTemplate, TemplateBaseClass = loadUiType(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                            "HaasoscopePro.ui"))
+
+
+def reference_merge(state, xy_data, xydatainterleaved):
+    """The original merge of each interleaved pair: interleave, then interp1d onto a linspace of the time axis."""
+    merged = {}
+    for board_idx in range(0, state.num_board, 2):
+        li = board_idx * state.num_chan_per_board
+        xydatainterleaved.y[board_idx][0::2] = xy_data.y[li]
+        xydatainterleaved.y[board_idx][1::2] = xy_data.y[li + state.num_chan_per_board]
+        x_interleaved = xydatainterleaved.x(board_idx)
+        y_interleaved = xydatainterleaved.y[board_idx]
+        xdatanew = np.linspace(x_interleaved.min(), x_interleaved.max(), len(x_interleaved))
+        f_int = interp1d(x_interleaved, y_interleaved, kind='linear', bounds_error=False, fill_value=0.0)
+        merged[li] = (xdatanew, f_int(xdatanew))
+    return merged
+
+
+def new_merge(state, xy_data, xydatainterleaved):
+    """The merge of the interleave branch of PlotManager.update_plots."""
+    merged = {}
+    for board_idx in range(0, state.num_board, 2):
+        li = board_idx * state.num_chan_per_board
+        ydatanew = xydatainterleaved.y[board_idx]
+        ydatanew[0::2] = xy_data.y[li]
+        ydatanew[1::2] = xy_data.y[li + state.num_chan_per_board]
+        merged[li] = (xydatainterleaved.x(board_idx), ydatanew)
+    return merged
+
+
+def make_state(num_boards, expect_samples):
+    state = ScopeState(num_boards, 2)
+    state.expect_samples = expect_samples
+    state.extra_trig_stabilizer_enabled = False
+    for board_idx in range(num_boards):
+        state.dooversample[board_idx] = state.dointerleaved[board_idx] = True
+        if board_idx % 2 == 1:
+            for ch in range(state.num_chan_per_board):
+                state.channel_enabled[board_idx * state.num_chan_per_board + ch] = False
+    return state
+
+
+def make_events(state, num_events):
+    """WaveformData events of the dummy server's waveforms, with the primary and secondary boards half a sample apart."""
+    server = DummyOscilloscopeServer()
+    num_samples = 4 * 10 * state.expect_samples
+    num_ch = state.num_board * state.num_chan_per_board
+    events = []
+    for _ in range(num_events):
+        xy_data = WaveformData(num_ch, num_samples, state.waveform_dtype)
+        xy_data.set_time_axis(state.downsamplefactor / state.nsunits / state.samplerate)
+        for board_idx in range(0, state.num_board, 2):
+            adc = np.array(server._generate_channel_waveform(0, 2 * num_samples, random.uniform(0, 2 * np.pi), 1, 1,
+                                                             2 * state.samplerate), dtype=np.float64) * state.yscale
+            li = board_idx * state.num_chan_per_board
+            xy_data.y[li] = adc[0::2]
+            xy_data.y[li + state.num_chan_per_board] = adc[1::2]
+        events.append(xy_data)
+    return events
+
+
+def timed(func, events):
+    start = time.perf_counter()
+    for xy_data in events:
+        func(xy_data)
+    return (time.perf_counter() - start) / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interleaved merge of update_plots against the original interp1d")
+    parser.add_argument("--boards", type=int, nargs="+", default=[2, 4, 8], help="Board counts to test (even)")
+    parser.add_argument("--samples", type=int, nargs="+", default=[250, 1000], help="expect_samples values to test")
+    parser.add_argument("--events", type=int, default=20, help="Events per configuration")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    print(f"{'boards':>6} {'samples/board':>14} {'reference merge':>16} {'merge':>8} "
+          f"{'update_plots':>13} {'+ drawing':>10}  (ms per event)")
+    for num_boards in args.boards:
+        for expect_samples in args.samples:
+            window = TemplateBaseClass()
+            ui = WindowTemplate()
+            ui.setupUi(window)
+            state = make_state(num_boards, expect_samples)
+            plot_manager = PlotManager(ui, state)
+            plot_manager.setup_plots()
+            plot_manager.time_changed()
+            num_ch = state.num_board * state.num_chan_per_board
+            xydatainterleaved = WaveformData(num_ch, 2 * 4 * 10 * expect_samples, state.waveform_dtype)
+            xydatainterleaved.set_time_axis(0.5 * state.downsamplefactor / state.nsunits / state.samplerate)
+            events = make_events(state, args.events)
+
+            for xy_data in events:
+                reference = reference_merge(state, xy_data, xydatainterleaved)
+                plot_manager.update_plots(xy_data, xydatainterleaved, display=False)
+                for li, (x_ref, y_ref) in reference.items():
+                    x_new, y_new = plot_manager.stabilized_data_noresamp[li]
+                    # The linspace differs from the time axis by its rounding (in float32, up to an ulp), and
+                    # interp1d moves the samples by that fraction of a sample along the trace
+                    x_error = np.max(np.abs(x_new - x_ref))
+                    eps = np.finfo(x_new.dtype).eps
+                    assert x_error <= 2 * eps * np.max(np.abs(x_ref)), f"{num_boards} boards, line {li}: time axes differ"
+                    step = xydatainterleaved.dx[0]
+                    y_error = np.max(np.abs(np.diff(y_new))) * x_error / step + 4 * eps * np.max(np.abs(y_ref))
+                    assert np.max(np.abs(y_new - y_ref)) <= y_error, f"{num_boards} boards, line {li}: samples differ"
+
+            t_ref = timed(lambda xy_data: reference_merge(state, xy_data, xydatainterleaved), events)
+            t_new = timed(lambda xy_data: new_merge(state, xy_data, xydatainterleaved), events)
+            t_update = timed(lambda xy_data: plot_manager.update_plots(xy_data, xydatainterleaved, display=False), events)
+            t_draw = timed(lambda xy_data: plot_manager.update_plots(xy_data, xydatainterleaved, display=True), events)
+            print(f"{num_boards:6d} {4 * 10 * expect_samples:14d} {t_ref * 1e3:16.3f} {t_new * 1e3:8.3f} "
+                  f"{t_update * 1e3:13.3f} {t_draw * 1e3:10.3f}")
+            app.processEvents()
+    print("update_plots matches the reference merge.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Accuracy and speed of the frequency measurement on the dummy server's waveforms.
+
+Synthesizes sine, square and pulse train events with the dummy server's generators (with its noise),
+and compares the edge-based frequency estimate (EdgeIndex.period) with the FFT one
+(find_fundamental_frequency_scipy): the relative error and the time per measurement.
+
+With --throughput, instead measures the sustained rate of the measure all events mode: events read
+out by the dummy server are decoded with DataProcessor.process_board_data, as in the main loop, and
+measured in batches with DataProcessor.measure_events. Prints events/s for decoding alone (the most
+the main loop could acquire without USB), measuring alone, and both.
+
+Usage (from the software directory):
+    python dummy_scope/measurement_benchmark.py --samples 10000 --events 20
+    python dummy_scope/measurement_benchmark.py --throughput --boards 2 --samples 4000
+"""
+
+import os
+import sys
+import time
+import random
+import struct
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dummy_scope.dummy_server import DummyOscilloscopeServer
+from data_processor import DataProcessor, EventReadout, find_fundamental_frequency_scipy
+from edge_index import EdgeIndex
+from measurement_engine import STATISTICS, EVENT_BATCH_SAMPLES
+from scope_state import ScopeState
+from waveform_data import WaveformData
+
+SAMPLE_RATE = 3.2  # GS/s, single channel
+
+
+def generate(server, wave_type, frequency, num_samples):
+    """One event of a wave type at a frequency, from the dummy server's generators."""
+    if wave_type == "pulse":
+        # The server makes one pulse per event, so sum its pulses into a train at the frequency
+        config = server.channel_config[1]
+        period = SAMPLE_RATE * 1e9 / frequency
+        amplitude = (config["pulse_amplitude_min"] + config["pulse_amplitude_max"]) / 2.0
+        start = random.uniform(0, period)
+        samples = []
+        for i in range(num_samples):
+            t0 = start + period * ((i - start) // period)
+            val = server._generate_double_exponential_pulse(i, t0, amplitude, config["pulse_tau_rise"], config["pulse_tau_decay"])
+            samples.append(int(val + random.gauss(0, 0.01 * amplitude)))
+        return np.array(samples, dtype=np.float64)
+    server.channel_config[0]["wave_type"] = wave_type
+    server.channel_config[0]["frequency"] = frequency
+    return np.array(server._generate_channel_waveform(0, num_samples, random.uniform(0, 2 * np.pi), 1, 1, SAMPLE_RATE),
+                    dtype=np.float64)
+
+
+def edge_frequency(y, sampling_rate):
+    period = EdgeIndex(y).period()
+    return sampling_rate / period if period else find_fundamental_frequency_scipy(y, sampling_rate)
+
+
+def timed(func, *args, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / repeats
+
+
+def throughput(num_boards, num_samples, num_events, measurements):
+    """Events/s of decoding, of measuring in batches (measurements=None for none), and of both, one channel per board."""
+    state = ScopeState(num_boards, 2)
+    state.expect_samples = num_samples // 40
+    processor = DataProcessor(state)
+    readout = EventReadout(num_boards)
+    server = DummyOscilloscopeServer()
+    expect_len = (state.expect_samples + state.expect_samples_extra) * 2 * 50
+    raw_events = [server._handle_read_data(struct.pack("<II", 0, expect_len)) for _ in range(8)]
+    xydata = WaveformData(2 * num_boards, 40 * state.expect_samples, state.waveform_dtype)
+    channels = range(0, 2 * num_boards, 2)
+
+    start = time.perf_counter()
+    traces, batch_samples = {}, 0
+    for event in range(num_events):
+        for board_idx in range(num_boards):
+            processor.process_board_data(raw_events[event % len(raw_events)], board_idx, xydata, readout)
+        if measurements is None:
+            continue
+        # As MeasurementsManager.measure_event
+        for channel_index in channels:
+            traces.setdefault(channel_index, []).append(xydata.y[channel_index].copy())
+            batch_samples += xydata.num_samples
+        if batch_samples >= EVENT_BATCH_SAMPLES:
+            processor.measure_events(traces, measurements)
+            traces, batch_samples = {}, 0
+    if traces:
+        processor.measure_events(traces, measurements)
+    return num_events / (time.perf_counter() - start)
+
+
+def main_throughput(args):
+    decode_rate = throughput(args.boards, args.samples, args.events, None)
+    print(f"{args.boards} board(s), {args.samples} samples: decoding {decode_rate:.0f} events/s")
+    print(f"{'measurements':>18} {'measuring (events/s)':>21} {'decoding and measuring (events/s)':>34}")
+    for name, measurements in (("statistics", STATISTICS), ("statistics, Freq", STATISTICS + ("Freq", "Period"))):
+        both_rate = throughput(args.boards, args.samples, args.events, measurements)
+        # They take turns in the main loop, so measuring alone takes the difference of the times per event
+        measure_rate = 1.0 / (1.0 / both_rate - 1.0 / decode_rate)
+        print(f"{name:>18} {measure_rate:21.0f} {both_rate:34.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frequency measurement accuracy and speed on dummy server waveforms")
+    parser.add_argument("--samples", type=int, default=10000, help="Samples per event")
+    parser.add_argument("--events", type=int, help="Events per wave type and frequency (default 20), or in total for --throughput (2000)")
+    parser.add_argument("--frequencies", type=float, nargs="+", default=[1.7e6, 13.3e6, 57.1e6, 210e6],
+                        help="Frequencies to test, in Hz")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--throughput", action="store_true", help="Measure the sustained rate of the measure all events mode")
+    parser.add_argument("--boards", type=int, default=1, help="Boards for --throughput, one measured channel each")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.throughput:
+        args.events = args.events or 2000
+        main_throughput(args)
+        return
+    args.events = args.events or 20
+    server = DummyOscilloscopeServer()
+    sampling_rate = SAMPLE_RATE * 1e9
+
+    print(f"{'wave':>6} {'freq (MHz)':>11} {'FFT error':>10} {'edge error':>11} {'FFT (ms)':>9} {'edge (ms)':>10}")
+    for wave_type in ("sine", "square", "pulse"):
+        for frequency in args.frequencies:
+            errors = {'fft': [], 'edge': []}
+            times = {'fft': [], 'edge': []}
+            for _ in range(args.events):
+                y = generate(server, wave_type, frequency, args.samples)
+                for name, func in (('fft', find_fundamental_frequency_scipy), ('edge', edge_frequency)):
+                    found, seconds = timed(func, y, sampling_rate)
+                    errors[name].append(abs(found - frequency) / frequency)
+                    times[name].append(seconds)
+            print(f"{wave_type:>6} {frequency / 1e6:11.2f} {np.max(errors['fft']):10.2e} {np.max(errors['edge']):11.2e} "
+                  f"{np.mean(times['fft']) * 1e3:9.3f} {np.mean(times['edge']) * 1e3:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Microbenchmark of the event readout path against the dummy server.
+
+Runs HardwareController.get_event() in a loop with the classic and the batched readout,
+and reports events/s and USB round trips (replies waited for) per event and board.
+
+Usage (from the software directory):
+    python dummy_scope/readout_benchmark.py --latency 1.0 --cached
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dummy_scope.dummy_server import DummyOscilloscopeServer
+from dummy_scope.USB_Socket import UsbSocketAdapter
+from scope_state import ScopeState
+from hardware_controller import HardwareController
+
+
+class CountingSocketAdapter(UsbSocketAdapter):
+    """Counts writes and replies, and optionally adds a fixed latency to each reply like a USB round trip."""
+
+    def __init__(self, device_name, socket_addr, latency_ms=0.0):
+        super().__init__(device_name, socket_addr)
+        self.latency = latency_ms / 1000.0
+        self.sends = 0
+        self.round_trips = 0
+
+    def send(self, data):
+        self.sends += 1
+        return super().send(data)
+
+    def recv_into(self, buffer, recv_len=None):
+        # recv() goes through here too
+        self.round_trips += 1
+        if self.latency: time.sleep(self.latency)
+        return super().recv_into(buffer, recv_len)
+
+
+def run(controller, usbs, state, batched, duration):
+    state.batched_readout = batched
+    for _ in range(5):  # settle
+        controller.get_event()
+    for usb in usbs:
+        usb.sends = usb.round_trips = 0
+    nevents = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        data_map, rx_len, readout = controller.get_event()
+        if data_map:
+            nevents += 1
+            controller.release_event_buffers(data_map)
+    elapsed = time.perf_counter() - start
+    # Per board, since boards are read in parallel
+    round_trips = sum(usb.round_trips for usb in usbs) / len(usbs)
+    sends = sum(usb.sends for usb in usbs) / len(usbs)
+    return nevents / elapsed, round_trips / max(nevents, 1), sends / max(nevents, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event readout microbenchmark against the dummy server")
+    parser.add_argument("--port", type=int, default=9997, help="Port for the in-process dummy server")
+    parser.add_argument("--latency", type=float, default=0.0, help="Extra latency per round trip in ms (FT232H is ~1 ms)")
+    parser.add_argument("--cached", action="store_true",
+                        help="Reuse the generated waveform so synthesis time doesn't hide the transport cost")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per measurement")
+    parser.add_argument("--boards", type=int, default=1, help="Number of simulated boards (connections to the server)")
+    parser.add_argument("--depths", type=int, nargs="+", default=[100, 1000], help="expect_samples values to test")
+    args = parser.parse_args()
+
+    server = DummyOscilloscopeServer(port=args.port)
+    if args.cached:
+        generate, cache = server._handle_read_data, {}
+
+        def cached_read_data(data):
+            if data not in cache: cache[data] = generate(data)
+            return cache[data]
+
+        server._handle_read_data = cached_read_data
+    threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.5)
+
+    usbs = [CountingSocketAdapter("dummy", f"localhost:{args.port}", args.latency) for _ in range(args.boards)]
+    state = ScopeState(args.boards, 2)
+    state.paused = False
+    controller = HardwareController(usbs, state)
+
+    for depth in args.depths:
+        state.expect_samples = depth
+        for batched in (False, True):
+            rate, round_trips, sends = run(controller, usbs, state, batched, args.duration)
+            print(f"depth {depth:6d} {'batched' if batched else 'classic'}: {rate:8.1f} events/s, "
+                  f"{round_trips:.2f} round trips/event/board, {sends:.2f} writes/event/board")
+
+    controller.cleanup()
+    for usb in usbs:
+        usb.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
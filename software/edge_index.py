@@ -0,0 +1,146 @@
+# edge_index.py
+
+import numpy as np
+
+
+class EdgeIndex:
+    """
+    The threshold crossings of a trace, found once and shared by whatever needs edges of it: the
+    measurements (frequency, pulse width, rise/fall time), the trigger stabilizers and cursor snapping.
+
+    Crossings are kept as fractional sample positions, linearly interpolated between the samples on
+    either side of the level, with their direction. The 10%, 50% and 90% levels (and more, see
+    REFERENCE_FRACTIONS) of the trace's min to max range are found together in one vectorized pass
+    the first time level() is asked for; other levels (like the trigger threshold) are found when
+    their crossings are first asked for, and cached too. Since positions are in samples, an index
+    can be reused for the same samples at another time offset with moved().
+    """
+
+    # The 10/50/90% levels, and 40/60% for the hysteresis of period()
+    REFERENCE_FRACTIONS = (0.1, 0.4, 0.5, 0.6, 0.9)
+
+    def __init__(self, y, x0=0.0, dx=1.0):
+        """
+        Args:
+            y: The samples
+            x0: Time of the first sample
+            dx: Time between samples
+        """
+        self.y = np.asarray(y)
+        self.x0 = float(x0)
+        self.dx = float(dx)
+        self._crossings = {}  # Dictionary: {level: (positions, rising)}
+        self._levels = None  # The 10/50/90% levels, once found
+
+    @classmethod
+    def from_xy(cls, x, y):
+        """An index for samples y at the uniformly spaced times x."""
+        dx = (x[-1] - x[0]) / (len(x) - 1) if len(x) > 1 else 1.0
+        return cls(y, x[0] if len(x) else 0.0, dx)
+
+    def moved(self, x0):
+        """The same index for the samples starting at time x0 instead, sharing the crossings found so far."""
+        index = EdgeIndex.__new__(EdgeIndex)
+        index.__dict__.update(self.__dict__)
+        index.x0 = float(x0)
+        return index
+
+    def level(self, fraction):
+        """The level at fraction (one of REFERENCE_FRACTIONS) of the way from the min to the max of the trace."""
+        if self._levels is None:
+            self._find_reference_crossings()
+        return self._levels[self.REFERENCE_FRACTIONS.index(fraction)]
+
+    def _find_reference_crossings(self):
+        y = self.y
+        if len(y) == 0:
+            self._levels = [0.0] * len(self.REFERENCE_FRACTIONS)
+            return
+        y_min, y_max = float(np.min(y)), float(np.max(y))
+        self._levels = [y_min + fraction * (y_max - y_min) for fraction in self.REFERENCE_FRACTIONS]
+        # Count how many of the levels each sample is above, then the samples where that count changes
+        # are the crossings of all the levels, and between which two counts says which levels were crossed
+        band = np.zeros(len(y), dtype=np.int8)
+        for level in self._levels:
+            band += y > level
+        idx = np.flatnonzero(band[1:] != band[:-1])
+        band1, band2 = band[idx], band[idx + 1]
+        low, high = np.minimum(band1, band2), np.maximum(band1, band2)
+        for i, level in enumerate(self._levels):
+            if level not in self._crossings:
+                self._crossings[level] = self._interpolate(level, idx[(low <= i) & (i < high)])
+
+    def _interpolate(self, level, idx):
+        y1, y2 = self.y[idx], self.y[idx + 1]
+        positions = idx + (level - y1) / (y2 - y1)
+        return positions, y2 > y1
+
+    def crossings(self, level):
+        """
+        The crossings of a level, as (positions, rising): sorted fractional sample positions, and
+        whether each one is rising. Consecutive crossings alternate in direction.
+        """
+        level = float(level)
+        if level not in self._crossings:
+            above = self.y > level
+            self._crossings[level] = self._interpolate(level, np.flatnonzero(above[1:] != above[:-1]))
+        return self._crossings[level]
+
+    def positions(self, level, rising=None):
+        """The positions of the crossings of a level, only the rising or falling ones if rising is True or False."""
+        positions, is_rising = self.crossings(level)
+        return positions if rising is None else positions[is_rising == rising]
+
+    def times(self, level, rising=None):
+        """The times of the crossings of a level, only the rising or falling ones if rising is True or False."""
+        return self.x0 + self.positions(level, rising) * self.dx
+
+    def nearest(self, level, t, rising=None):
+        """The time of the crossing of a level nearest to time t (of one direction if rising is given), or None."""
+        times = self.times(level, rising)
+        if not len(times):
+            return None
+        i = np.searchsorted(times, t)
+        if i == len(times) or (i > 0 and t - times[i - 1] <= times[i] - t):
+            i -= 1
+        return float(times[i])
+
+    def pulse_width(self, t, level=None):
+        """
+        The width of the pulse at the crossing nearest to time t: the time to the next crossing (the
+        previous one if there's none after it). At the 50% level by default, 0 if there's no pulse.
+        """
+        level = self.level(0.5) if level is None else level
+        times = self.times(level)
+        if len(times) < 2:
+            return 0.0
+        i = int(np.argmin(np.abs(times - t)))
+        other = i + 1 if i + 1 < len(times) else i - 1
+        return abs(float(times[other] - times[i]))
+
+    def period(self, min_cycles=2):
+        """
+        The average period of a repetitive trace in samples, from its rising edges at the 50% level, or
+        None if it has fewer than min_cycles full cycles. With hysteresis: an edge only counts after the
+        trace was below the 40% level, and once it then gets above the 60% level, so noise near the
+        50% level can't make extra edges. Only the first and last edges and the number of cycles between
+        them set the result, so it's accurate to a small fraction of a sample.
+        """
+        lows = self.positions(self.level(0.4), rising=False)
+        highs = self.positions(self.level(0.6), rising=True)
+        mids = self.positions(self.level(0.5), rising=True)
+        if not len(lows) or not len(highs):
+            return None
+        # The first time the trace gets above 60% after each time it went below 40%
+        after = np.searchsorted(highs, lows)
+        highs = np.unique(highs[after[after < len(highs)]])
+        if len(highs) < min_cycles + 1:
+            return None
+        # The last time it went below 40% before each of those, and its first 50% rising crossing after that
+        lows = lows[np.searchsorted(lows, highs) - 1]
+        edges = mids[np.searchsorted(mids, lows)]
+        # A cycle that doesn't quite get through both levels is missed, making its interval twice (or more)
+        # as long, so count the cycles from the typical interval rather than the edges
+        intervals = np.diff(edges)
+        cycles = int(np.rint(intervals / np.median(intervals)).sum())
+        return float(edges[-1] - edges[0]) / cycles if cycles >= min_cycles else None
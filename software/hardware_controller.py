@@ -1,27 +1,75 @@
 # hardware_controller.py
 
 import os
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
 from usbs import *
 from board import *
 from pyqtgraph.Qt import QtCore
 from utils import find_longest_zero_stretch
+from acquisition_worker import UsbAccessGuard, RxBufferPool
+from data_processor import EventReadout
+from profiler import profiler
 
 class HardwareControllerSignals(QtCore.QObject):
     critical_error_occurred = QtCore.pyqtSignal(str, str) # title, message
 
+class BoardReader(threading.Thread):
+    """
+    Long-lived readout thread for one board, which owns that board's USB handle during get_event().
+
+    Each request runs one readout cycle (trigger check, predata and, if an event is ready, the samples)
+    and posts a (board, triggercounter, predata, data, readout) record to the shared results queue. data
+    and readout are None if the board had no event ready.
+    """
+
+    def __init__(self, controller, board, results):
+        super().__init__(daemon=True, name=f"BoardReader{board}")
+        self.controller = controller
+        self.board = board
+        self.requests = queue.SimpleQueue()
+        self.results = results
+
+    def run(self):
+        while True:
+            batched = self.requests.get()
+            if batched is None:
+                break
+            try:
+                record = self.controller._read_board(self.board, batched)
+            except:
+                print("Exception doing board readout!")
+                self.controller.got_exception = True
+                record = (self.board, None, None, None, None)
+            self.results.put(record)
+
+    def stop(self):
+        self.requests.put(None)
+
+
 class HardwareController:
     """Handles all direct communication with the Haasoscope hardware."""
 
+    PREDATA_COMMAND = bytes([2, 4, 100, 100, 100, 100, 100, 100])
+
     def __init__(self, usbs, state):
         self.usbs = usbs
         self.state = state
         self.num_board = len(usbs)
         self.signals = HardwareControllerSignals()
         self.use_external_clock = [False] * self.num_board
-        # Thread pool for parallel board operations - use enough threads for all boards
-        self.executor = ThreadPoolExecutor(max_workers=max(4, self.num_board * 2))
+        # One persistent reader thread per board for parallel event readout
+        self.reader_results = queue.SimpleQueue()
+        self.readers = [BoardReader(self, board, self.reader_results) for board in range(self.num_board)]
+        for reader in self.readers:
+            reader.start()
         self.got_exception = False
+        # Serializes USB access between the acquisition thread and commands sent from the GUI
+        self.usb_guard = UsbAccessGuard()
+        for usb in self.usbs:
+            usb.access_guard = self.usb_guard
+        # Reusable per-board receive buffers for event data, see release_event_buffers()
+        self.rx_buffers = [RxBufferPool() for _ in range(self.num_board)]
 
     def setup_all_boards(self):
         success = True
@@ -355,76 +403,83 @@ class HardwareController:
         state = self.state
         if state.paused:
             time.sleep(.1)
-            return None, 0
-
-        ready_event = [False] * self.num_board
-
-        # Process ext trig boards in parallel first using thread pool
-        def process_board(board):
-            try:
-                if self._get_channels(board):  # sends trigger info and checks for ready data
-                    ready_event[board] = True
-                    self._get_predata(board)  # gets downsamplemergingcounter and triggerphase
-            except:
-                print("Exception doing board pre-data!")
-                self.got_exception = True
-
-        futures = []
-        for board in range(self.num_board):
-            if state.doexttrig[board]:
-                futures.append(self.executor.submit(process_board, board))
-
-        # Wait for all ext trig boards to complete
-        for f in futures:
-            f.result()
-
-        # Then process non-ext trig boards in parallel using thread pool
-        futures = []
-        for board in range(self.num_board):
-            if not state.doexttrig[board]:
-                futures.append(self.executor.submit(process_board, board))
-
-        # Wait for all non-ext trig boards to complete
-        for f in futures:
-            f.result()
-
-        if not any(ready_event):
-            return None, 0
-
-        # Get data from all ready boards in parallel using thread pool
-        thedata = [bytes([])] * self.num_board
-
-        def get_board_data(board):
-            try:
-                if ready_event[board]:
-                    data = self._get_data(self.usbs[board])  # gets the actual event data
-                    thedata[board] = data
-            except:
-                print("Exception getting board data!")
-                self.got_exception = True
-
-        futures = []
-        for board in range(self.num_board):
-            futures.append(self.executor.submit(get_board_data, board))
-
-        # Wait for all data retrieval to complete
-        for f in futures:
-            f.result()
-
-        # Build data_map and find noextboard (sequential to maintain order)
+            return None, 0, None
+        self.usb_guard.claim()  # no-op on the acquisition thread, which already holds it
+        batched = state.batched_readout and not any(state.doexttrigecho)
+
+        # Ext trig boards do their readout cycle first, so they are armed before the self-triggering boards
+        records = []
+        for exttrig in (True, False):
+            boards = [board for board in range(self.num_board) if bool(state.doexttrig[board]) == exttrig]
+            for board in boards:
+                self.readers[board].requests.put(batched)
+            records += [self.reader_results.get() for _ in boards]
+
+        # Build data_map and the event's readout state, and find noextboard (in board order)
         data_map, total_len = {}, 0
-        state.noextboard = -1
-        for board in range(self.num_board):
-            if not ready_event[board]: continue
-            data = thedata[board]
+        readout = EventReadout(self.num_board)
+        for board, triggercounter, predata, data, values in sorted(records, key=lambda record: record[0]):
+            if data is None: continue
             data_map[board] = data
             total_len += len(data)
+            (readout.sample_triggered[board], readout.triggerphase[board],
+             readout.downsamplemergingcounter[board]) = values
             if not state.doexttrig[board]:
-                if state.noextboard == -1:
-                    state.noextboard = board  # remember the first board which is self-triggering
-        return (data_map, total_len) if data_map else (None, 0)
+                if readout.noextboard == -1:
+                    readout.noextboard = board  # remember the first board which is self-triggering
+        return (data_map, total_len, readout) if data_map else (None, 0, None)
+
+    def _read_board(self, board_idx, batched):
+        """
+        One readout cycle of a board, run on its BoardReader. Returns a (board, triggercounter, predata, data, readout)
+        record, where readout is the board's (sample_triggered, triggerphase, downsamplemergingcounter) for the event.
+
+        The classic cycle is one round trip each for the trigger check, predata and samples. The batched
+        cycle pipelines them into two: the trigger check and predata are written together and come back
+        in one recv, and the sample readout is followed in the same write by the check that re-arms the
+        trigger, so samples and that reply come back in a single recv into the board's buffer.
+        The firmware holds one event at a time, so samples are only requested once a check has said
+        the event is ready. The reply of the re-arming check is ignored, since it can still report
+        the event we just read out.
+        """
+        # Profiled as 'usb wait' for the trigger check round trip(s), and 'usb transfer' for the samples
+        if not batched:
+            with profiler.span('usb wait'):
+                triggercounter = self._get_channels(board_idx)  # sends trigger info and checks for ready data
+            if triggercounter[0] != 251:
+                return board_idx, triggercounter, None, None, None
+            with profiler.span('usb transfer'):
+                predata = self._get_predata(board_idx)  # gets downsamplemergingcounter and triggerphase
+                data = self._get_data(board_idx)  # gets the actual event data
+            return board_idx, triggercounter, predata, data, self._board_readout(board_idx)
+
+        usb = self.usbs[board_idx]
+        with profiler.span('usb wait'):
+            usb.send(self._trigger_check_command(board_idx) + self.PREDATA_COMMAND)
+            res = usb.recv(8)
+        if len(res) < 8 or not self._apply_trigger_check(board_idx, res[0:4]):
+            return board_idx, res[0:4], None, None, None
+        self._apply_predata(board_idx, res[4:8])
+        with profiler.span('usb transfer'):
+            data = self._get_data_and_rearm(board_idx)
+        return board_idx, res[0:4], res[4:8], data, self._board_readout(board_idx)
+
+    def _board_readout(self, board_idx):
+        """
+        The board's per-event values, as left in the state by _apply_trigger_check and _apply_predata. Only
+        this board's reader writes them, and the merging counter carries over to the next event's predata.
+        """
+        state = self.state
+        return state.sample_triggered[board_idx], state.triggerphase[board_idx], state.downsamplemergingcounter[board_idx]
 
     def _get_channels(self, board_idx):
+        self.usbs[board_idx].send(self._trigger_check_command(board_idx))
+        triggercounter = self.usbs[board_idx].recv(4)
+        self._apply_trigger_check(board_idx, triggercounter)
+        return triggercounter
+
+    def _trigger_check_command(self, board_idx):
+        """Opcode 1: sets the length to take and arms the trigger if idle, replies with the acquisition state."""
         state = self.state
         tt = state.triggertype[board_idx]
         if state.doexttrig[board_idx] > 0:
@@ -437,24 +492,25 @@ class HardwareController:
 
         is_two_channel = state.dotwochannel[board_idx]
 
-        self.usbs[board_idx].send(bytes([1, tt, is_two_channel + 2 * state.dooversample[board_idx], 99] +
-                                       inttobytes(state.expect_samples + state.expect_samples_extra - state.triggerpos + 1)))
-        triggercounter = self.usbs[board_idx].recv(4)
+        return bytes([1, tt, is_two_channel + 2 * state.dooversample[board_idx], 99] +
+                     inttobytes(state.expect_samples + state.expect_samples_extra - state.triggerpos + 1))
 
+    def _apply_trigger_check(self, board_idx, triggercounter):
+        state = self.state
         if triggercounter[0] == 251: # Event ready
             state.sample_triggered[board_idx] = triggercounter[1]
             return True
         return False
 
     def _get_predata(self, board_idx):
-        state = self.state
-        self.usbs[board_idx].send(bytes([2, 4, 100, 100, 100, 100, 100, 100]))
+        self.usbs[board_idx].send(self.PREDATA_COMMAND)
         res = self.usbs[board_idx].recv(4)
-        if state.downsamplemerging > 1:
-            state.downsamplemergingcounter[board_idx] = res[0]
-        if state.downsamplemergingcounter[board_idx] == state.downsamplemerging and not state.doexttrig[board_idx]:
-            state.downsamplemergingcounter[board_idx] = 0
-        state.triggerphase[board_idx] = res[1]
+        self._apply_predata(board_idx, res)
+        self._get_echo_delay(board_idx)
+        return res
+
+    def _get_echo_delay(self, board_idx):
+        state = self.state
 
         # Handle external trigger echo delay calculation
         if not state.doexttrig[board_idx] and any(state.doexttrigecho):
@@ -533,13 +589,43 @@ class HardwareController:
                     self.do_phase(board_idx, plloutnum=0, updown=1, pllnum=0, quiet=True)
                     self.do_phase(board_idx, plloutnum=1, updown=1, pllnum=0, quiet=True)
 
-    def _get_data(self, usb):
+    def _apply_predata(self, board_idx, res):
+        """Opcode 2/4 reply: downsample merging counter and trigger phase of the event that is ready."""
+        state = self.state
+        if state.downsamplemerging > 1:
+            state.downsamplemergingcounter[board_idx] = res[0]
+        if state.downsamplemergingcounter[board_idx] == state.downsamplemerging and not state.doexttrig[board_idx]:
+            state.downsamplemergingcounter[board_idx] = 0
+        state.triggerphase[board_idx] = res[1]
+
+    def _get_data_and_rearm(self, board_idx):
+        usb = self.usbs[board_idx]
+        expect_len = (self.state.expect_samples + self.state.expect_samples_extra) * 2 * 50
+        usb.send(bytes([0, 99, 99, 99] + inttobytes(expect_len)) + self._trigger_check_command(board_idx))
+        buf = self.rx_buffers[board_idx].acquire(expect_len + 4)
+        rx_len = usb.recv_into(buf, expect_len + 4)
+        if rx_len != expect_len + 4:
+            print(f'*** expect_len ({expect_len} + 4) and rx_len ({rx_len}) mismatch')
+        return memoryview(buf)[:min(rx_len, expect_len)]
+
+    def _get_data(self, board_idx):
+        usb = self.usbs[board_idx]
         expect_len = (self.state.expect_samples + self.state.expect_samples_extra) * 2 * 50
         usb.send(bytes([0, 99, 99, 99] + inttobytes(expect_len)))
-        data = usb.recv(expect_len)
-        if len(data) != expect_len:
-            print(f'*** expect_len ({expect_len}) and rx_len ({len(data)}) mismatch')
-        return data
+        # Read straight into a reusable buffer, returned as a view of the bytes actually received
+        buf = self.rx_buffers[board_idx].acquire(expect_len)
+        rx_len = usb.recv_into(buf, expect_len)
+        if rx_len != expect_len:
+            print(f'*** expect_len ({expect_len}) and rx_len ({rx_len}) mismatch')
+        return memoryview(buf)[:rx_len]
+
+    def release_event_buffers(self, data_map):
+        """Hands the receive buffers of a decoded event back for reuse. The data must not be used afterwards."""
+        if not data_map: return
+        for board, data in data_map.items():
+            buf = data.obj if isinstance(data, memoryview) else data
+            if isinstance(buf, bytearray):
+                self.rx_buffers[board].release(buf)
 
     def use_ext_trigs(self):
         for board in range(1, self.num_board):
@@ -637,7 +723,7 @@ class HardwareController:
     def _finish_lvds_calibration(self):
         """
         Finalize LVDS calibration and print results.
-        Called from _get_predata() when all boards have been calibrated.
+        Called from _get_echo_delay() when all boards have been calibrated.
         """
         state = self.state
         state.lvds_calibration_active = False
@@ -837,6 +923,9 @@ class HardwareController:
             send_leds(self.usbs[board], r1, g1, b1, r2, g2, b2)
 
     def cleanup(self):
-        self.executor.shutdown(wait=True)
+        for reader in self.readers:
+            reader.stop()
+        for reader in self.readers:
+            reader.join(timeout=1.0)
         for usb in self.usbs:
             cleanup(usb)
@@ -7,6 +7,7 @@ import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore
 from scipy.ndimage import gaussian_filter
+from profiler import profiler
 
 
 class HeatmapManager:
@@ -36,7 +37,10 @@ class HeatmapManager:
         self._base_heatmap_bins_x = 1000  # Base number of bins in x-direction (time) at downsample=0
 
         # Smoothing configuration
-        self.heatmap_smoothing_sigma = 1.0  # Gaussian smoothing sigma (0 = no smoothing)
+        self.heatmap_smoothing_sigma = 1.0  # Gaussian smoothing sigma in screen pixels (0 = no smoothing)
+
+        # Channels whose image needs rendering, see update_image()
+        self._dirty = set()
 
     def get_heatmap_bins_x(self):
         """
@@ -50,10 +54,10 @@ class HeatmapManager:
         if line_idx in self.persist_heatmap_data:
             return
 
-        # Create 2D histogram initialized to zeros
+        # Create 2D histogram of sample counts initialized to zeros
         # Array shape: (height, width) = (y_bins, x_bins) = (rows, cols)
         bins_x = self.get_heatmap_bins_x()
-        self.persist_heatmap_data[line_idx] = np.zeros((self.heatmap_bins_y, bins_x))
+        self.persist_heatmap_data[line_idx] = np.zeros((self.heatmap_bins_y, bins_x), dtype=np.int32)
 
         # Store the current zoom level and gain/offset
         self.persist_heatmap_zoom[line_idx] = self.state.downsamplezoom
@@ -100,7 +104,7 @@ class HeatmapManager:
 
         Args:
             line_idx: Channel index
-            persist_lines: List of persist line tuples (item, timestamp, line_idx, x_data, y_data)
+            persist_lines: List of persist line tuples (timestamp, x_data, y_data)
 
         Returns:
             Tuple of ((x_min, x_max), (y_min, y_max))
@@ -117,7 +121,7 @@ class HeatmapManager:
         y_min = None
         y_max = None
 
-        for item, _, _, x_data, y_data in persist_lines:
+        for _, x_data, y_data in persist_lines:
             if x_data is not None and len(x_data) > 0:
                 x_data_min = np.min(x_data)
                 x_data_max = np.max(x_data)
@@ -309,37 +313,13 @@ class HeatmapManager:
         self._init_heatmap_for_channel(line_idx)
 
         heatmap = self.persist_heatmap_data[line_idx]
-        (x_min, x_max), (y_min, y_max) = self._get_heatmap_ranges(line_idx)
-
-        # Filter to only data within the heatmap's range
-        mask = (x >= x_min) & (x <= x_max)
-        if not np.any(mask):
+        bin_indices = self._bin_indices(x, y, line_idx)
+        if bin_indices is None:
             # No data in heatmap range, skip
             return
 
-        x_filtered = x[mask]
-        y_filtered = y[mask]
-
-        # Get bins from actual array dimensions
-        bins_y, bins_x = heatmap.shape
-
-        # Convert x, y data to bin indices
-        # x (time) should map to columns (x_bins)
-        # y (voltage) should map to rows (y_bins)
-        x_bins = np.clip(
-            ((x_filtered - x_min) / (x_max - x_min) * bins_x).astype(int),
-            0, bins_x - 1
-        )
-        y_bins = np.clip(
-            ((y_filtered - y_min) / (y_max - y_min) * bins_y).astype(int),
-            0, bins_y - 1
-        )
-
-        # Accumulate into the heatmap
-        # Array is [rows, cols] = [y_bins, x_bins] = [voltage, time]
-        for xb, yb in zip(x_bins, y_bins):
-            if 0 <= xb < bins_x and 0 <= yb < bins_y:
-                heatmap[yb, xb] += 1
+        # Accumulate into the heatmap (np.add.at counts repeated bins once per sample)
+        np.add.at(heatmap.reshape(-1), bin_indices, 1)
 
         self.update_image(line_idx)
 
@@ -355,22 +335,40 @@ class HeatmapManager:
         if line_idx not in self.persist_heatmap_data:
             return
 
-        heatmap = self.persist_heatmap_data[line_idx]
+        heatmap = self.persist_heatmap_data[line_idx].reshape(-1)
+        bin_indices = self._bin_indices(x, y, line_idx)
+        if bin_indices is None:
+            # No data in heatmap range, skip
+            return
+
+        # Subtract from the heatmap (don't go below 0). Only the touched bins can have gone
+        # negative, and clamping once after all subtractions is the same as clamping each one.
+        np.subtract.at(heatmap, bin_indices, 1)
+        heatmap[bin_indices] = np.maximum(heatmap[bin_indices], 0)
+
+        self.update_image(line_idx)
+
+    def _bin_indices(self, x, y, line_idx):
+        """
+        The flat (y_bin * bins_x + x_bin) heatmap bin index of each sample within the heatmap's
+        x range, or None if there are none.
+        """
         (x_min, x_max), (y_min, y_max) = self._get_heatmap_ranges(line_idx)
 
         # Filter to only data within the heatmap's range
         mask = (x >= x_min) & (x <= x_max)
         if not np.any(mask):
-            # No data in heatmap range, skip
-            return
+            return None
 
         x_filtered = x[mask]
         y_filtered = y[mask]
 
         # Get bins from actual array dimensions
-        bins_y, bins_x = heatmap.shape
+        bins_y, bins_x = self.persist_heatmap_data[line_idx].shape
 
-        # Convert x, y data to bin indices (same as add_trace)
+        # Convert x, y data to bin indices
+        # x (time) should map to columns (x_bins)
+        # y (voltage) should map to rows (y_bins)
         x_bins = np.clip(
             ((x_filtered - x_min) / (x_max - x_min) * bins_x).astype(int),
             0, bins_x - 1
@@ -380,47 +378,92 @@ class HeatmapManager:
             0, bins_y - 1
         )
 
-        # Subtract from the heatmap (don't go below 0)
-        for xb, yb in zip(x_bins, y_bins):
-            if 0 <= xb < bins_x and 0 <= yb < bins_y:
-                heatmap[yb, xb] = max(0, heatmap[yb, xb] - 1)
-
-        self.update_image(line_idx)
+        # Array is [rows, cols] = [y_bins, x_bins] = [voltage, time]
+        return y_bins * bins_x + x_bins
 
     def update_image(self, line_idx):
         """
-        Update the heatmap image display.
+        Schedule an update of the heatmap image display.
+
+        The image is rendered once control returns to the Qt event loop, so however many traces
+        are added and removed in between (several per event per channel), it's rendered at most
+        once per display frame.
 
         Args:
             line_idx: Channel index
         """
         if line_idx not in self.persist_heatmap_items:
             return
+        if not self._dirty:
+            QtCore.QTimer.singleShot(0, self.render)
+        self._dirty.add(line_idx)
+
+    @profiler.timed('heatmap')
+    def render(self):
+        """Render the heatmap images that changed since the last render."""
+        dirty, self._dirty = self._dirty, set()
+        for line_idx in dirty:
+            if line_idx in self.persist_heatmap_items:
+                self._render_image(line_idx)
+
+    def _to_display_resolution(self, heatmap, line_idx):
+        """
+        Sum the heatmap down to about one bin per screen pixel, when the bins are smaller than that.
+        Returns the image and the fraction of the x and y range it covers (a few bins at the far
+        edges can be left out to make the reduction factors fit).
+        """
+        (x_min, x_max), (y_min, y_max) = self._get_heatmap_ranges(line_idx)
+        bins_y, bins_x = heatmap.shape
+        try:
+            pixel_x, pixel_y = self.plot.getViewBox().viewPixelSize()
+            fx = max(1, int(pixel_x * bins_x / (x_max - x_min)))
+            fy = max(1, int(pixel_y * bins_y / (y_max - y_min)))
+        except (ZeroDivisionError, ValueError, TypeError):
+            return heatmap, 1.0, 1.0
+        if fx == 1 and fy == 1:
+            return heatmap, 1.0, 1.0
+        used_x, used_y = bins_x - bins_x % fx, bins_y - bins_y % fy
+        image = heatmap[:used_y, :used_x].reshape(used_y // fy, fy, used_x // fx, fx).sum(axis=(1, 3))
+        return image, used_x / bins_x, used_y / bins_y
+
+    @staticmethod
+    def _color_max_level(image, percentile=90, steps_per_count=8):
+        """
+        The given percentile of the nonzero values of the image, from a histogram of the values
+        (in 1/steps_per_count count steps) rather than by sorting them.
+        """
+        counts = np.bincount((image * steps_per_count).astype(np.int64).reshape(-1))
+        counts[0] -= image.size - np.count_nonzero(image)  # values below one step are still nonzero
+        cumulative = np.cumsum(counts)
+        if cumulative[-1] == 0:
+            return 1
+        return np.searchsorted(cumulative, cumulative[-1] * percentile / 100.0) / steps_per_count
+
+    def _render_image(self, line_idx):
+        """
+        Update the heatmap image display.
 
+        Args:
+            line_idx: Channel index
+        """
         heatmap = self.persist_heatmap_data[line_idx]
         image_item = self.persist_heatmap_items[line_idx]
 
+        # Smoothing is done at screen resolution, on the image that's actually drawn
+        heatmap_display, x_fraction, y_fraction = self._to_display_resolution(heatmap, line_idx)
+
         # Apply Gaussian smoothing to reduce pixelation
         if self.heatmap_smoothing_sigma > 0:
-            heatmap_smoothed = gaussian_filter(heatmap, sigma=self.heatmap_smoothing_sigma)
+            heatmap_smoothed = gaussian_filter(heatmap_display, sigma=self.heatmap_smoothing_sigma, output=np.float32)
         else:
-            heatmap_smoothed = heatmap
+            heatmap_smoothed = heatmap_display
 
-        # Get non-zero values for better color scaling
-        nonzero_values = heatmap_smoothed[heatmap_smoothed > 0]
-
-        if len(nonzero_values) == 0:
-            # No data - use default scaling
-            min_level = 0
-            max_level = 1
-        else:
-            # Use percentile-based scaling for balanced color distribution
-            # This ensures we see the full color range (blue to red) in the data
-            min_level = 0
-            # Use 90th percentile instead of max to avoid outliers dominating the scale
-            max_level = np.percentile(nonzero_values, 90)
-            # Ensure max_level is at least 1
-            max_level = max(max_level, 1)
+        # Use percentile-based scaling for balanced color distribution
+        # This ensures we see the full color range (blue to red) in the data
+        min_level = 0
+        # Use 90th percentile of the non-zero values instead of max to avoid outliers dominating the scale
+        # Ensure max_level is at least 1
+        max_level = max(self._color_max_level(heatmap_smoothed), 1)
 
         # PyQtGraph default: array[i,j] where i is treated as x (horizontal) and j as y (vertical)
         # Our array is (y_bins, x_bins), so we need to transpose to (x_bins, y_bins)
@@ -433,7 +476,7 @@ class HeatmapManager:
 
         # Set the position and scale to match the plot coordinates
         (x_min, x_max), (y_min, y_max) = self._get_heatmap_ranges(line_idx)
-        image_item.setRect(pg.QtCore.QRectF(x_min, y_min, x_max - x_min, y_max - y_min))
+        image_item.setRect(pg.QtCore.QRectF(x_min, y_min, (x_max - x_min) * x_fraction, (y_max - y_min) * y_fraction))
 
         # Ensure visibility is set correctly
         image_item.setVisible(self.state.persist_heatmap_enabled[line_idx] and self.state.persist_time[line_idx] > 0)
@@ -445,7 +488,7 @@ class HeatmapManager:
 
         Args:
             line_idx: Channel index
-            persist_lines: List of persist line tuples (item, timestamp, line_idx, x_data, y_data)
+            persist_lines: List of persist line tuples (timestamp, x_data, y_data)
         """
         self._init_heatmap_for_channel(line_idx)
 
@@ -460,7 +503,7 @@ class HeatmapManager:
 
         # Recreate heatmap with potentially different x bin count
         bins_x = self.get_heatmap_bins_x()
-        self.persist_heatmap_data[line_idx] = np.zeros((self.heatmap_bins_y, bins_x))
+        self.persist_heatmap_data[line_idx] = np.zeros((self.heatmap_bins_y, bins_x), dtype=np.int32)
         heatmap = self.persist_heatmap_data[line_idx]
 
         # Update stored zoom level and gain/offset
@@ -472,36 +515,13 @@ class HeatmapManager:
             self.update_image(line_idx)
             return
 
-        # Get ranges
-        (x_min, x_max), (y_min, y_max) = self._get_heatmap_ranges(line_idx)
-
-        # Accumulate all persist lines into the heatmap
-        for item, _, _, x, y in persist_lines:
-            if x is None or y is None or len(x) == 0:
-                continue
-
-            # Filter to only data within the heatmap's range
-            mask = (x >= x_min) & (x <= x_max)
-            if not np.any(mask):
-                continue
-
-            x_filtered = x[mask]
-            y_filtered = y[mask]
-
-            # Convert x, y data to bin indices
-            x_bins = np.clip(
-                ((x_filtered - x_min) / (x_max - x_min) * bins_x).astype(int),
-                0, bins_x - 1
-            )
-            y_bins = np.clip(
-                ((y_filtered - y_min) / (y_max - y_min) * self.heatmap_bins_y).astype(int),
-                0, self.heatmap_bins_y - 1
-            )
-
-            # Accumulate into the heatmap
-            for xb, yb in zip(x_bins, y_bins):
-                if 0 <= xb < bins_x and 0 <= yb < self.heatmap_bins_y:
-                    heatmap[yb, xb] += 1
+        # Accumulate all persist lines into the heatmap in one pass over their concatenated samples
+        traces = [(x, y) for _, x, y in persist_lines if x is not None and y is not None and len(x) > 0]
+        if traces:
+            bin_indices = self._bin_indices(np.concatenate([x for x, _ in traces]),
+                                            np.concatenate([y for _, y in traces]), line_idx)
+            if bin_indices is not None:
+                heatmap += np.bincount(bin_indices, minlength=heatmap.size).reshape(heatmap.shape)
 
         # Update the image once after all traces are added
         self.update_image(line_idx)
@@ -1,6 +1,5 @@
 # histogram_window.py
 
-import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtWidgets
 from PyQt5.QtGui import QColor
@@ -51,13 +50,12 @@ class HistogramWindow(QtWidgets.QWidget):
 
         self.bar_graph = None
 
-    def update_histogram(self, measurement_name, values, brush_color=None, unit=""):
-        """Update the histogram with new data."""
-        if len(values) == 0:
+    def update_histogram(self, measurement_name, statistics, brush_color=None, unit=""):
+        """Update the histogram from a measurement's StreamingStatistics, using its fixed bins."""
+        if statistics.count == 0:
             return
 
-        # Calculate histogram
-        y, x = np.histogram(list(values), bins=20)
+        y, x = statistics.histogram()
 
         # Use provided color or default to blue
         if brush_color is None:
@@ -71,7 +69,7 @@ class HistogramWindow(QtWidgets.QWidget):
             self.bar_graph.setOpts(x=x[:-1], height=y, width=(x[1]-x[0])*0.8, brush=brush_color)
 
         # Update title and axis label with unit
-        self.plot_widget.setTitle(f'{measurement_name} Distribution (n={len(values)})', color='grey')
+        self.plot_widget.setTitle(f'{measurement_name} Distribution (n={statistics.count})', color='grey')
 
         # Update bottom axis label with unit if provided
         if unit:
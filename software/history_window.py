@@ -3,8 +3,49 @@
 from datetime import datetime
 import sys, os
 import numpy as np
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton, QFileDialog, QMessageBox
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QPushButton, QFileDialog, QMessageBox,
+                             QProgressDialog, QApplication)
+from PyQt5.QtCore import Qt, pyqtSignal, QAbstractListModel, QModelIndex
+from waveform_data import WaveformData
+from data_recorder import RecordingReader
+
+
+def event_timestamp(event):
+    """The timestamp of a history buffer entry, as a datetime."""
+    if 'recording' in event:
+        return datetime.fromtimestamp(event['recording'].timestamp(event['index']))
+    return event['timestamp']
+
+
+class EventListModel(QAbstractListModel):
+    """
+    The history buffer as list rows, newest first. Row labels are only made for the rows being shown,
+    so a recording with many thousands of events lists instantly.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.events = []
+
+    def set_events(self, events):
+        self.beginResetModel()
+        self.events = events
+        self.endResetModel()
+
+    def event_index(self, row):
+        """Events are stored oldest to newest, but we want to display newest first."""
+        return len(self.events) - 1 - row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.events)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        event_index = self.event_index(index.row())
+        # Format timestamp nicely
+        time_str = event_timestamp(self.events[event_index]).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]  # milliseconds
+        return f"Event {event_index}: {time_str}"
 
 
 class HistoryWindow(QWidget):
@@ -17,8 +58,9 @@ class HistoryWindow(QWidget):
     # Signal emitted when history is loaded (passes the event buffer list)
     history_loaded = pyqtSignal(list)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, decode_event=None):
         super().__init__(parent)
+        self.decode_event = decode_event  # Returns the WaveformData of a buffer entry (or None), used for saving
         self.setWindowTitle("History Window")
         self.setWindowFlags(Qt.Window)
         self.resize(300, 600)
@@ -27,12 +69,15 @@ class HistoryWindow(QWidget):
         layout = QVBoxLayout()
         layout.setContentsMargins(5, 5, 5, 5)
 
-        # Create list widget
-        self.list_widget = QListWidget()
-        # Use currentItemChanged for arrow key navigation support
-        self.list_widget.currentItemChanged.connect(self.on_item_changed)
+        # Create list view
+        self.event_model = EventListModel(self)
+        self.list_view = QListView()
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.event_model)
+        # Use currentChanged for arrow key navigation support
+        self.list_view.selectionModel().currentChanged.connect(self.on_item_changed)
 
-        layout.addWidget(self.list_widget)
+        layout.addWidget(self.list_view)
 
         # Add buttons for save/load
         button_layout = QHBoxLayout()
@@ -46,8 +91,6 @@ class HistoryWindow(QWidget):
 
         self.setLayout(layout)
 
-        # Store references to event data for easy access
-        self.event_indices = []  # Maps list position to actual event buffer index
         self.current_event_buffer = []  # Store current buffer for saving
 
     def update_event_list(self, event_buffer):
@@ -55,34 +98,18 @@ class HistoryWindow(QWidget):
         Update the list with events from the circular buffer.
 
         Args:
-            event_buffer: List of dicts with keys 'timestamp', 'xydata', 'xydatainterleaved'
+            event_buffer: List of dicts, with key 'timestamp' plus either 'raw' (a RawEvent)
+                or 'xydata', 'xydatainterleaved' (WaveformData, for events loaded from a history file),
+                or with keys 'recording' (a RecordingReader) and 'index' for events of a recording
         """
         # Store the current buffer for saving
         self.current_event_buffer = event_buffer
+        self.event_model.set_events(event_buffer)
 
-        self.list_widget.clear()
-        self.event_indices.clear()
-
-        # Events are stored oldest to newest, but we want to display newest first
-        for i, event in enumerate(reversed(event_buffer)):
-            if event is not None:
-                timestamp = event['timestamp']
-                # Format timestamp nicely
-                time_str = timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]  # milliseconds
-
-                item = QListWidgetItem(f"Event {len(event_buffer) - 1 - i}: {time_str}")
-                self.list_widget.addItem(item)
-
-                # Store the actual index in the buffer (reversed)
-                self.event_indices.append(len(event_buffer) - 1 - i)
-
-    def on_item_changed(self, current_item, previous_item):
+    def on_item_changed(self, current, previous):
         """Handle when the selected item changes (mouse click or arrow keys)."""
-        if current_item is not None:
-            row = self.list_widget.row(current_item)
-            if row < len(self.event_indices):
-                event_index = self.event_indices[row]
-                self.event_selected.emit(event_index)
+        if current.isValid():
+            self.event_selected.emit(self.event_model.event_index(current.row()))
 
     def closeEvent(self, event):
         """Handle window close event."""
@@ -124,38 +151,64 @@ class HistoryWindow(QWidget):
         if not os.path.splitext(file_path)[1]:  # Check if there's no extension
             file_path += ".npz"
 
+        # Raw events are decoded one by one, which takes a while for a full buffer
+        events = list(self.current_event_buffer)
+        progress = QProgressDialog("Saving history...", "Cancel", 0, len(events), self)
+        progress.setWindowTitle("Save History")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
         try:
             # Prepare data for saving
-            num_events = len(self.current_event_buffer)
             timestamps = []
-            xydata_list = []
-            xydatainterleaved_list = []
-
-            for event in self.current_event_buffer:
+            ydata_list, x0_list, dx_list = [], [], []
+            ydatainterleaved_list, x0interleaved_list, dxinterleaved_list = [], [], []
+
+            for n, event in enumerate(events):
+                if n % 10 == 0:
+                    progress.setValue(n)
+                    QApplication.processEvents()  # Allow UI to update
+                    if progress.wasCanceled():
+                        return
                 if event is not None:
+                    # Raw events are saved decoded, so the file doesn't depend on the acquisition settings
+                    xydata = self.decode_event(event)
+                    if xydata is None:
+                        continue  # taken with other acquisition settings
                     # Save timestamp as ISO format string
-                    timestamps.append(event['timestamp'].isoformat())
-                    # Ensure arrays are proper float64 numpy arrays
-                    xydata_list.append(np.asarray(event['xydata'], dtype=np.float64))
-                    xydatainterleaved_list.append(
-                        np.asarray(event['xydatainterleaved'], dtype=np.float64)
-                        if event['xydatainterleaved'] is not None
-                        else np.array([], dtype=np.float64)
-                    )
+                    timestamps.append(event_timestamp(event).isoformat())
+                    # Saved in the waveform dtype they were acquired in (float32 by default),
+                    # with each channel's time axis as just (x0, dx)
+                    ydata_list.append(xydata.y)
+                    x0_list.append(xydata.x0)
+                    dx_list.append(xydata.dx)
+                    interleaved = event.get('xydatainterleaved')
+                    ydatainterleaved_list.append(interleaved.y if interleaved is not None else np.array([], dtype=xydata.dtype))
+                    x0interleaved_list.append(interleaved.x0 if interleaved is not None else np.array([]))
+                    dxinterleaved_list.append(interleaved.dx if interleaved is not None else np.array([]))
+
+            progress.close()
+            num_events = len(timestamps)
 
             # Save to npz file
             np.savez_compressed(
                 file_path,
                 num_events=num_events,
                 timestamps=np.array(timestamps, dtype=object),
-                xydata=np.array(xydata_list, dtype=object),
-                xydatainterleaved=np.array(xydatainterleaved_list, dtype=object)
+                ydata=_stack_arrays(ydata_list),
+                x0=_stack_arrays(x0_list),
+                dx=_stack_arrays(dx_list),
+                ydatainterleaved=_stack_arrays(ydatainterleaved_list),
+                x0interleaved=_stack_arrays(x0interleaved_list),
+                dxinterleaved=_stack_arrays(dxinterleaved_list)
             )
 
             QMessageBox.information(self, "Success", f"Saved {num_events} events to {file_path}")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save history: {str(e)}")
+        finally:
+            progress.close()
 
     def load_history(self):
         """Load history buffer from a file."""
@@ -167,33 +220,52 @@ class HistoryWindow(QWidget):
             self,
             "Load History",
             "",
-            "History Files (*.npz);;All Files (*)",
+            "History Files (*.npz);;Recordings (*.hsr);;All Files (*)",
             options=options
         )
 
         if not file_path:
             return  # User cancelled
 
+        if file_path.endswith('.hsr'):
+            self.load_recording(file_path)
+            return
+
         try:
             # Load from npz file
             data = np.load(file_path, allow_pickle=True)
 
             num_events = int(data['num_events'])
             timestamps = data['timestamps']
-            xydata_list = data['xydata']
-            xydatainterleaved_list = data['xydatainterleaved']
 
-            # Reconstruct event buffer
+            # Reconstruct event buffer (each data[key] access reads the array from the file again)
+            compact = 'ydata' in data
+            if compact:
+                ydata, x0, dx = data['ydata'], data['x0'], data['dx']
+                ydatainterleaved, x0interleaved, dxinterleaved = data['ydatainterleaved'], data['x0interleaved'], data['dxinterleaved']
+            else:
+                xydata_list, xydatainterleaved_list = data['xydata'], data['xydatainterleaved']
             event_buffer = []
             for i in range(num_events):
-                # Ensure arrays are proper numpy arrays with float dtype
-                xydata_array = np.asarray(xydata_list[i], dtype=np.float64)
-                xydatainterleaved_array = np.asarray(xydatainterleaved_list[i], dtype=np.float64) if xydatainterleaved_list[i].size > 0 else None
+                if compact:
+                    # Equal-shaped events are stored stacked, but older files hold them as one object array,
+                    # so make sure y comes back as float
+                    xydata = WaveformData.from_arrays(_float_array(ydata[i]), x0[i], dx[i])
+                    xydatainterleaved = None
+                    if ydatainterleaved[i].size > 0:
+                        xydatainterleaved = WaveformData.from_arrays(_float_array(ydatainterleaved[i]), x0interleaved[i],
+                                                                     dxinterleaved[i])
+                else:
+                    # Files from older versions hold dense float64 (num_ch, 2, num_samples) arrays
+                    xydata = WaveformData.from_xy(np.asarray(xydata_list[i], dtype=np.float64))
+                    xydatainterleaved = None
+                    if xydatainterleaved_list[i].size > 0:
+                        xydatainterleaved = WaveformData.from_xy(np.asarray(xydatainterleaved_list[i], dtype=np.float64))
 
                 event = {
                     'timestamp': datetime.fromisoformat(timestamps[i]),
-                    'xydata': xydata_array,
-                    'xydatainterleaved': xydatainterleaved_array
+                    'xydata': xydata,
+                    'xydatainterleaved': xydatainterleaved
                 }
                 event_buffer.append(event)
 
@@ -207,3 +279,36 @@ class HistoryWindow(QWidget):
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load history: {str(e)}")
+
+    def load_recording(self, file_path):
+        """Browse a binary recording made by DataRecorder. Events are only read from it when selected."""
+        try:
+            reader = RecordingReader(file_path)
+            event_buffer = [{'recording': reader, 'index': n} for n in range(len(reader))]
+
+            # Emit signal to update main window's history buffer
+            self.history_loaded.emit(event_buffer)
+
+            # Update the display
+            self.update_event_list(event_buffer)
+
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load recording: {str(e)}")
+
+
+def _stack_arrays(arrays):
+    """
+    The per-event arrays as one array for saving: stacked in their own dtype if they all have the same shape
+    and dtype, else (e.g. events taken with other settings) as an object array of the arrays.
+    """
+    if arrays and all(a.shape == arrays[0].shape and a.dtype == arrays[0].dtype for a in arrays):
+        return np.stack(arrays)
+    stacked = np.empty(len(arrays), dtype=object)
+    stacked[:] = arrays
+    return stacked
+
+
+def _float_array(a):
+    """a as a float array, keeping its dtype if it already is one."""
+    a = np.asarray(a)
+    return a if a.dtype.kind == 'f' else a.astype(np.float64)
@@ -13,13 +13,19 @@ from PyQt5.QtGui import QPalette, QColor
 # Import all the refactored components
 from scope_state import ScopeState
 from hardware_controller import HardwareController
-from data_processor import DataProcessor, format_freq
+from acquisition_worker import AcquisitionWorker, acquisition_config
+from data_processor import DataProcessor, decode_settings, format_freq
 from plot_manager import PlotManager
+from resampler import resample_trace, resample_traces
+from render_scheduler import RenderScheduler
 from data_recorder import DataRecorder
+from waveform_data import WaveformData
 from histogram_window import HistogramWindow
 from xy_window import XYWindow
 from zoom_window import ZoomWindow
 from history_window import HistoryWindow
+from profiler_window import ProfilerWindow
+from profiler import profiler
 from measurements_manager import MeasurementsManager
 from calibration import autocalibration, do_meanrms_calibration
 from settings_manager import save_setup, load_setup
@@ -35,7 +41,6 @@ from SCPIsocket import DataSocket
 from board import setupboard
 from utils import get_pwd
 from dummy_scope.USB_Socket import UsbSocketAdapter
-import ftd2xx
 
 pwd = get_pwd()
 print(f"Current dir is {pwd}")
@@ -61,6 +66,8 @@ class MainWindow(TemplateBaseClass):
         self.state = ScopeState(num_boards=len(usbs), num_chan_per_board=2)
         print(f"Haasoscope Pro Software Version: {self.state.softwareversion:.2f}")
         self.controller = HardwareController(usbs, self.state)
+        # Acquisition thread, started with the first run (see dostartstop)
+        self.acquisition = AcquisitionWorker(self.controller, self.state)
         self.processor = DataProcessor(self.state)
         self.recorder = DataRecorder(self.state)
 
@@ -85,6 +92,7 @@ class MainWindow(TemplateBaseClass):
         self.math_window = None
         self.xy_window = None
         self.zoom_window = None
+        self.profiler_window = None  # Dockable panel, made when first opened
         self.dummy_server_config_dialog = None
         # Initialize boardBox ComboBox with board numbers
         self.ui.boardBox.blockSignals(True)
@@ -111,18 +119,22 @@ class MainWindow(TemplateBaseClass):
         self.histogram_window = HistogramWindow(self, self.plot_manager)
 
         # History window and circular buffer for storing past events
-        self.history_window = HistoryWindow(self)
+        self.history_window = HistoryWindow(self, decode_event=self.decode_history_event)
         self.history_window.event_selected.connect(self.on_history_event_selected)
         self.history_window.window_closed.connect(self.on_history_window_closed)
         self.history_window.history_loaded.connect(self.on_history_loaded)
-        self.history_buffer = deque(maxlen=100)  # Circular buffer for 100 events
+        self.history_buffer = deque(maxlen=self.state.history_depth)  # Circular buffer of raw events, see update_plot_record_event
         self.displaying_history = False  # Flag to indicate if showing historical data
+        self.history_settings = None  # Decode settings snapshot shared by the history events taken with them
         self.current_history_index = None  # Index of currently displayed historical event
         self.was_running_before_history = False  # Track if we were running when history opened
 
         # 6. Initialize measurements manager (handles table, histogram, etc.)
         self.measurements = MeasurementsManager(self)
 
+        self.render_scheduler = RenderScheduler(self.state)  # Which events get drawn, and the acquisition and display rates
+        self.undrawn_event = False  # True while xydata holds an event not drawn or fed to persistence yet
+
         # 7. Setup timers for data acquisition and measurement updates
         self.update_timer = QtCore.QTimer()
         self.update_timer.timeout.connect(self.update_plot_loop)
@@ -193,9 +205,6 @@ class MainWindow(TemplateBaseClass):
                                 "The application is running in a disconnected state. "
                                 "Please connect a device and restart the program to continue.")
 
-        self.last_time = time.time()
-        self.fps = None
-
         # DEFER UI sync until after the constructor is finished and the event loop starts
         QtCore.QTimer.singleShot(10, self._sync_initial_ui_state)
 
@@ -320,6 +329,14 @@ class MainWindow(TemplateBaseClass):
         self.ui.actionTime_relative.triggered.connect(lambda checked: self.plot_manager.update_cursor_display())
         self.ui.actionTrigger_info.triggered.connect(lambda checked: self.plot_manager.update_trigger_threshold_display())
         self.ui.actionPeak_detect.triggered.connect(lambda checked: self.plot_manager.set_peak_detect(checked))
+        modes, depths = self.persist_average_actions()
+        for actions in (modes, depths):
+            group = QtWidgets.QActionGroup(self)  # one mode and one depth at a time
+            for action in actions.values():
+                group.addAction(action)
+                action.triggered.connect(self.persist_average_changed)
+        self.ui.actionPersist_avg_envelope.triggered.connect(self.persist_average_changed)
+        self.update_persist_average_menu()
         self.ui.actionChannel_name_legend.triggered.connect(lambda checked: self.plot_manager.update_legend())
         self.ui.linewidthBox.valueChanged.connect(self.line_width_changed)
         self.ui.lpfBox.currentIndexChanged.connect(self.lpf_changed)
@@ -404,6 +421,7 @@ class MainWindow(TemplateBaseClass):
         self.ui.actionZoom_window_crosshairs.triggered.connect(self.toggle_zoom_window_crosshairs_slot)
         self.ui.actionMath_channels.triggered.connect(self.open_math_channels)
         self.ui.actionHistory_window.triggered.connect(self.open_history_window)
+        self.ui.actionProfiler.triggered.connect(self.open_profiler_window)
 
         # Plot manager signals
         self.plot_manager.curve_clicked_signal.connect(self.on_curve_clicked)
@@ -484,7 +502,7 @@ class MainWindow(TemplateBaseClass):
             if not s.dotwochannel[board_idx]:
                 # In single-channel mode, ch1 doesn't exist - must be disabled
                 s.channel_enabled[ch1_idx] = False
-                self.plot_manager.lines[ch1_idx].clear()
+                self.plot_manager.clear_display_data(self.plot_manager.lines[ch1_idx])
             # In two-channel mode: don't force enable - let user control visibility
 
             # Apply correct visibility based on all state (including persistence)
@@ -724,7 +742,7 @@ class MainWindow(TemplateBaseClass):
                 if i % 100 == 0: print(f"Capturing waveforms: {i}/{num_averages} from channel {channel_idx}")
 
                 # Get event data
-                raw_data_map, rx_len = self.controller.get_event()
+                raw_data_map, rx_len, readout = self.controller.get_event()
                 if not raw_data_map:
                     continue
 
@@ -733,22 +751,23 @@ class MainWindow(TemplateBaseClass):
                 board_indices = list(range(self.state.num_board))
 
                 # If there's a self-triggering board, process it first
-                if self.state.noextboard != -1 and self.state.noextboard in board_indices:
+                if readout.noextboard != -1 and readout.noextboard in board_indices:
                     # Move self-triggering board to front
-                    board_indices.remove(self.state.noextboard)
-                    board_indices.insert(0, self.state.noextboard)
+                    board_indices.remove(readout.noextboard)
+                    board_indices.insert(0, readout.noextboard)
 
                 for b_idx in board_indices:
                     if b_idx in raw_data_map:
                         self.processor.process_board_data(
                             raw_data_map[b_idx],
                             b_idx,
-                            self.xydata
+                            self.xydata,
+                            readout
                         )
 
                 # Extract y-data from the specified channel
-                if channel_idx < len(self.xydata) and self.xydata[channel_idx] is not None:
-                    y_data_full = self.xydata[channel_idx][1]
+                if channel_idx < len(self.xydata):
+                    y_data_full = self.xydata.y[channel_idx]
 
                     # In two-channel mode, only first half of array contains valid samples
                     if self.state.dotwochannel[board_idx]:
@@ -772,24 +791,25 @@ class MainWindow(TemplateBaseClass):
                     if i % 100 == 0: print(f"Capturing interleaved waveforms: {i}/{num_averages}")
 
                     # Get event data
-                    raw_data_map, rx_len = self.controller.get_event()
+                    raw_data_map, rx_len, readout = self.controller.get_event()
                     if not raw_data_map:
                         continue
 
                     # Process all boards, with self-triggering board first to ensure distcorr is calculated
                     # before ext-trig boards need to use it
                     board_indices = list(range(self.state.num_board))
-                    if self.state.noextboard != -1 and self.state.noextboard in board_indices:
+                    if readout.noextboard != -1 and readout.noextboard in board_indices:
                         # Move self-triggering board to front
-                        board_indices.remove(self.state.noextboard)
-                        board_indices.insert(0, self.state.noextboard)
+                        board_indices.remove(readout.noextboard)
+                        board_indices.insert(0, readout.noextboard)
 
                     for b_idx in board_indices:
                         if b_idx in raw_data_map:
                             self.processor.process_board_data(
                                 raw_data_map[b_idx],
                                 b_idx,
-                                self.xydata
+                                self.xydata,
+                                readout
                             )
 
                     # Manually interleave the data (same logic as in plot_manager.py)
@@ -797,11 +817,11 @@ class MainWindow(TemplateBaseClass):
                     channel_idx_N = board_N * self.state.num_chan_per_board
                     channel_idx_N1 = board_N1 * self.state.num_chan_per_board
 
-                    if channel_idx_N < len(self.xydata) and self.xydata[channel_idx_N] is not None:
-                        if channel_idx_N1 < len(self.xydata) and self.xydata[channel_idx_N1] is not None:
+                    if channel_idx_N < len(self.xydata):
+                        if channel_idx_N1 < len(self.xydata):
                             # Get data from both boards
-                            primary_data = self.xydata[channel_idx_N][1].copy()
-                            secondary_data = self.xydata[channel_idx_N1][1].copy()
+                            primary_data = self.xydata.y[channel_idx_N].copy()
+                            secondary_data = self.xydata.y[channel_idx_N1].copy()
 
                             # Create interleaved array
                             interleaved_length = len(primary_data) + len(secondary_data)
@@ -828,36 +848,37 @@ class MainWindow(TemplateBaseClass):
                     if i % 100 == 0: print(f"Capturing oversample waveforms: {i}/{num_averages}")
 
                     # Get event data
-                    raw_data_map, rx_len = self.controller.get_event()
+                    raw_data_map, rx_len, readout = self.controller.get_event()
                     if not raw_data_map:
                         continue
 
                     # Process all boards, with self-triggering board first to ensure distcorr is calculated
                     # before ext-trig boards need to use it
                     board_indices = list(range(self.state.num_board))
-                    if self.state.noextboard != -1 and self.state.noextboard in board_indices:
+                    if readout.noextboard != -1 and readout.noextboard in board_indices:
                         # Move self-triggering board to front
-                        board_indices.remove(self.state.noextboard)
-                        board_indices.insert(0, self.state.noextboard)
+                        board_indices.remove(readout.noextboard)
+                        board_indices.insert(0, readout.noextboard)
 
                     for b_idx in board_indices:
                         if b_idx in raw_data_map:
                             self.processor.process_board_data(
                                 raw_data_map[b_idx],
                                 b_idx,
-                                self.xydata
+                                self.xydata,
+                                readout
                             )
 
                     # Extract y-data from both boards
                     channel_idx_N = board_N * self.state.num_chan_per_board
                     channel_idx_N1 = board_N1 * self.state.num_chan_per_board
 
-                    if channel_idx_N < len(self.xydata) and self.xydata[channel_idx_N] is not None:
-                        y_data_N = self.xydata[channel_idx_N][1].copy()
+                    if channel_idx_N < len(self.xydata):
+                        y_data_N = self.xydata.y[channel_idx_N].copy()
                         captured_waveforms_N.append(y_data_N)
 
-                    if channel_idx_N1 < len(self.xydata) and self.xydata[channel_idx_N1] is not None:
-                        y_data_N1 = self.xydata[channel_idx_N1][1].copy()
+                    if channel_idx_N1 < len(self.xydata):
+                        y_data_N1 = self.xydata.y[channel_idx_N1].copy()
                         captured_waveforms_N1.append(y_data_N1)
 
                 if len(captured_waveforms_N) < 10:
@@ -1027,62 +1048,84 @@ class MainWindow(TemplateBaseClass):
         load_fir_filter(self, self.state, self.ui)
 
     def update_plot_loop(self):
-        """Main acquisition loop, with full status bar and FFT plot updates."""
+        """
+        Main display loop. Events are acquired by the acquisition thread; every queued event is
+        decoded, recorded, stored in the history and fed into persistence, averaging and peak detect,
+        but the views are only redrawn as often as the render scheduler allows, with the newest one.
+        """
         s = self.state
         if self.socket and self.socket.issending:
             time.sleep(0.001) # for sync with ngscopeclient thread
             return
 
-        profile_event_loop = False
-        if profile_event_loop:
-            print("\nStarting profile for event")
-            start_time = time.perf_counter()
-        else: start_time = None
+        if self.acquisition.error is not None:
+            title, message = self.acquisition.error
+            self.handle_critical_error(title, message)
+            return
 
-        raw_data_map, rx_len = self.update_plot_event()
-        if not raw_data_map:
+        if not self.acquisition.wait_for_event(0.005):
+            # No new event, so draw the last one once it's time, if it was held back
+            if self.undrawn_event and self.render_scheduler.should_render('plot'):
+                self.draw_undrawn_event()
             s.isdrawing = False
             return
 
-        if profile_event_loop:
-            end_time1 = time.perf_counter()
-            elapsed_time_seconds = end_time1 - start_time
-            elapsed_time_microseconds = elapsed_time_seconds * 1_000_000
-            print(f"Elapsed time for getting data: {elapsed_time_microseconds:.2f} microseconds")
-        else: end_time1 = None
-
-        s.nevents += 1
-        s.lastsize = rx_len
-        if s.nevents - s.oldnevents >= s.tinterval:
-            now = time.time()
-            elapsedtime = now - s.oldtime
-            s.oldtime = now
-            if elapsedtime > 0:
-                s.lastrate = round(s.tinterval / elapsedtime, 2)
-            s.oldnevents = s.nevents
-
-        self.update_plot_process_event(raw_data_map)
-
-        if profile_event_loop:
-            end_time2 = time.perf_counter()
-            elapsed_time_seconds = end_time2 - end_time1
-            elapsed_time_microseconds = elapsed_time_seconds * 1_000_000
-            print(f"Elapsed time for processing data: {elapsed_time_microseconds:.2f} microseconds")
-        else: end_time2 = None
-
-        # Use data for plot, FFT, math, etc.
-        self.update_plot_data()
-
-        if profile_event_loop:
-            end_time3 = time.perf_counter()
-            elapsed_time_seconds = end_time3 - end_time2
-            elapsed_time_microseconds = elapsed_time_seconds * 1_000_000
-            print(f"Elapsed time for updating plot data: {elapsed_time_microseconds:.2f} microseconds")
-
-        now = time.time()
-        dt = now - self.last_time + 1e-9
-        self.last_time = now
-        self.fps = 1.0 / dt if self.fps is None else self.fps * 0.9 + (1.0 / dt) * 0.1
+        # While a calibration sequence adjusts the hardware between events, only use one event at a time,
+        # since the ones queued behind it were read out before the adjustment
+        events = self.acquisition.pop_all(1 if self._is_calibrating() else None)
+        s.isdrawing = True  # for sync with ngscopeclient thread
+        ndecoded = 0
+        for event in events:
+            if event.config != acquisition_config(s):
+                continue  # read out before a settings change, can't be decoded anymore
+
+            # The previous event wasn't drawn, it only goes into the accumulators before being overwritten
+            if self.undrawn_event:
+                self.accumulate_undrawn_event()
+
+            s.nevents += 1
+            self.render_scheduler.event_acquired()
+            s.lastsize = event.rx_len
+            if s.nevents - s.oldnevents >= s.tinterval:
+                now = time.time()
+                elapsedtime = now - s.oldtime
+                s.oldtime = now
+                if elapsedtime > 0:
+                    s.lastrate = round(s.tinterval / elapsedtime, 2)
+                s.oldnevents = s.nevents
+
+            with profiler.span('decode'):
+                history_event = None
+                if not self.displaying_history:
+                    self.history_settings = decode_settings(s, self.history_settings)
+                    history_event = event.for_history(s, self.history_settings)
+                decoded = self.update_plot_process_event(event.data_map, event.readout)
+            if not decoded:
+                continue
+            with profiler.span('record'):
+                self.update_plot_record_event(event, history_event)
+            if s.measure_all_events and s.dodrawing:
+                self.measurements.measure_event(self.xydata)
+            self.undrawn_event = True
+            ndecoded += 1
+
+            if s.getone: break
+            if self._is_calibrating():
+                self.acquisition.clear()
+                break
+
+        # Everything needed from the raw data has been taken, so let readout reuse the buffers
+        for event in events:
+            self.controller.release_event_buffers(event.data_map)
+
+        if ndecoded == 0:
+            s.isdrawing = False
+            return
+
+        # Use data for plot, FFT, math, etc., unless it's too soon for a redraw. Then the event is held
+        # until the next one arrives (it goes into the accumulators) or the redraw is due (it's drawn).
+        if s.getone or self._is_calibrating() or self.render_scheduler.should_render('plot'):
+            self.draw_undrawn_event()
 
         s.isdrawing = False # for sync with ngscopeclient thread
 
@@ -1093,62 +1136,45 @@ class MainWindow(TemplateBaseClass):
             self.measurements.update_measurements_display()
             self.dostartstop()
 
-    def update_plot_event(self):
+    def draw_undrawn_event(self):
+        """Draws the event in xydata, which also feeds it into the accumulators."""
+        self.undrawn_event = False
+        with profiler.span('draw'):
+            self.update_plot_data()
+        self.render_scheduler.frame_drawn()
+
+    def accumulate_undrawn_event(self):
+        """Feeds the event in xydata into persistence, averaging and peak detect, without drawing it."""
+        self.undrawn_event = False
+        if self.plot_manager.has_accumulators():
+            with profiler.span('accumulate'):
+                self.plot_manager.update_plots(self.xydata, self.xydatainterleaved, display=False)
+
+    def _is_calibrating(self):
+        """True while a PLL reset or autocalibration sequence is adjusting the hardware event by event."""
         s = self.state
+        return (any(x != -10 for x in s.plljustreset) or any(s.triggerautocalibration) or
+                getattr(self, 'autocalib_collector', None) is not None)
 
-        # If the flag is set, get and discard the next event to avoid glitches
-        if s.skip_next_event:
-            s.skip_next_event = False
-            try:
-                self.controller.get_event()  # Fetch and discard
-            except ftd2xx.DeviceError:
-                pass  # Ignore potential errors during this flush
-            return None, 0
-        s.isdrawing = True  # for sync with ngscopeclient thread
-        try:
-            raw_data_map, rx_len = self.controller.get_event()
-            if not self.controller.got_exception:
-                return raw_data_map, rx_len
-            else:
-                title = "Hardware Communication Exception"
-                message = (f"Got an exception when fetching event data.\n\n"
-                           "Please check the USB connection and restart the application.")
-                self.handle_critical_error(title, message)
-                # Stop this loop immediately since communication has failed.
-                return None, 0
-        except ftd2xx.DeviceError as e:
-            # If a hardware communication error occurs, handle it gracefully.
-            title = "Hardware Communication Error"
-            message = (f"Lost communication with the device.\n\n"
-                       f"Details: {e}\n\n"
-                       "Please check the USB connection and restart the application.")
-            self.handle_critical_error(title, message)
-            # Stop this loop immediately since communication has failed.
-            return None, 0
-
-    def update_plot_process_event(self, raw_data_map):
+    def update_plot_process_event(self, raw_data_map, readout):
         s = self.state
 
         # Creates the xydata, xydatainterleaved arrays or resizes if needed, filled next by the processor
         self.allocate_xy_data()
 
-        # Process boards in correct order: self-triggering board first, then all others
-        board_indices = list(range(s.num_board))
-        if s.noextboard != -1 and s.noextboard in board_indices:
-            # Move self-triggering board to front
-            board_indices.remove(s.noextboard)
-            board_indices.insert(0, s.noextboard)
-
-        for board_idx in board_indices:
+        # The self-triggering board of the event being drawn, for the extra trigger stabilizer
+        s.noextboard = readout.noextboard
+        for board_idx in self.board_decode_order(readout.noextboard):
             if board_idx not in raw_data_map:
                 continue
             raw_data = raw_data_map[board_idx]
             expect_len = (self.state.expect_samples + self.state.expect_samples_extra) * 2 * 50
             if len(raw_data) < expect_len:
                 print("Not enough data length in event, not processing.")
-                return
+                return False
             try:
-                nbadA, nbadB, nbadC, nbadD, nbadS = self.processor.process_board_data(raw_data, board_idx, self.xydata)
+                nbadA, nbadB, nbadC, nbadD, nbadS = self.processor.process_board_data(raw_data, board_idx, self.xydata,
+                                                                                      readout)
             except RuntimeError as e:
                 self.closeEvent(None)
                 title = "Data Processing Failed"
@@ -1204,6 +1230,37 @@ class MainWindow(TemplateBaseClass):
                 print("Autocalibration failed to find edges in the data.")
                 s.dodrawing = self.autocalib_collector.was_drawing
                 self.autocalib_collector = None
+        return True
+
+    def board_decode_order(self, noextboard):
+        """Boards in the order they must be decoded: the event's self-triggering board first, then all others."""
+        board_indices = list(range(self.state.num_board))
+        if noextboard != -1 and noextboard in board_indices:
+            # Move self-triggering board to front
+            board_indices.remove(noextboard)
+            board_indices.insert(0, noextboard)
+        return board_indices
+
+    def update_plot_record_event(self, event, history_event):
+        """Hands a decoded event to the consumers that must see every event: history, recorder and SCPI."""
+        # Store the raw event in the history buffer (None while displaying historical data).
+        # It's only decoded again if selected in the history window.
+        if history_event is not None:
+            s = self.state
+            maxlen = max(1, min(s.history_depth, int(s.history_max_mbytes * 1e6) // max(history_event.nbytes, 1)))
+            if self.history_buffer.maxlen != maxlen:
+                self.history_buffer = deque(self.history_buffer, maxlen=maxlen)
+            self.history_buffer.append({
+                'timestamp': datetime.fromtimestamp(history_event.timestamp),
+                'raw': history_event
+            })
+
+        if self.recorder.is_recording:
+            lines_vis = [line.isVisible() for line in self.plot_manager.lines]
+            self.recorder.record_event(self.xydata, self.plot_manager.otherlines['vline'].value(), lines_vis, event.timestamp)
+
+        if self.socket is not None:
+            self.socket.queue_event(self.xydata)
 
     def update_plot_data(self):
         s = self.state
@@ -1219,9 +1276,8 @@ class MainWindow(TemplateBaseClass):
             self.math_results_noresamp = self.math_window.calculate_math_channels(self.plot_manager.stabilized_data_noresamp)
 
             # Resample math channel results for display based on source channel's doresamp
-            from scipy.signal import resample_poly, resample
-            math_results = {}
-            for math_name, (x_data, y_data) in self.math_results_noresamp.items():
+            doresamp_factors = {}
+            for math_name in self.math_results_noresamp:
                 # Find the math channel definition
                 math_def = next((m for m in self.math_window.math_channels if m['name'] == math_name), None)
                 if math_def:
@@ -1243,33 +1299,22 @@ class MainWindow(TemplateBaseClass):
                     else:
                         # Source is a regular channel
                         doresamp_factor = s.doresamp[ch1_idx]
+                    doresamp_factors[math_name] = doresamp_factor
 
-                    # Apply resampling if needed
-                    if doresamp_factor > 1:
-                        if s.polyphase_upsampling_enabled:
-                            # Use polyphase to reduce ringing
-                            y_resampled = resample_poly(y_data, doresamp_factor, 1)
-                            # Reconstruct time axis with proper spacing to avoid time shift
-                            dt_orig = (x_data[-1] - x_data[0]) / (len(x_data) - 1)
-                            dt_new = dt_orig / doresamp_factor
-                            x_resampled = x_data[0] + np.arange(len(y_resampled)) * dt_new
-                        else:
-                            # Use FFT-based resampling
-                            y_resampled, x_resampled = resample(y_data, len(x_data) * doresamp_factor, t=x_data)
-                        math_results[math_name] = (x_resampled, y_resampled)
-                    else:
-                        math_results[math_name] = (x_data, y_data)
-                else:
-                    math_results[math_name] = (x_data, y_data)
+            # Polyphase resampling reduces ringing, FFT-based resampling is faster. Math channels of the
+            # same length and factor are resampled together, with the resamplers the main plot uses.
+            math_results = resample_traces(self.math_results_noresamp, doresamp_factors, s.polyphase_upsampling_enabled)
 
             self.plot_manager.update_math_channel_data(math_results)
 
         # --- Update XY window if visible (after math channels calculated) ---
-        if s.xy_mode and self.xy_window is not None and self.xy_window.isVisible():
+        if (s.xy_mode and self.xy_window is not None and self.xy_window.isVisible() and
+                self.render_scheduler.should_render('xy')):
             self.xy_window.update_xy_plot(self.xydata, math_results)
 
         # --- Update Zoom window if visible ---
-        if self.zoom_window is not None and self.zoom_window.isVisible():
+        if (self.zoom_window is not None and self.zoom_window.isVisible() and
+                self.render_scheduler.should_render('zoom')):
             self.zoom_window.update_zoom_plot(self.plot_manager.stabilized_data, math_results)
             self.zoom_window.update_trigger_and_cursor_lines(self.plot_manager)
             self.zoom_window.update_peak_detect_lines(self.plot_manager)
@@ -1279,121 +1324,114 @@ class MainWindow(TemplateBaseClass):
                 self.math_reference_data, self.math_reference_visible
             )
 
-        # Store event in history buffer (only if not displaying historical data)
-        if not self.displaying_history:
-            event_data = {
-                'timestamp': datetime.now(),
-                'xydata': self.xydata.copy(),
-                'xydatainterleaved': self.xydatainterleaved.copy() if self.xydatainterleaved is not None else None
-            }
-            self.history_buffer.append(event_data)
-
-        if self.recorder.is_recording:
-            lines_vis = [line.isVisible() for line in self.plot_manager.lines]
-            self.recorder.record_event(self.xydata, self.plot_manager.otherlines['vline'].value(), lines_vis)
+        if self.fftui and self.fftui.isVisible() and self.render_scheduler.should_render('fft'):
+            self.update_fft_plots()
 
-        if self.fftui and self.fftui.isVisible():
-            active_channel_name = f"CH{s.activexychannel + 1}"
+    @profiler.timed('fft')
+    def update_fft_plots(self):
+        """Updates the FFT window with the channels and math channels that have FFT enabled."""
+        s = self.state
+        active_channel_name = f"CH{s.activexychannel + 1}"
 
-            # Loop through all possible channels
-            for ch_idx in range(s.num_board * s.num_chan_per_board):
-                ch_name = f"CH{ch_idx + 1}"
-                board_idx = ch_idx // s.num_chan_per_board
+        # Loop through all possible channels
+        for ch_idx in range(s.num_board * s.num_chan_per_board):
+            ch_name = f"CH{ch_idx + 1}"
+            board_idx = ch_idx // s.num_chan_per_board
 
-                # Update FFT if this channel is enabled
-                if s.fft_enabled.get(ch_name, False):
-                    is_active = (ch_name == active_channel_name)
+            # Update FFT if this channel is enabled
+            if s.fft_enabled.get(ch_name, False):
+                is_active = (ch_name == active_channel_name)
 
-                    # Use FIR-corrected data WITHOUT resampling (stabilized_data_noresamp)
-                    # This has FIR corrections applied but avoids upsampled/resampled artifacts
-                    if self.plot_manager.stabilized_data_noresamp[ch_idx] is not None:
-                        x_data, y_data_for_analysis = self.plot_manager.stabilized_data_noresamp[ch_idx]
-                    else:
-                        # Channel data not available (e.g., secondary channel in interleaved mode)
-                        continue
+                # Use FIR-corrected data WITHOUT resampling (stabilized_data_noresamp)
+                # This has FIR corrections applied but avoids upsampled/resampled artifacts
+                if self.plot_manager.stabilized_data_noresamp[ch_idx] is not None:
+                    x_data, y_data_for_analysis = self.plot_manager.stabilized_data_noresamp[ch_idx]
+                else:
+                    # Channel data not available (e.g., secondary channel in interleaved mode)
+                    continue
 
-                    # Pass the correct board_idx to get the right sample rate
-                    freq, mag = self.processor.calculate_fft(y_data_for_analysis, board_idx)
+                # Pass the correct board_idx to get the right sample rate
+                freq, mag = self.processor.calculate_fft(y_data_for_analysis, board_idx)
 
-                    if freq is not None and len(freq) > 0:
-                        max_freq_mhz = np.max(freq)
-                        if max_freq_mhz < 0.001:
-                            plot_x_data, xlabel = freq * 1e6, 'Frequency (Hz)'
-                        elif max_freq_mhz < 1.0:
-                            plot_x_data, xlabel = freq * 1e3, 'Frequency (kHz)'
-                        else:
-                            plot_x_data, xlabel = freq, 'Frequency (MHz)'
+                if freq is not None and len(freq) > 0:
+                    max_freq_mhz = np.max(freq)
+                    if max_freq_mhz < 0.001:
+                        plot_x_data, xlabel = freq * 1e6, 'Frequency (Hz)'
+                    elif max_freq_mhz < 1.0:
+                        plot_x_data, xlabel = freq * 1e3, 'Frequency (kHz)'
+                    else:
+                        plot_x_data, xlabel = freq, 'Frequency (MHz)'
 
-                        title = f'Haasoscope Pro FFT Plot'
-                        pen = self.plot_manager.linepens[ch_idx]  # Get the correct pen
-                        self.fftui.update_plot(ch_name, plot_x_data, mag, pen, title, xlabel, is_active)
-                else:
-                    self.fftui.clear_plot(ch_name)
+                    title = f'Haasoscope Pro FFT Plot'
+                    pen = self.plot_manager.linepens[ch_idx]  # Get the correct pen
+                    self.fftui.update_plot(ch_name, plot_x_data, mag, pen, title, xlabel, is_active)
+            else:
+                self.fftui.clear_plot(ch_name)
 
-            # Process math channels for FFT
-            if self.math_window is not None:
-                # Check if any regular channels have FFT enabled
-                has_regular_channel_fft = any(
-                    s.fft_enabled.get(f"CH{i + 1}", False)
-                    for i in range(s.num_board * s.num_chan_per_board)
-                )
+        # Process math channels for FFT
+        if self.math_window is not None:
+            # Check if any regular channels have FFT enabled
+            has_regular_channel_fft = any(
+                s.fft_enabled.get(f"CH{i + 1}", False)
+                for i in range(s.num_board * s.num_chan_per_board)
+            )
 
-                # Track if we've made a math channel active yet
-                made_math_active = False
+            # Track if we've made a math channel active yet
+            made_math_active = False
 
-                for math_def in self.math_window.math_channels:
-                    math_name = math_def['name']
+            for math_def in self.math_window.math_channels:
+                math_name = math_def['name']
+
+                # Update FFT if this math channel is enabled
+                if s.fft_enabled.get(math_name, False):
+                    # Get math channel data from the plot manager
+                    if math_name in self.plot_manager.math_channel_lines:
+                        math_line = self.plot_manager.math_channel_lines[math_name]
+                        x_data, y_data = self.plot_manager.full_data(math_line)
+
+                        if y_data is not None and len(y_data) > 0:
+                            # For FFT, use the non-resampled math channel result (correct frequency range)
+                            ch1_idx = math_def['ch1']
+                            board_idx_for_fft = s.activeboard if isinstance(ch1_idx, str) else ch1_idx // s.num_chan_per_board
+
+                            # Use non-resampled result for FFT
+                            if hasattr(self, 'math_results_noresamp') and math_name in self.math_results_noresamp:
+                                _, y_data_for_fft = self.math_results_noresamp[math_name]
+                            else:
+                                y_data_for_fft = y_data  # Fallback to displayed data
+
+                            # Calculate FFT using original sample rate
+                            freq, mag = self.processor.calculate_fft(y_data_for_fft, board_idx_for_fft)
+
+                            if freq is not None and len(freq) > 0:
+                                max_freq_mhz = np.max(freq)
+                                if max_freq_mhz < 0.001:
+                                    plot_x_data, xlabel = freq * 1e6, 'Frequency (Hz)'
+                                elif max_freq_mhz < 1.0:
+                                    plot_x_data, xlabel = freq * 1e3, 'Frequency (kHz)'
+                                else:
+                                    plot_x_data, xlabel = freq, 'Frequency (MHz)'
 
-                    # Update FFT if this math channel is enabled
-                    if s.fft_enabled.get(math_name, False):
-                        # Get math channel data from the plot manager
-                        if math_name in self.plot_manager.math_channel_lines:
-                            math_line = self.plot_manager.math_channel_lines[math_name]
-                            x_data, y_data = math_line.getData()
+                                title = f'Haasoscope Pro FFT Plot'
+                                # Create a pen with the math channel's color
+                                color = QColor(math_def['color'])
+                                pen = pg.mkPen(color=color, width=math_def.get('width', 1))
 
-                            if y_data is not None and len(y_data) > 0:
-                                # For FFT, use the non-resampled math channel result (correct frequency range)
-                                ch1_idx = math_def['ch1']
-                                board_idx_for_fft = s.activeboard if isinstance(ch1_idx, str) else ch1_idx // s.num_chan_per_board
+                                # Make this math channel active if no regular channels have FFT enabled
+                                # and this is the first math channel we're processing
+                                is_active = False
+                                if not has_regular_channel_fft and not made_math_active:
+                                    is_active = True
+                                    made_math_active = True
 
-                                # Use non-resampled result for FFT
-                                if hasattr(self, 'math_results_noresamp') and math_name in self.math_results_noresamp:
-                                    _, y_data_for_fft = self.math_results_noresamp[math_name]
-                                else:
-                                    y_data_for_fft = y_data  # Fallback to displayed data
-
-                                # Calculate FFT using original sample rate
-                                freq, mag = self.processor.calculate_fft(y_data_for_fft, board_idx_for_fft)
-
-                                if freq is not None and len(freq) > 0:
-                                    max_freq_mhz = np.max(freq)
-                                    if max_freq_mhz < 0.001:
-                                        plot_x_data, xlabel = freq * 1e6, 'Frequency (Hz)'
-                                    elif max_freq_mhz < 1.0:
-                                        plot_x_data, xlabel = freq * 1e3, 'Frequency (kHz)'
-                                    else:
-                                        plot_x_data, xlabel = freq, 'Frequency (MHz)'
-
-                                    title = f'Haasoscope Pro FFT Plot'
-                                    # Create a pen with the math channel's color
-                                    color = QColor(math_def['color'])
-                                    pen = pg.mkPen(color=color, width=math_def.get('width', 1))
-
-                                    # Make this math channel active if no regular channels have FFT enabled
-                                    # and this is the first math channel we're processing
-                                    is_active = False
-                                    if not has_regular_channel_fft and not made_math_active:
-                                        is_active = True
-                                        made_math_active = True
-
-                                    self.fftui.update_plot(math_name, plot_x_data, mag, pen, title, xlabel, is_active)
-                    else:
-                        self.fftui.clear_plot(math_name)
+                                self.fftui.update_plot(math_name, plot_x_data, mag, pen, title, xlabel, is_active)
+                else:
+                    self.fftui.clear_plot(math_name)
 
     def update_status_bar(self):
         """Updates the status bar text at a fixed rate (5 Hz)."""
         s = self.state
-        if s.num_board < 1 or self.fps is None: return
+        if s.num_board < 1: return
         sradjust = 1e9
         if s.dointerleaved[s.activeboard]: sradjust = 2e9
         elif s.dotwochannel[s.activeboard]: sradjust = 0.5e9
@@ -1407,12 +1445,15 @@ class MainWindow(TemplateBaseClass):
         if self.testing_mode:
             status_text = f"{format_freq(effective_sr, 'S/s')}, {downsample_text}".rstrip(", ")
         else:
-            status_text = (f"{format_freq(effective_sr, 'S/s')}, {downsample_text}{self.fps:.2f} fps, "
-                           f"{s.nevents} events, {s.lastrate:.2f} Hz, "
-                           f"{(s.lastrate * s.lastsize / 1e6):.2f} MB/s")
+            acquisition_rate = self.render_scheduler.acquisition_rate
+            measured_text = f"{self.measurements.event_rate:.2f} Hz measured, " if s.measure_all_events else ""
+            status_text = (f"{format_freq(effective_sr, 'S/s')}, {downsample_text}"
+                           f"{acquisition_rate:.2f} Hz acquired, {self.render_scheduler.display_rate:.2f} fps drawn, "
+                           f"{measured_text}"
+                           f"{s.nevents} events, {(acquisition_rate * s.lastsize / 1e6):.2f} MB/s")
 
         if self.dummy_scope is not None: status_text += ", connected to a dummy scope at " + str(self.dummy_scope)
-        if self.recorder.is_recording: status_text += ", Recording to "+str(self.recorder.file_handle.name)
+        if self.recorder.is_recording: status_text += ", Recording to "+str(self.recorder.filename)
         self.ui.statusBar.showMessage(status_text)
 
         # Update channel name legend while we're at it
@@ -1445,13 +1486,12 @@ class MainWindow(TemplateBaseClass):
         # ALWAYS allocate for the maximum number of samples (single-channel mode).
         # The DataProcessor will handle filling it correctly for each board's mode.
         num_samples = 4 * 10 * s.expect_samples
-        shape = (num_ch, 2, num_samples)
+        shape = (num_ch, num_samples)
 
-        # Avoid re-allocating if the shape hasn't changed
-        if not hasattr(self, 'xydata') or self.xydata.shape != shape:
-            self.xydata = np.zeros(shape, dtype=float)
-            ishape = (num_ch, 2, 2 * num_samples)  # For interleaved data
-            self.xydatainterleaved = np.zeros(ishape, dtype=float)
+        # Avoid re-allocating if the shape and dtype haven't changed
+        if not hasattr(self, 'xydata') or self.xydata.y.shape != shape or self.xydata.dtype != s.waveform_dtype:
+            self.xydata = WaveformData(num_ch, num_samples, s.waveform_dtype)
+            self.xydatainterleaved = WaveformData(num_ch, 2 * num_samples, s.waveform_dtype)  # For interleaved data
             self.time_changed()  # Initialize x-axis values
 
     def time_changed(self):
@@ -1524,16 +1564,12 @@ class MainWindow(TemplateBaseClass):
         x_step1 = 1 * s.downsamplefactor / s.nsunits / s.samplerate
         x_step2 = 0.5 * s.downsamplefactor / s.nsunits / s.samplerate
 
-        # This logic populates the x-axis (time) for each channel's data array
+        # This logic sets the x-axis (time) for each channel's data
         if hasattr(self, 'xydata'):
-            time_axis = np.arange(self.xydata.shape[2]) * x_step1
-            for c in range(s.num_chan_per_board * s.num_board):
-                self.xydata[c][0] = time_axis
+            self.xydata.set_time_axis(x_step1)
 
         if hasattr(self, 'xydatainterleaved'):
-            interleaved_time_axis = np.arange(self.xydatainterleaved.shape[2]) * x_step2
-            for c in range(s.num_chan_per_board * s.num_board):
-                self.xydatainterleaved[c][0] = interleaved_time_axis
+            self.xydatainterleaved.set_time_axis(x_step2)
 
         # Reset accumulated trigger corrections since we've generated fresh time axes
         for board_idx in range(s.num_board):
@@ -1558,17 +1594,9 @@ class MainWindow(TemplateBaseClass):
                 # Use stored doresamp if available (for backward compatibility)
                 doresamp_to_use = data.get('doresamp', s.doresamp[i])
                 if doresamp_to_use > 1:
-                    from scipy.signal import resample_poly, resample
-                    if s.polyphase_upsampling_enabled:
-                        # Use polyphase resampling to reduce ringing artifacts
-                        y_resampled = resample_poly(y_data, doresamp_to_use, 1)
-                        # Reconstruct time axis with proper spacing to avoid time shift
-                        dt_orig = (x_data[-1] - x_data[0]) / (len(x_data) - 1)
-                        dt_new = dt_orig / doresamp_to_use
-                        x_resampled = x_data[0] + np.arange(len(y_resampled)) * dt_new
-                    else:
-                        # Use FFT-based resampling
-                        y_resampled, x_resampled = resample(y_data, len(x_data) * doresamp_to_use, t=x_data)
+                    # Polyphase resampling reduces ringing artifacts, FFT-based resampling is faster
+                    x_resampled, y_resampled = resample_trace(x_data, y_data, doresamp_to_use,
+                                                              s.polyphase_upsampling_enabled)
                     self.plot_manager.update_reference_plot(i, x_resampled, y_resampled, width=stored_width)
                 else:
                     self.plot_manager.update_reference_plot(i, x_data, y_data, width=stored_width)
@@ -1638,6 +1666,7 @@ class MainWindow(TemplateBaseClass):
     def closeEvent(self, event):
         if event is None: print("Stopping application...")
         self.update_timer.stop()
+        self.acquisition.stop()
         self.measurement_timer.stop()
         self.fan_timer.stop()
         self.recorder.stop()
@@ -1853,7 +1882,8 @@ class MainWindow(TemplateBaseClass):
 
     def dostartstop(self):
         if self.state.paused:
-            self.update_timer.start(0)  # 0ms interval for fastest refresh
+            if not self.acquisition.is_alive(): self.acquisition.start()
+            self.update_timer.start(0)  # 0ms interval, the loop waits for the acquisition thread
             self.measurement_timer.start(20)  # 20ms interval = 50 Hz for measurements
             self.status_timer.start(200)  # Start status timer at 5 Hz
             self.state.paused = False
@@ -1866,6 +1896,8 @@ class MainWindow(TemplateBaseClass):
             self.update_timer.stop()
             self.measurement_timer.stop()
             #self.status_timer.stop() # Stop status timer
+            if self.undrawn_event:
+                self.draw_undrawn_event()  # Show the last acquired event, not the last drawn one
             self.state.paused = True
             self.ui.runButton.setChecked(False)
 
@@ -2638,9 +2670,12 @@ class MainWindow(TemplateBaseClass):
         # Convert persist_time back to the spinbox value (reverse of the formula)
         persist_time_ms = s.persist_time[active_channel]
         if persist_time_ms > 0:
-            # Reverse formula: value = log2(persist_time_ms / 50)
+            # Reverse formula: value = log2(persist_time_ms / 50), infinite is the maximum
             import math
-            value = int(math.log2(persist_time_ms / 50))
+            if math.isinf(persist_time_ms):
+                value = self.ui.persistTbox.maximum()
+            else:
+                value = int(math.log2(persist_time_ms / 50))
         else:
             value = 0
         self.ui.persistTbox.setValue(value)
@@ -2662,8 +2697,7 @@ class MainWindow(TemplateBaseClass):
         active_channel = s.activexychannel
 
         # Store to state
-        persist_time_ms = 50 * pow(2, value) if value > 0 else 0
-        s.persist_time[active_channel] = persist_time_ms
+        s.persist_time[active_channel] = self.plot_manager.persist_time_for(value)
 
         # Update plot manager
         self.plot_manager.set_persistence(value, active_channel)
@@ -2673,6 +2707,33 @@ class MainWindow(TemplateBaseClass):
         if self.zoom_window and self.zoom_window.isVisible():
             self.zoom_window.update_persist_lines(self.plot_manager)
 
+    def persist_average_actions(self):
+        """The persist average menu's mode actions by mode, and depth actions by depth."""
+        ui = self.ui
+        modes = {'window': ui.actionPersist_avg_window, 'exponential': ui.actionPersist_avg_exponential}
+        depths = {4: ui.actionPersist_avg_depth_4, 16: ui.actionPersist_avg_depth_16,
+                  64: ui.actionPersist_avg_depth_64, 256: ui.actionPersist_avg_depth_256}
+        return modes, depths
+
+    def update_persist_average_menu(self):
+        """Checks the persist average menu's actions that match the state."""
+        s = self.state
+        modes, depths = self.persist_average_actions()
+        for mode, action in modes.items():
+            action.setChecked(mode == s.persist_avg_mode)
+        for depth, action in depths.items():
+            action.setChecked(depth == s.persist_avg_depth)
+        self.ui.actionPersist_avg_envelope.setChecked(s.persist_avg_envelope)
+
+    def persist_average_changed(self):
+        """Slot for the persist average menu. The averages pick up a new mode or depth with the next trace."""
+        s = self.state
+        modes, depths = self.persist_average_actions()
+        s.persist_avg_mode = next((mode for mode, action in modes.items() if action.isChecked()), s.persist_avg_mode)
+        s.persist_avg_depth = next((depth for depth, action in depths.items() if action.isChecked()), s.persist_avg_depth)
+        s.persist_avg_envelope = self.ui.actionPersist_avg_envelope.isChecked()
+        self.plot_manager.update_persist_average()
+
     def update_channel_visibility(self, channel_index):
         """Update visibility for a specific channel based on its state."""
         s = self.state
@@ -2695,10 +2756,8 @@ class MainWindow(TemplateBaseClass):
             main_line.curve.setClickable(False)
             if average_line:
                 average_line.setVisible(False)
-            if channel_index in self.plot_manager.persist_lines_per_channel:
-                for item_data in self.plot_manager.persist_lines_per_channel[channel_index]:
-                    item = item_data[0]
-                    item.setVisible(False)
+            self.plot_manager.update_envelope_visibility(channel_index)
+            self.plot_manager.phosphor_manager.set_visible(channel_index, False)
             if heatmap_item:
                 heatmap_item.setVisible(False)
             return
@@ -2708,16 +2767,15 @@ class MainWindow(TemplateBaseClass):
         # Average line visibility
         if average_line:
             average_line.setVisible(show_persist_avg)
+        self.plot_manager.update_envelope_visibility(channel_index)
 
         # Persist heatmap visibility (mutually exclusive with persist lines)
         if heatmap_item:
             heatmap_item.setVisible(show_persist_heatmap and persist_time > 0)
 
         # Persist lines visibility (hide if heatmap is enabled)
-        if channel_index in self.plot_manager.persist_lines_per_channel:
-            for item_data in self.plot_manager.persist_lines_per_channel[channel_index]:
-                item = item_data[0]
-                item.setVisible(show_persist_lines and not show_persist_heatmap)
+        self.plot_manager.phosphor_manager.set_visible(
+            channel_index, show_persist_lines and not show_persist_heatmap and persist_time > 0)
 
         # Main trace visibility: hide ONLY if (average is on OR heatmap is on) AND persist lines are off AND persist time > 0
         if (show_persist_avg or show_persist_heatmap) and not show_persist_lines and persist_time > 0:
@@ -2899,6 +2957,14 @@ class MainWindow(TemplateBaseClass):
             self.dummy_server_config_dialog.raise_()
             self.dummy_server_config_dialog.show()
 
+    def open_profiler_window(self):
+        """Slot for the 'Profiler' menu action, shows the profiler panel docked on the right."""
+        if self.profiler_window is None:
+            self.profiler_window = ProfilerWindow(self)
+            self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.profiler_window)
+        self.profiler_window.show()
+        self.profiler_window.raise_()
+
     def open_history_window(self):
         """Slot for the 'History window' menu action."""
         # Track whether we're currently running
@@ -2928,10 +2994,16 @@ class MainWindow(TemplateBaseClass):
         # Get the selected event data from the buffer
         if 0 <= event_index < len(self.history_buffer):
             event = self.history_buffer[event_index]
+            xydata = self.decode_history_event(event)
+            if xydata is None:
+                print(f"History event {event_index} was taken with other acquisition settings and can't be decoded.")
+                return
 
-            # Replace current data with historical data
-            self.xydata = event['xydata']
-            self.xydatainterleaved = event['xydatainterleaved']
+            # Replace current data with historical data (events loaded from a file may be float64)
+            self.xydata = xydata.astype(self.state.waveform_dtype)
+            self.undrawn_event = False
+            if event.get('xydatainterleaved') is not None:
+                self.xydatainterleaved = event['xydatainterleaved'].astype(self.state.waveform_dtype)
 
             # Update the plot with the historical data
             self.plot_manager.update_plots(self.xydata, self.xydatainterleaved)
@@ -2955,6 +3027,47 @@ class MainWindow(TemplateBaseClass):
                     self.math_reference_data, self.math_reference_visible
                 )
 
+    def decode_history_event(self, event):
+        """
+        The WaveformData of a history buffer entry. Raw events are decoded again here with their own
+        DataProcessor, from the decode settings (lpf, trigger level, yscale, ...) and trigger stabilizer
+        state they were decoded with live, into their own WaveformData. Nothing of the live state or
+        buffers is touched, so this is safe while acquisition runs. Like events loaded from a history
+        file, the display stage (FIR correction, smoothing, resampling) is applied with the current
+        settings when the event is shown.
+        Returns None if the acquisition settings changed since, so the raw data can't be decoded.
+        """
+        if 'recording' in event:
+            xydata = event['recording'][event['index']]['xydata']
+            if xydata.num_samples < self.xydata.num_samples:
+                # Recordings only hold the valid samples, e.g. half of them in two-channel mode
+                full = WaveformData.from_arrays(np.zeros((len(xydata), self.xydata.num_samples), dtype=xydata.dtype),
+                                                xydata.x0, xydata.dx)
+                full.y[:, :xydata.num_samples] = xydata.y
+                xydata = full
+            return xydata
+        if 'raw' not in event:
+            return event['xydata']  # loaded from a history file
+        raw = event['raw']
+        if raw.config != acquisition_config(self.state):
+            return None
+
+        settings = raw.settings
+        processor = DataProcessor(settings)
+        stabilizer = (list(raw.distcorr), list(raw.totdistcorr))
+        # Laid out as allocate_xy_data() and time_changed() do for the live xydata
+        xydata = WaveformData(settings.num_chan_per_board * settings.num_board, 4 * 10 * settings.expect_samples,
+                              settings.waveform_dtype)
+        xydata.set_time_axis(settings.downsamplefactor / settings.nsunits / settings.samplerate)
+        # The stabilizer looks for the trigger edge on the time axis as the previous event left it
+        for board_idx in range(settings.num_board):
+            first = board_idx * settings.num_chan_per_board
+            xydata.x0[first:first + settings.num_chan_per_board] = -raw.totdistcorr[board_idx]
+        for board_idx in self.board_decode_order(raw.readout.noextboard):
+            if board_idx in raw.data_map:
+                processor.process_board_data(raw.data_map[board_idx], board_idx, xydata, raw.readout, stabilizer)
+        return xydata
+
     def resume_live_acquisition(self):
         """Resume live data acquisition after viewing history."""
         if self.displaying_history:
@@ -2975,10 +3088,9 @@ class MainWindow(TemplateBaseClass):
 
     def on_history_loaded(self, event_buffer):
         """Slot called when history is loaded from a file."""
-        # Replace the current history buffer with the loaded events
-        self.history_buffer.clear()
-        for event in event_buffer:
-            self.history_buffer.append(event)
+        # Replace the current history buffer with the loaded events, all of them (recordings can be long).
+        # It's cut back to the history depth when live events get added again.
+        self.history_buffer = deque(event_buffer)
 
     def take_reference_waveform(self):
         """
@@ -9,6 +9,7 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QColor, QPixmap, QIcon
 import numpy as np
 from scipy import signal, interpolate
+from profiler import profiler
 
 
 class RefreshingComboBox(QComboBox):
@@ -1770,6 +1771,7 @@ class MathChannelsWindow(QWidget):
         name_to_def = {math_def['name']: math_def for math_def in self.math_channels}
         return [name_to_def[name] for name in sorted_names]
 
+    @profiler.timed('math')
     def calculate_math_channels(self, xy_data_array):
         """Calculate all math channels based on current data.
 
@@ -2017,7 +2019,9 @@ class MathChannelsWindow(QWidget):
                         else:
                             y_result = np.zeros_like(y1)
 
-                results[math_def['name']] = (x_result, y_result)
+                # Keep the waveform dtype, since references and some operations come out as float64
+                dtype = self.state.waveform_dtype
+                results[math_def['name']] = (np.asarray(x_result, dtype=dtype), np.asarray(y_result, dtype=dtype))
             except Exception as e:
                 print(f"Error calculating {math_def['name']}: {e}")
                 results[math_def['name']] = (x1.copy(), np.zeros_like(y1))
@@ -0,0 +1,86 @@
+# measurement_engine.py
+
+import numpy as np
+
+# The measurements that are plain statistics of the samples, done for all channels together by measure_traces()
+STATISTICS = ("Mean", "RMS", "Min", "Max", "Vpp", "Duty cycle")
+
+# Those of them in volts, which get scaled to mV
+VOLTAGE_STATISTICS = ("Mean", "RMS", "Min", "Max", "Vpp")
+
+# The measurements made on every acquired event in the measure all events mode (DataProcessor.measure_events),
+# the others need the trigger position on the displayed trace and are only made on that
+EVENT_MEASUREMENTS = STATISTICS + ("Freq", "Period")
+
+# ... which are measured in batches of events of about this many samples
+EVENT_BATCH_SAMPLES = 1 << 20
+
+
+def _duty_cycles(y, levels):
+    """
+    The percentage of the time each row of y is above its level, with the crossings linearly interpolated
+    (the same as the segments between EdgeIndex crossings).
+    """
+    above = y > levels[:, None]
+    length = y.shape[1]
+    # Counting each sample above as the half intervals on either side of it is exact where the trace
+    # doesn't cross its level, so only the intervals where it does need correcting
+    time_above = np.count_nonzero(above, axis=1) - (above[:, 0].astype(np.float64) + above[:, -1]) / 2
+    crossings = np.flatnonzero(above[:, 1:] != above[:, :-1])
+    rows, idx = np.divmod(crossings, length - 1)
+    y1, y2 = y[rows, idx], y[rows, idx + 1]
+    crossing = (levels[rows] - y1) / (y2 - y1)
+    time_above += np.bincount(rows, np.where(above[rows, idx], crossing - 0.5, 0.5 - crossing), minlength=len(y))
+    return 100.0 * time_above / (length - 1)
+
+
+def measure_traces(traces, statistics, scales=None):
+    """
+    Computes the requested statistics of several traces, those of the same length together as the rows
+    of one 2D array, with one reduction along the samples for each statistic.
+
+    Args:
+        traces: Dictionary {key: y_data}
+        statistics: Names from STATISTICS to compute, the others are skipped
+        scales: Dictionary {key: factor} for the VOLTAGE_STATISTICS of each trace, e.g. 1000 * VperD for mV
+
+    Returns:
+        Structured array with a row for each trace, in the order of traces: its 'key' and a float field for
+        each of the requested statistics (NaN for traces of fewer than 2 samples)
+    """
+    names = [name for name in STATISTICS if name in statistics]
+    result = np.full(len(traces), np.nan, dtype=[('key', object)] + [(name, np.float64) for name in names])
+    keys = list(traces)
+    for row, key in enumerate(keys):
+        result['key'][row] = key
+    if not names:
+        return result
+
+    groups = {}
+    for row, key in enumerate(keys):
+        if len(traces[key]) >= 2:
+            groups.setdefault(len(traces[key]), []).append(row)
+    for length, rows in groups.items():
+        y = np.stack([traces[keys[row]] for row in rows])
+        group = {}
+        if "Mean" in names or "RMS" in names:
+            group["Mean"] = y.mean(axis=1)
+        if "RMS" in names:
+            # The standard deviation, reusing the mean
+            deviations = y - group["Mean"][:, None]
+            np.square(deviations, out=deviations)
+            group["RMS"] = np.sqrt(deviations.mean(axis=1))
+        if any(name in names for name in ("Min", "Max", "Vpp", "Duty cycle")):
+            y_min, y_max = y.min(axis=1).astype(np.float64), y.max(axis=1).astype(np.float64)
+            group.update({"Min": y_min, "Max": y_max, "Vpp": y_max - y_min})
+            if "Duty cycle" in names:
+                group["Duty cycle"] = _duty_cycles(y, (y_min + y_max) / 2)
+        for name in names:
+            result[name][rows] = group[name]
+
+    if scales:
+        factors = np.array([scales.get(key, 1.0) for key in keys])
+        for name in names:
+            if name in VOLTAGE_STATISTICS:
+                result[name] *= factors
+    return result
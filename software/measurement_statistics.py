@@ -0,0 +1,126 @@
+# measurement_statistics.py
+
+import math
+import numpy as np
+
+
+class StreamingStatistics:
+    """
+    Running statistics of one measurement over all the values it has had since the last reset, each
+    update O(1) and without keeping the values: count, mean and variance (Welford's algorithm, with
+    Chan's merge for a batch), min/max, and a fixed-bin histogram for the histogram window and
+    approximate percentiles.
+
+    The histogram has nbins bins of equal width. A value outside of them doubles the width, merging
+    pairs of bins (so counts stay exact) and growing the range towards the value, until it fits. The
+    bins stay as fine as the spread of the values allows, without knowing their range beforehand.
+    """
+
+    def __init__(self, nbins=64):
+        self.nbins = nbins  # Must be even
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = math.nan
+        self.max = math.nan
+        self.last = math.nan
+        self.bins = np.zeros(self.nbins, dtype=np.int64)
+        self.origin = None  # Lower edge of the first bin, None until the first value
+        self.width = 0.0
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def add(self, value):
+        """Adds one value."""
+        value = float(value)
+        if not math.isfinite(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.count == 1:
+            self.min = self.max = value
+        else:
+            self.min, self.max = min(self.min, value), max(self.max, value)
+        self.last = value
+        self._bin(value)
+
+    def add_many(self, values):
+        """Adds an array of values, as if added one by one."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        count = len(values)
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        value_min, value_max = float(values.min()), float(values.max())
+        if self.count:
+            value_min, value_max = min(self.min, value_min), max(self.max, value_max)
+        total = self.count + count
+        delta = mean - self.mean
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min, self.max = value_min, value_max
+        self.last = float(values[-1])
+        self._fit(self.min)
+        self._fit(self.max)
+        idx = np.minimum(((values - self.origin) / self.width).astype(np.int64), self.nbins - 1)
+        self.bins += np.bincount(idx, minlength=self.nbins)
+
+    def _bin(self, value):
+        self._fit(value)
+        self.bins[min(int((value - self.origin) / self.width), self.nbins - 1)] += 1
+
+    def _fit(self, value):
+        """Widens the histogram until value falls in it."""
+        if self.origin is None:
+            # Start with bins fine compared to the value, centered on it
+            self.width = max(abs(value) * 1e-6, 1e-12)
+            self.origin = value - self.width * self.nbins / 2
+            return
+        half = self.nbins // 2
+        while value < self.origin or value >= self.origin + self.width * self.nbins:
+            merged = self.bins.reshape(half, 2).sum(axis=1)
+            self.bins = np.zeros(self.nbins, dtype=np.int64)
+            if value < self.origin:
+                # The old range becomes the upper half
+                self.bins[half:] = merged
+                self.origin -= self.width * self.nbins
+            else:
+                self.bins[:half] = merged
+            self.width *= 2
+
+    def histogram(self):
+        """The (counts, bin edges) of the bins from the lowest to the highest one used."""
+        if not self.count:
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        used = np.flatnonzero(self.bins)
+        first, last = used[0], used[-1] + 1
+        edges = self.origin + self.width * np.arange(first, last + 1)
+        return self.bins[first:last], edges
+
+    def percentile(self, q):
+        """The approximate q-th percentile (0-100), interpolated within the histogram's bins."""
+        if not self.count:
+            return math.nan
+        counts, edges = self.histogram()
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        value = float(np.interp(q / 100.0 * self.count, cumulative, edges))
+        return min(max(value, self.min), self.max)
+
+    def summary(self):
+        """Dictionary of the statistics: count, last, mean, std, min, max, p50, p99."""
+        return {'count': self.count, 'last': self.last, 'mean': self.mean, 'std': self.std,
+                'min': self.min, 'max': self.max, 'p50': self.percentile(50), 'p99': self.percentile(99)}
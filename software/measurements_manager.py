@@ -3,12 +3,21 @@
 import time
 import math
 import numpy as np
-from collections import deque
 from pyqtgraph.Qt import QtCore
 from PyQt5.QtGui import QStandardItemModel, QStandardItem, QColor
 from PyQt5.QtWidgets import QPushButton, QWidget, QHBoxLayout, QLabel
 from data_processor import format_freq, format_period
+from measurement_engine import STATISTICS, EVENT_MEASUREMENTS, EVENT_BATCH_SAMPLES, measure_traces
+from measurement_statistics import StreamingStatistics
+from trace_filters import filter_traces
 from board import gettemps
+from profiler import profiler
+
+
+def _set_text(item, text):
+    """Sets the text of a table item only if it changed, so unchanged cells aren't repainted."""
+    if item.text() != text:
+        item.setText(text)
 
 
 class MeasurementsManager:
@@ -28,7 +37,7 @@ class MeasurementsManager:
         self.measurement_model.setHorizontalHeaderLabels(['Measurement', 'Value', 'Avg', 'RMS'])
         self.ui.tableView.setModel(self.measurement_model)
         self.measurement_items = {}
-        self.measurement_history = {}
+        self.measurement_statistics = {}
 
         # Track active measurements per channel: {(measurement_name, channel_key): True}
         self.active_measurements = {}
@@ -36,6 +45,17 @@ class MeasurementsManager:
         # Track which channel/math channel is being measured
         self.selected_math_channel = None  # None means use active channel
 
+        # Measure all events mode: the samples of the events not measured yet, {channel_index: [y of each event]},
+        # and the values measured since the last table update, {measurement_key: [arrays of values]}
+        self.event_channels = {}  # The channels measured on every event: {channel_index: (channel_key, names)}
+        self.event_traces = {}
+        self.event_batch_events = 0
+        self.event_batch_samples = 0
+        self.event_values = {}
+        self.measured_events = 0
+        self.event_rate = 0.0  # Events measured per second
+        self.event_rate_time = time.time()
+
         # Histogram tracking
         self.current_histogram_measurement = None
         self.current_histogram_unit = ""
@@ -57,6 +77,9 @@ class MeasurementsManager:
         self.ui.actionAdd_all_for_this_channel.triggered.connect(self.add_all_measurements_for_channel)
         self.ui.actionClear_all_for_this_channel.triggered.connect(self.clear_all_measurements_for_channel)
         self.ui.actionClear_all_for_all_channels.triggered.connect(self.clear_all_measurements)
+        self.ui.actionReset_selected_statistics.triggered.connect(self.reset_selected_statistics)
+        self.ui.actionReset_all_statistics.triggered.connect(lambda checked=False: self.reset_statistics())
+        self.ui.actionMeasure_all_events.triggered.connect(self.measure_all_events_toggled)
 
     def create_measurement_name_widget(self, display_name, remove_callback, color=None):
         """Create a widget combining X button and measurement name.
@@ -97,6 +120,7 @@ class MeasurementsManager:
 
         widget.label = label  # Store reference to update text later
         widget.button = remove_button  # Store reference to update color later
+        widget.color_name = color_str
         return widget
 
     def get_current_channel_key(self):
@@ -218,8 +242,8 @@ class MeasurementsManager:
                         self.measurement_model.removeRow(row)
                         break
                 del self.measurement_items[key]
-            if key in self.measurement_history:
-                del self.measurement_history[key]
+            if key in self.measurement_statistics:
+                del self.measurement_statistics[key]
 
     def toggle_board_measurement(self, measurement_name, checked):
         """Add or remove a board-level measurement (e.g., temperature) for the current board."""
@@ -242,8 +266,8 @@ class MeasurementsManager:
                         self.measurement_model.removeRow(row)
                         break
                 del self.measurement_items[key]
-            if key in self.measurement_history:
-                del self.measurement_history[key]
+            if key in self.measurement_statistics:
+                del self.measurement_statistics[key]
 
     def remove_measurement(self, measurement_key):
         """Remove a measurement by its key."""
@@ -257,8 +281,8 @@ class MeasurementsManager:
                     self.measurement_model.removeRow(row)
                     break
             del self.measurement_items[measurement_key]
-        if measurement_key in self.measurement_history:
-            del self.measurement_history[measurement_key]
+        if measurement_key in self.measurement_statistics:
+            del self.measurement_statistics[measurement_key]
 
         # Update menu checkbox
         measurement_name = measurement_key[0]
@@ -303,8 +327,8 @@ class MeasurementsManager:
                         self.measurement_model.removeRow(row)
                         break
                 del self.measurement_items[key]
-            if key in self.measurement_history:
-                del self.measurement_history[key]
+            if key in self.measurement_statistics:
+                del self.measurement_statistics[key]
 
         # Update menu checkboxes
         self.update_menu_checkboxes()
@@ -319,7 +343,7 @@ class MeasurementsManager:
 
         # Clear tracking dictionaries
         self.measurement_items.clear()
-        self.measurement_history.clear()
+        self.measurement_statistics.clear()
 
         # Clear global measurement checkboxes
         self.ui.actionTrigger_thresh.setChecked(False)
@@ -382,7 +406,7 @@ class MeasurementsManager:
         self.selected_math_channel = math_channel_name
         self.update_measurement_header()
         # Clear measurement history when switching channels
-        self.measurement_history.clear()
+        self.measurement_statistics.clear()
 
         # Update the math window button state if it exists
         if hasattr(self.main_window, 'math_window') and self.main_window.math_window is not None:
@@ -406,7 +430,7 @@ class MeasurementsManager:
                         measurement_key = key
                         break
 
-                if measurement_key and measurement_key in self.measurement_history:
+                if measurement_key and measurement_key in self.measurement_statistics:
                     measurement_name, channel_key = measurement_key
                     self.current_histogram_measurement = measurement_key
                     # Extract unit from display name if present
@@ -427,7 +451,7 @@ class MeasurementsManager:
                     brush_color = self.get_channel_color(channel_key)
                     self.histogram_window.update_histogram(
                         f"{measurement_name} ({channel_key})",
-                        self.measurement_history[measurement_key],
+                        self.measurement_statistics[measurement_key],
                         brush_color,
                         unit)
                     if not self.histogram_timer.isActive():
@@ -436,16 +460,42 @@ class MeasurementsManager:
             # No selection - hide histogram
             self.hide_histogram()
 
+    def measure_all_events_toggled(self, checked):
+        """Switches between measuring every acquired event and only the displayed one, restarting the statistics."""
+        self.state.measure_all_events = checked
+        self.reset_statistics()
+
+    def reset_statistics(self, measurement_key=None):
+        """Restart the statistics (Avg, RMS, histogram) of one measurement, or of all of them if measurement_key is None."""
+        keys = self.measurement_statistics if measurement_key is None else [measurement_key]
+        for key in keys:
+            if key in self.measurement_statistics:
+                self.measurement_statistics[key].reset()
+
+    def reset_selected_statistics(self):
+        """Restart the statistics of the measurement selected in the table (the one in the histogram window)."""
+        if self.current_histogram_measurement:
+            self.reset_statistics(self.current_histogram_measurement)
+
+    def statistics_text(self):
+        """The statistics of all measurements as CSV lines: name,channel,count,last,mean,std,min,max,p50,p99."""
+        lines = ["name,channel,count,last,mean,std,min,max,p50,p99"]
+        for (measurement_name, channel_key), statistics in list(self.measurement_statistics.items()):
+            stats = statistics.summary()
+            lines.append(f"{measurement_name},{channel_key},{stats['count']},{stats['last']:.6g},{stats['mean']:.6g},"
+                         f"{stats['std']:.6g},{stats['min']:.6g},{stats['max']:.6g},{stats['p50']:.6g},{stats['p99']:.6g}")
+        return "\n".join(lines)
+
     def update_histogram_display(self):
         """Update the histogram window with current data."""
         if self.current_histogram_measurement and self.histogram_window.isVisible():
-            if self.current_histogram_measurement in self.measurement_history:
+            if self.current_histogram_measurement in self.measurement_statistics:
                 measurement_name, channel_key = self.current_histogram_measurement
                 # Get color from measurement's channel
                 brush_color = self.get_channel_color(channel_key)
                 self.histogram_window.update_histogram(
                     f"{measurement_name} ({channel_key})",
-                    self.measurement_history[self.current_histogram_measurement],
+                    self.measurement_statistics[self.current_histogram_measurement],
                     brush_color,
                     self.current_histogram_unit
                 )
@@ -456,6 +506,7 @@ class MeasurementsManager:
         self.histogram_timer.stop()
         self.current_histogram_measurement = None
 
+    @profiler.timed('measurements')
     def update_measurements_display(self):
         """Slow timer callback to update measurements in the table view without clearing it."""
 
@@ -468,20 +519,20 @@ class MeasurementsManager:
             if value_unit != "":
                 display_name += f" ({value_unit})"
 
-            if key not in self.measurement_history:
-                self.measurement_history[key] = deque(maxlen=100)
+            if key not in self.measurement_statistics:
+                self.measurement_statistics[key] = StreamingStatistics()
 
-            self.measurement_history[key].append(value)
-            history = self.measurement_history[key]
-            avg_value = round(np.mean(history), 3)
-            rms_value = round(np.std(history), 3)
+            statistics = self.measurement_statistics[key]
+            statistics.add(value)
+            avg_value = round(statistics.mean, 3)
+            rms_value = round(statistics.std, 3)
 
             if key in self.measurement_items:
                 name_widget, value_item, avg_item, rms_item = self.measurement_items[key]
-                value_item.setText(f"{value:.3f}")
-                name_widget.label.setText(display_name)
-                avg_item.setText(f"{avg_value:.3f}")
-                rms_item.setText(f"{rms_value:.3f}")
+                _set_text(value_item, f"{value:.3f}")
+                _set_text(name_widget.label, display_name)
+                _set_text(avg_item, f"{avg_value:.3f}")
+                _set_text(rms_item, f"{rms_value:.3f}")
             else:
                 name_item = QStandardItem("")
                 value_item = QStandardItem(f"{value:.3f}")
@@ -497,13 +548,14 @@ class MeasurementsManager:
 
                 self.measurement_items[key] = (name_widget, value_item, avg_item, rms_item)
 
-        def _set_measurement(measurement_key, value, value_unit=""):
+        def _set_measurement(measurement_key, value, value_unit="", unit_scale=1.0):
             """Helper to add or update a measurement row in the table.
 
             Args:
                 measurement_key: Tuple of (measurement_name, channel_key)
                 value: The measurement value
                 value_unit: Optional unit string (e.g., "mV", "ns")
+                unit_scale: value_unit per unit of the values measured on all events (Hz, ns), see measure_event()
             """
             measurement_name, channel_key = measurement_key
             value = round(value, 3)
@@ -513,17 +565,19 @@ class MeasurementsManager:
             if value_unit != "":
                 display_name += f" ({value_unit})"
 
-            # Initialize history deque if this is a new measurement
-            if measurement_key not in self.measurement_history:
-                self.measurement_history[measurement_key] = deque(maxlen=100)
+            # Start the statistics if this is a new measurement
+            if measurement_key not in self.measurement_statistics:
+                self.measurement_statistics[measurement_key] = StreamingStatistics()
 
-            # Add current value to history
-            self.measurement_history[measurement_key].append(value)
-
-            # Calculate average and RMS
-            history = self.measurement_history[measurement_key]
-            avg_value = round(np.mean(history), 3)
-            rms_value = round(np.std(history), 3)
+            # Add current value to the statistics, for the average and RMS since the last reset,
+            # or the values of all the events since the last update in the measure all events mode
+            statistics = self.measurement_statistics[measurement_key]
+            if measurement_key in event_values:
+                statistics.add_many(np.concatenate(event_values[measurement_key]) * unit_scale)
+            elif measurement_key not in event_keys:
+                statistics.add(value)
+            avg_value = round(statistics.mean, 3)
+            rms_value = round(statistics.std, 3)
 
             # Get the color for this channel
             channel_color = self.get_channel_color(channel_key)
@@ -531,14 +585,16 @@ class MeasurementsManager:
             if measurement_key in self.measurement_items:
                 # Update existing item's value, average, and RMS
                 name_widget, value_item, avg_item, rms_item = self.measurement_items[measurement_key]
-                value_item.setText(f"{value:.3f}")
-                name_widget.label.setText(display_name)
-                avg_item.setText(f"{avg_value:.3f}")
-                rms_item.setText(f"{rms_value:.3f}")
+                _set_text(value_item, f"{value:.3f}")
+                _set_text(name_widget.label, display_name)
+                _set_text(avg_item, f"{avg_value:.3f}")
+                _set_text(rms_item, f"{rms_value:.3f}")
                 # Update button color in case channel color changed
-                name_widget.button.setStyleSheet(
-                    f"QPushButton {{ font-size: 14px; font-weight: bold; border: 2px solid {channel_color.name()}; }}"
-                )
+                if name_widget.color_name != channel_color.name():
+                    name_widget.color_name = channel_color.name()
+                    name_widget.button.setStyleSheet(
+                        f"QPushButton {{ font-size: 14px; font-weight: bold; border: 2px solid {channel_color.name()}; }}"
+                    )
             else:
                 # Add new row
                 name_item = QStandardItem("")
@@ -612,8 +668,8 @@ class MeasurementsManager:
                         self.measurement_model.removeRow(row)
                         break
                 del self.measurement_items[key]
-            if key in self.measurement_history:
-                del self.measurement_history[key]
+            if key in self.measurement_statistics:
+                del self.measurement_statistics[key]
 
         # Cache fit_results for active channel to avoid recalculating
         cached_active_channel_fit_results = None
@@ -627,6 +683,22 @@ class MeasurementsManager:
                 measurements_by_channel[channel_key] = []
             measurements_by_channel[channel_key].append(measurement_name)
 
+        # In the measure all events mode, the values of the events since the last update, and the channels
+        # to measure on the next events
+        event_values = self._take_event_values()
+        self.event_channels = {}
+        event_keys = set()
+        if self.state.measure_all_events:
+            for channel_key, names in measurements_by_channel.items():
+                channel_index = self._channel_index(channel_key)
+                names = [name for name in names if name in EVENT_MEASUREMENTS]
+                if channel_index is not None and names:
+                    self.event_channels[channel_index] = (channel_key, names)
+                    event_keys.update((name, channel_key) for name in names)
+
+        # The plain statistics of all channels are calculated together
+        channel_statistics = self._measure_statistics(measurements_by_channel)
+
         # Cache to store calculated measurements per channel (to avoid recalculating)
         channel_measurements_cache = {}
         channel_fit_results_cache = {}
@@ -661,35 +733,15 @@ class MeasurementsManager:
                 continue  # Skip normal channel processing
 
             # Determine which channel's data to use
-            if channel_key.startswith("Math"):
-                # Math channel measurement
-                if channel_key not in self.plot_manager.math_channel_lines:
-                    continue  # Math channel no longer exists
-                x_data = self.plot_manager.math_channel_lines[channel_key].xData
-                y_data = self.plot_manager.math_channel_lines[channel_key].yData
-            elif " " in channel_key:
-                # Regular channel measurement (format: "B0 Ch1")
-                parts = channel_key.split()
-                board = int(parts[0][1:])  # Remove 'B' prefix
-                chan = int(parts[1][2:])  # Get channel number (remove 'Ch' prefix)
-                channel_index = board * self.state.num_chan_per_board + chan
-
-                if channel_index >= len(self.plot_manager.lines):
-                    continue  # Invalid channel
-
-                x_data = self.plot_manager.lines[channel_index].xData
-                y_data = self.plot_manager.lines[channel_index].yData
-            else:
-                # Unknown format, skip
-                continue
-
-            if y_data is None or len(y_data) == 0:
+            channel_data = self._channel_data(channel_key)
+            if channel_data is None:
                 continue
+            x_data, y_data, channel_index = channel_data
 
             # Check if we've already calculated measurements for this channel
             if channel_key not in channel_measurements_cache:
-                # Calculate measurements based on type
-                vline_val = self.plot_manager.otherlines['vline'].value()
+                measurements = dict(channel_statistics.get(channel_key, {}))
+                fit_results = None
 
                 # Determine what measurements are needed for this channel
                 channel_measurement_types = measurements_by_channel[channel_key]
@@ -697,16 +749,19 @@ class MeasurementsManager:
                                     for m in channel_measurement_types)
                 needs_freq = any(m in ["Freq", "Period"] for m in channel_measurement_types)
 
-                # For regular channels, pass channel_index; for math channels, use None (defaults to activexychannel)
-                measurement_channel_index = channel_index if not channel_key.startswith("Math") else None
-
-                measurements, fit_results = self.processor.calculate_measurements(
-                    x_data, y_data, vline_val,
-                    do_risetime_calc=needs_risetime,
-                    use_edge_fit=self.ui.actionEdge_fit_method.isChecked(),
-                    channel_index=measurement_channel_index,
-                    needs_freq=needs_freq
-                )
+                # The measurements from the edges, for the channel on its own
+                if needs_risetime or needs_freq or "Pulse width" in channel_measurement_types:
+                    vline_val = self.plot_manager.otherlines['vline'].value()
+                    edge_measurements, fit_results = self.processor.calculate_measurements(
+                        x_data, y_data, vline_val,
+                        do_risetime_calc=needs_risetime,
+                        use_edge_fit=self.ui.actionEdge_fit_method.isChecked(),
+                        channel_index=channel_index,
+                        needs_freq=needs_freq,
+                        edges=self.plot_manager.edge_index(channel_index) if channel_index is not None else None,
+                        statistics=()
+                    )
+                    measurements.update(edge_measurements)
 
                 # Cache results for this channel
                 channel_measurements_cache[channel_key] = measurements
@@ -732,15 +787,15 @@ class MeasurementsManager:
             elif measurement_name == "Vpp":
                 _set_measurement(measurement_key, measurements.get('Vpp', 0), "mV")
             elif measurement_name == "Freq":
-                freq = measurements.get('Freq', 0)
-                freq, unit = format_freq(freq, "Hz", False)
-                _set_measurement(measurement_key, freq, unit)
+                freq_hz = measurements.get('Freq', 0)
+                freq, unit = format_freq(freq_hz, "Hz", False)
+                _set_measurement(measurement_key, freq, unit, freq / freq_hz if freq_hz else 1.0)
             elif measurement_name == "Period":
                 freq = measurements.get('Freq', 0)
                 if freq > 0:
                     period_ns = 1e9 / freq  # Convert frequency (Hz) to period (ns)
                     period, unit = format_period(period_ns, "s", False)
-                    _set_measurement(measurement_key, period, unit)
+                    _set_measurement(measurement_key, period, unit, period / period_ns)
                 else:
                     _set_measurement(measurement_key, 0, "ns")
             elif measurement_name == "Duty cycle":
@@ -768,15 +823,17 @@ class MeasurementsManager:
                     self.plot_manager.update_risetime_fit_lines(cached_active_channel_fit_results)
                 else:
                     # If not cached, calculate now (shouldn't happen in normal operation)
-                    x_data = self.plot_manager.lines[self.state.activexychannel].xData
-                    y_data = self.plot_manager.lines[self.state.activexychannel].yData
-                    if y_data is not None and len(y_data) > 0:
+                    channel_data = self.plot_manager.stabilized_data[self.state.activexychannel]
+                    if channel_data is not None and len(channel_data[1]) > 0:
+                        x_data, y_data = channel_data
                         vline_val = self.plot_manager.otherlines['vline'].value()
                         _, fit_results = self.processor.calculate_measurements(
                             x_data, y_data, vline_val,
                             do_risetime_calc=True,
                             use_edge_fit=self.ui.actionEdge_fit_method.isChecked(),
-                            channel_index=self.state.activexychannel
+                            channel_index=self.state.activexychannel,
+                            edges=self.plot_manager.edge_index(self.state.activexychannel),
+                            statistics=()
                         )
                         self.plot_manager.update_risetime_fit_lines(fit_results)
             else:
@@ -804,8 +861,137 @@ class MeasurementsManager:
         for key in stale_keys:
             if key in self.measurement_items:
                 del self.measurement_items[key]
-            if key in self.measurement_history:
-                del self.measurement_history[key]
+            if key in self.measurement_statistics:
+                del self.measurement_statistics[key]
+
+    def _channel_data(self, channel_key):
+        """
+        The (x_data, y_data, channel_index) of a channel key from the processed waveforms, with channel_index
+        None for math channels. None if there's no data for it.
+        """
+        if channel_key.startswith("Math"):
+            # Math channel measurement
+            if channel_key not in self.plot_manager.math_channel_lines:
+                return None  # Math channel no longer exists
+            data = self.plot_manager.math_channel_data.get(channel_key)
+            channel_index = None
+        else:
+            channel_index = self._channel_index(channel_key)
+            if channel_index is None or channel_index >= len(self.plot_manager.stabilized_data):
+                return None  # Unknown format or invalid channel
+            data = self.plot_manager.stabilized_data[channel_index]
+        if data is None or data[1] is None or len(data[1]) == 0:
+            return None
+        return data[0], data[1], channel_index
+
+    def _channel_index(self, channel_key):
+        """The channel index of a regular channel key (format: "B0 Ch1"), None for math channels and other keys."""
+        if channel_key.startswith("Math") or " " not in channel_key:
+            return None
+        parts = channel_key.split()
+        board = int(parts[0][1:])  # Remove 'B' prefix
+        chan = int(parts[1][2:])  # Get channel number (remove 'Ch' prefix)
+        return board * self.state.num_chan_per_board + chan
+
+    def measure_event(self, xydata):
+        """
+        Called for every decoded event in the measure all events mode: keeps the samples of the channels with
+        EVENT_MEASUREMENTS in the table, to measure them with the other events of the batch.
+        """
+        if not self.event_channels:
+            return
+        for channel_index in self.event_channels:
+            y = self._event_samples(xydata, channel_index)
+            if y is not None:
+                self.event_traces.setdefault(channel_index, []).append(y)
+                self.event_batch_samples += len(y)
+        self.event_batch_events += 1
+        if self.event_batch_samples >= EVENT_BATCH_SAMPLES:
+            self._measure_event_batch()
+
+    def _event_samples(self, xydata, channel_index):
+        """A copy of the samples of a channel in an event, laid out as in PlotManager.update_plots (filtered with the batch)."""
+        s = self.state
+        if channel_index >= len(xydata):
+            return None
+        board_idx = channel_index // s.num_chan_per_board
+        if s.dointerleaved[board_idx]:
+            if channel_index % 4 != 0:
+                return None  # The secondary board's samples are in the primary's line
+            y = np.empty(2 * xydata.num_samples, dtype=xydata.dtype)
+            y[0::2] = xydata.y[channel_index]
+            y[1::2] = xydata.y[channel_index + s.num_chan_per_board]
+            return y
+        if s.dotwochannel[board_idx]:
+            return xydata.y[channel_index, :xydata.num_samples // 2].copy()
+        return xydata.y[channel_index].copy()
+
+    def _filter_event_traces(self):
+        """
+        The event traces of the batch, after the frequency response correction and Savitzky-Golay filtering
+        of PlotManager.update_plots, so that they are measured like the displayed traces.
+        """
+        fir_coeffs, savgol = self.plot_manager.trace_filters()
+        if not any(fir_coeffs.get(channel_index) is not None for channel_index in self.event_traces) and savgol is None:
+            return self.event_traces
+        traces = {(channel_index, i): y for channel_index, events in self.event_traces.items() for i, y in enumerate(events)}
+        try:
+            filtered = filter_traces(traces, {key: fir_coeffs.get(key[0]) for key in traces}, savgol)
+        except Exception:
+            # If filtering fails, measure without filtering, as update_plots draws without it
+            return self.event_traces
+        return {channel_index: [filtered[(channel_index, i)] for i in range(len(events))]
+                for channel_index, events in self.event_traces.items()}
+
+    def _measure_event_batch(self):
+        """Measures the events of the batch, all channels together, and keeps the values for the next table update."""
+        if self.event_traces:
+            names = {name for channel_key, channel_names in self.event_channels.values() for name in channel_names}
+            results = self.processor.measure_events(self._filter_event_traces(), names)
+            for channel_index in self.event_traces:
+                channel_key, channel_names = self.event_channels[channel_index]
+                for name in channel_names:
+                    self.event_values.setdefault((name, channel_key), []).append(results[(name, channel_index)])
+        self.measured_events += self.event_batch_events
+        self.event_traces = {}
+        self.event_batch_events = 0
+        self.event_batch_samples = 0
+
+    def _take_event_values(self):
+        """The values measured on all events since the last call, {measurement_key: [arrays of values]}."""
+        self._measure_event_batch()
+        now = time.time()
+        if now - self.event_rate_time >= 1.0:
+            self.event_rate = self.measured_events / (now - self.event_rate_time)
+            self.measured_events = 0
+            self.event_rate_time = now
+        event_values, self.event_values = self.event_values, {}
+        return event_values
+
+    @profiler.timed('statistics')
+    def _measure_statistics(self, measurements_by_channel):
+        """
+        The STATISTICS measured on each channel, all channels together with measure_traces().
+
+        Returns:
+            Dictionary {channel_key: {measurement name: value}}
+        """
+        traces, scales, statistics = {}, {}, set()
+        for channel_key, names in measurements_by_channel.items():
+            wanted = [name for name in names if name in STATISTICS]
+            channel_data = self._channel_data(channel_key) if wanted else None
+            if channel_data is None:
+                continue
+            x_data, y_data, channel_index = channel_data
+            traces[channel_key] = y_data
+            # Math channels are scaled like the active channel
+            scales[channel_key] = 1000 * self.state.VperD[self.state.activexychannel if channel_index is None else channel_index]
+            statistics.update(wanted)
+        if not traces:
+            return {}
+        records = measure_traces(traces, statistics, scales)
+        names = records.dtype.names[1:]
+        return {record['key']: {name: float(record[name]) for name in names} for record in records}
 
     def adjust_table_view_geometry(self):
         """Sets the table view geometry to fill the bottom with the side panel."""
@@ -0,0 +1,278 @@
+"""
+Phosphor Manager for HaasoscopePro
+Handles analog-phosphor style persistence of the traces
+"""
+
+import math
+import time
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore
+from profiler import profiler
+
+
+class PhosphorManager:
+    """
+    Manages persistence as a decaying intensity image per channel, like the phosphor of an analog scope.
+
+    Each trace is drawn into a per-channel float accumulator at about screen resolution, and the
+    accumulator decays exponentially with a time constant following the channel's persist_time.
+    It's shown as a single ImageItem in the channel color, so the cost per frame is proportional to
+    the number of pixels, however many traces are persisting, and infinite persistence is just no decay.
+    """
+
+    def __init__(self, plot, state):
+        """
+        Initialize the PhosphorManager.
+
+        Args:
+            plot: The PlotItem where the persistence images will be displayed
+            state: The ScopeState object containing application state
+        """
+        self.plot = plot
+        self.state = state
+
+        # Persistence attributes (per-channel)
+        self.accumulators = {}  # Dictionary: {channel_index: 2D float32 array (y_bins, x_bins)}
+        self.items = {}  # Dictionary: {channel_index: ImageItem}
+        self.ranges = {}  # Dictionary: {channel_index: ((x_min, x_max), (y_min, y_max))}
+        self.settings = {}  # Dictionary: {channel_index: (zoom, yscale, offset) when the accumulator was created}
+        self.last_decay = {}  # Dictionary: {channel_index: time of the last decay step}
+        self.colors = {}  # Dictionary: {channel_index: rgba of the color the lookup table was made for}
+        self.luts = {}  # Dictionary: {channel_index: (256, 4) RGBA lookup table}
+
+        # Image resolution, used when the view's size in pixels isn't known yet
+        self.default_bins_x = 1000
+        self.default_bins_y = 500
+        self.max_bins = 4000
+
+        # A pixel is drawn at full channel color once this many (undecayed) traces crossed it,
+        # so a single fresh trace has about the alpha the faint persist lines used to have
+        self.saturation = 2.5
+
+        # The accumulator decays to exp(-decay_constants) of a trace's intensity after persist_time
+        self.decay_constants = 3.0
+
+        # Channels whose image needs rendering, see schedule_render()
+        self._dirty = set()
+
+    def time_constant(self, line_idx):
+        """The decay time constant of a channel in seconds (inf for infinite persistence)."""
+        return self.state.persist_time[line_idx] / 1000.0 / self.decay_constants
+
+    def _current_settings(self, line_idx):
+        return self.state.downsamplezoom, self.state.yscale, self.state.offset[line_idx]
+
+    def _current_ranges(self):
+        view_range = self.plot.getViewBox().viewRange()
+        return tuple(view_range[0]), tuple(view_range[1])
+
+    def _image_shape(self):
+        """The (y_bins, x_bins) for an image covering the view at about one bin per screen pixel."""
+        try:
+            view_box = self.plot.getViewBox()
+            bins_x, bins_y = int(view_box.width()), int(view_box.height())
+        except (AttributeError, TypeError, ValueError):
+            bins_x = bins_y = 0
+        if bins_x < 10 or bins_y < 10:
+            return self.default_bins_y, self.default_bins_x
+        return min(bins_y, self.max_bins), min(bins_x, self.max_bins)
+
+    def _init_channel(self, line_idx):
+        """
+        Initialize the accumulator for a channel. If the view was panned or zoomed since it was created,
+        the accumulator is re-mapped onto the new view, so the persistence stays (at the resolution it was
+        drawn with). It's reset if the timebase, gain or offset changed, since the persisted traces don't
+        line up with new ones anymore.
+        """
+        ranges = self._current_ranges()
+        settings = self._current_settings(line_idx)
+        if line_idx in self.accumulators and self.settings[line_idx] == settings:
+            if self.ranges[line_idx] != ranges:
+                self.accumulators[line_idx] = self._remap(self.accumulators[line_idx], self.ranges[line_idx], ranges,
+                                                          self._image_shape())
+                self.ranges[line_idx] = ranges
+            return
+
+        self.accumulators[line_idx] = np.zeros(self._image_shape(), dtype=np.float32)
+        self.ranges[line_idx] = ranges
+        self.settings[line_idx] = settings
+        self.last_decay[line_idx] = time.time()
+
+        if line_idx not in self.items:
+            image_item = pg.ImageItem()
+            self.items[line_idx] = image_item
+            self.plot.addItem(image_item)
+
+    @staticmethod
+    def _remap(accumulator, old_ranges, new_ranges, shape):
+        """The accumulator, covering old_ranges, re-mapped onto an image of the given shape covering new_ranges."""
+        (old_x, old_y), (new_x, new_y) = old_ranges, new_ranges
+        rows = PhosphorManager._remap_rows(accumulator, old_y, new_y, shape[0])
+        return PhosphorManager._remap_rows(rows.T, old_x, new_x, shape[1]).T.copy()
+
+    @staticmethod
+    def _remap_rows(image, old_range, new_range, new_bins):
+        """
+        The image re-binned along its first axis from old_range onto new_bins bins over new_range. A new bin
+        takes the maximum of the old bins it overlaps, so traces don't thin out when zooming out, and 0
+        outside the old range.
+        """
+        old_bins = image.shape[0]
+        result = np.zeros((new_bins,) + image.shape[1:], dtype=image.dtype)
+        if old_range[1] <= old_range[0] or new_range[1] <= new_range[0]:
+            return result
+        # The new bin edges in old bins
+        edges = new_range[0] + np.arange(new_bins + 1) * ((new_range[1] - new_range[0]) / new_bins)
+        edges = (edges - old_range[0]) * (old_bins / (old_range[1] - old_range[0]))
+        lo = np.clip(np.floor(edges[:-1]), 0, old_bins).astype(np.intp)
+        hi = np.clip(np.ceil(edges[1:]), 0, old_bins).astype(np.intp)
+        overlapping = np.flatnonzero(hi > lo)
+        if overlapping.size == 0:
+            return result
+        # Bin k reduces old bins lo[k] up to the next bin's lo (or just lo[k] if that's the same one, when
+        # zooming in), and the last one up to its hi. A zero row is appended so that hi can be old_bins.
+        padded = np.concatenate((image, np.zeros((1,) + image.shape[1:], dtype=image.dtype)))
+        starts = np.append(lo[overlapping], hi[overlapping[-1]])
+        result[overlapping] = np.maximum.reduceat(padded, starts, axis=0)[:-1]
+        return result
+
+    def add_trace(self, x, y, line_idx, color):
+        """
+        Draw a trace into the persistence image of a channel.
+
+        Args:
+            x: x-coordinate data (time), increasing
+            y: y-coordinate data (voltage)
+            line_idx: Channel index
+            color: QColor of the channel
+        """
+        self._init_channel(line_idx)
+        if self.colors.get(line_idx) != color.rgba():
+            self._set_color(line_idx, color)
+
+        accumulator = self.accumulators[line_idx]
+        spans = self._column_spans(x, y, line_idx)
+        if spans is None:
+            return
+        lo, hi, columns = spans
+
+        # Only the band of rows the trace spans needs touching
+        first_row, stop_row = int(lo.min()), int(hi.max()) + 1
+        if stop_row <= first_row:
+            return
+        rows = np.arange(first_row, stop_row)[:, None]
+        accumulator[first_row:stop_row, columns] += (rows >= lo) & (rows <= hi)
+        self.schedule_render(line_idx)
+
+    def _column_spans(self, x, y, line_idx):
+        """
+        The rows a trace covers in each image column, as (lo, hi) row arrays and the slice of columns
+        they're for, or None if it doesn't cross any column. A column covers the trace's values at both
+        of its edges and every sample within it, so steep edges are drawn solid and consecutive columns
+        join up. Where the trace is entirely off the image, lo > hi.
+        """
+        accumulator = self.accumulators[line_idx]
+        bins_y, bins_x = accumulator.shape
+        (x_min, x_max), (y_min, y_max) = self.ranges[line_idx]
+        if len(x) < 2 or x_max <= x_min or y_max <= y_min:
+            return None
+
+        # Columns whose edges are within the trace
+        col_width = (x_max - x_min) / bins_x
+        first = max(int(np.ceil((x[0] - x_min) / col_width)), 0)
+        last = min(int(np.floor((x[-1] - x_min) / col_width)), bins_x)
+        if last - first < 1:
+            return None
+        edges_x = x_min + np.arange(first, last + 1) * col_width
+        edges_y = np.interp(edges_x, x, y)
+        lo = np.minimum(edges_y[:-1], edges_y[1:])
+        hi = np.maximum(edges_y[:-1], edges_y[1:])
+
+        # Samples in between the edges, reduced per column (x is sorted, so each column's samples are contiguous)
+        start, stop = np.searchsorted(x, (edges_x[0], edges_x[-1]))
+        if stop > start:
+            sample_cols = ((x[start:stop] - edges_x[0]) / col_width).astype(np.intp)
+            np.clip(sample_cols, 0, len(lo) - 1, out=sample_cols)
+            groups = np.flatnonzero(np.diff(sample_cols, prepend=-1))
+            cols = sample_cols[groups]
+            lo[cols] = np.minimum(lo[cols], np.minimum.reduceat(y[start:stop], groups))
+            hi[cols] = np.maximum(hi[cols], np.maximum.reduceat(y[start:stop], groups))
+
+        # Voltage to rows
+        scale = bins_y / (y_max - y_min)
+        lo_rows = np.clip(np.floor((lo - y_min) * scale), 0, bins_y)
+        hi_rows = np.clip(np.floor((hi - y_min) * scale), -1, bins_y - 1)
+        return lo_rows, hi_rows, slice(first, last)
+
+    def decay(self, now=None):
+        """Let the persistence images fade by the time passed since the last call. Called periodically."""
+        now = time.time() if now is None else now
+        for line_idx, accumulator in self.accumulators.items():
+            elapsed = now - self.last_decay[line_idx]
+            self.last_decay[line_idx] = now
+            tau = self.time_constant(line_idx)
+            if tau <= 0:
+                accumulator.fill(0)
+            elif not math.isinf(tau) and elapsed > 0:
+                accumulator *= np.float32(math.exp(-elapsed / tau))
+            else:
+                continue
+            self.schedule_render(line_idx)
+
+    def _set_color(self, line_idx, color):
+        """Set the lookup table of a channel's image: its color, from transparent to opaque."""
+        self.colors[line_idx] = color.rgba()
+        self.luts[line_idx] = np.zeros((256, 4), dtype=np.ubyte)
+        self.luts[line_idx][:, :3] = color.red(), color.green(), color.blue()
+        self.luts[line_idx][:, 3] = np.arange(256)
+        self.items[line_idx].setLookupTable(self.luts[line_idx])
+
+    def schedule_render(self, line_idx):
+        """Render the image of a channel once control returns to the Qt event loop."""
+        if not self._dirty:
+            QtCore.QTimer.singleShot(0, self.render)
+        self._dirty.add(line_idx)
+
+    @profiler.timed('phosphor')
+    def render(self):
+        """Render the persistence images that changed since the last render."""
+        dirty, self._dirty = self._dirty, set()
+        for line_idx in dirty:
+            if line_idx in self.accumulators:
+                self.show_image(line_idx, self.items[line_idx])
+
+    def show_image(self, line_idx, image_item):
+        """
+        Show the persistence image of a channel in an ImageItem, which can also be one in another plot
+        (like the zoom window's) that looks at part of the same range.
+
+        Args:
+            line_idx: Channel index
+            image_item: The ImageItem to update
+        """
+        # PyQtGraph takes the image as (x, y), with y=0 at the bottom like our row 0
+        image_item.setImage(self.accumulators[line_idx].T, levels=(0, self.saturation), autoLevels=False)
+        if image_item is not self.items[line_idx] and line_idx in self.luts:
+            image_item.setLookupTable(self.luts[line_idx])
+        (x_min, x_max), (y_min, y_max) = self.ranges[line_idx]
+        image_item.setRect(pg.QtCore.QRectF(x_min, y_min, x_max - x_min, y_max - y_min))
+
+    def set_visible(self, line_idx, visible):
+        if line_idx in self.items:
+            self.items[line_idx].setVisible(visible)
+
+    def clear_channel(self, line_idx):
+        """
+        Clear the persistence of a specific channel.
+
+        Args:
+            line_idx: Channel index
+        """
+        if line_idx in self.accumulators:
+            self.accumulators[line_idx].fill(0)
+            self.schedule_render(line_idx)
+
+    def clear_all(self):
+        for line_idx in list(self.accumulators):
+            self.clear_channel(line_idx)
@@ -8,11 +8,15 @@ import numpy as np
 import time
 from collections import deque
 import colorsys
-from scipy.signal import resample, resample_poly, filtfilt, savgol_filter
-from scipy.interpolate import interp1d
-from data_processor import find_crossing_distance
+import weakref
+from edge_index import EdgeIndex
 from cursor_manager import CursorManager
 from heatmap_manager import HeatmapManager
+from phosphor_manager import PhosphorManager
+from running_average import RunningAverage
+from resampler import resample_trace, resample_traces
+from trace_filters import filter_traces
+from profiler import profiler
 import math
 
 
@@ -61,6 +65,31 @@ def add_secondary_axis(plot_item, conversion_func, **axis_args):
     axis.update_function = update_proxy_view
     return axis
 
+def minmax_decimate(x, y, x_range, num_columns):
+    """
+    Reduces a trace to its min and max in each pixel column of x_range, for display.
+
+    Unlike plain subsampling, this keeps glitches narrower than a column. The points just outside the
+    range are kept, so the line still reaches the edges. Traces with no more than two points per column
+    in the range are returned as they are. x must be increasing.
+    """
+    x_min, x_max = x_range
+    start, stop = np.searchsorted(x, (x_min, x_max))
+    start, stop = max(start - 1, 0), min(stop + 1, len(x))
+    if num_columns < 1 or x_max <= x_min or stop - start <= 2 * num_columns:
+        return x, y
+    x, y = x[start:stop], y[start:stop]
+    # Where each column starts (the points just outside go with the first and last one), skipping empty ones
+    edges = x_min + (x_max - x_min) / num_columns * np.arange(1, num_columns)
+    groups = np.concatenate(([0], np.searchsorted(x, edges)))
+    groups = groups[np.diff(groups, append=len(x)) > 0]
+    x_out = np.repeat(x[groups], 2)
+    y_out = np.empty(2 * len(groups), dtype=y.dtype)
+    y_out[0::2] = np.minimum.reduceat(y, groups)
+    y_out[1::2] = np.maximum.reduceat(y, groups)
+    return x_out, y_out
+
+
 
 # #############################################################################
 # PlotManager Class
@@ -91,12 +120,19 @@ class PlotManager(pg.QtCore.QObject):
         self.otherlines = {}  # For trigger lines, fit lines etc.
         self.trigger_arrows = {}  # Store arrow markers for trigger line ends
         self.average_lines = {}  # Dictionary: {channel_index: average line}
+        self.envelope_lines = {}  # Dictionary: {channel_index: (upper, lower) persist average +- std lines}
         self.right_axis = None
         self.nlines = state.num_board * state.num_chan_per_board
         self.current_vline_pos = 0.0
 
         # Stabilized data for math channel calculations (after trigger stabilizers)
         self.stabilized_data = [None] * self.nlines
+        self.edge_indexes = {}  # Dictionary: {line index: EdgeIndex of its stabilized_data}, see edge_index()
+
+        # Full-resolution data of the plot items that show a display-decimated version, see set_display_data()
+        self.display_data = weakref.WeakKeyDictionary()
+        self._redecimate_pending = False
+        self.math_channel_data = {}  # {math_name: (x_data, y_data)} at full resolution
 
         # Cursor manager (will be initialized after linepens are created)
         self.cursor_manager = None
@@ -106,11 +142,14 @@ class PlotManager(pg.QtCore.QObject):
 
         # Persistence attributes (per-channel)
         self.max_persist_lines = 100  # Total buffer size for heatmap
-        self.max_visible_persist_lines = 16  # Only show last 16 for performance
-        self.persist_lines_per_channel = {}  # Dictionary: {channel_index: deque of persist lines}
+        self.persist_lines_per_channel = {}  # Dictionary: {channel_index: deque of (timestamp, x_data, y_data)}
+        self.persist_averages = {}  # Dictionary: {channel_index: RunningAverage}
         self.persist_timer = QtCore.QTimer()
         self.persist_timer.timeout.connect(self.update_persist_effect)
 
+        # Phosphor manager for the persistence images (shown as "persist lines")
+        self.phosphor_manager = PhosphorManager(self.plot, self.state)
+
         # Heatmap manager for persist line visualization
         self.heatmap_manager = HeatmapManager(self.plot, self.state)
 
@@ -215,6 +254,9 @@ class PlotManager(pg.QtCore.QObject):
         self.otherlines['vline_holdoff'].sigPositionChanged.connect(lambda: self._update_trigger_arrows('vline_holdoff'))
         # Update arrow positions when view changes (pan/zoom)
         self.plot.getViewBox().sigRangeChanged.connect(self._update_all_trigger_arrows)
+        # Redo the display decimation of the traces when the view changes (pan/zoom/resize)
+        self.plot.getViewBox().sigXRangeChanged.connect(self._schedule_redecimate)
+        self.plot.getViewBox().sigResized.connect(self._schedule_redecimate)
 
         # Hide trigger lines and arrows initially (will be shown after PLL calibration)
         self.otherlines['vline'].setVisible(False)
@@ -302,7 +344,7 @@ class PlotManager(pg.QtCore.QObject):
         # Peak detect lines are created per-channel on demand (see set_peak_detect)
 
         # Cursor manager (initialized after linepens and lines are created)
-        self.cursor_manager = CursorManager(self.plot, self.state, self.linepens, self.ui, self.otherlines, self.lines)
+        self.cursor_manager = CursorManager(self.plot, self.state, self.linepens, self.ui, self.otherlines, self.lines, self)
         self.cursor_manager.setup_cursors()
 
         # Legend for channel names
@@ -323,89 +365,50 @@ class PlotManager(pg.QtCore.QObject):
 
             self.time_changed()
 
-    def update_plots(self, xy_data, xydatainterleaved):
-        """Updates all visible waveform plots with new data."""
-        if not self.state.dodrawing:
-            return
+    def _fir_coefficients(self, board_idx):
+        """The frequency response correction FIR coefficients for the mode of a board, or None if not calibrated."""
+        s = self.state
+        if s.dooversample[board_idx] and s.dointerleaved[board_idx]:
+            # Interleaved oversampling mode: use interleaved coefficients (6.4 GHz)
+            return s.fir_coefficients_interleaved
+        if s.dooversample[board_idx]:
+            # Oversampling only (not interleaved): use board-specific coefficients
+            # Board N uses oversample[0], Board N+1 uses oversample[1]
+            return s.fir_coefficients_oversample[board_idx % 2]
+        if s.dotwochannel[board_idx]:
+            # Two-channel mode: use two-channel coefficients (1.6 GHz per channel)
+            return s.fir_coefficients_twochannel
+        # Non-oversampling, single-channel mode: use regular coefficients (3.2 GHz)
+        return s.fir_coefficients
+
+    def trace_filters(self):
+        """
+        The FIR coefficients of each line (by line index) and the Savitzky-Golay (window_length, polyorder)
+        or None, that update_plots filters the traces with, as filter_traces() takes them.
+        """
+        s = self.state
+        fir_coeffs = {}
+        if s.fir_correction_enabled:
+            fir_coeffs = {li: self._fir_coefficients(li // s.num_chan_per_board) for li in range(self.nlines)}
+        savgol = (s.savgol_window_length, s.savgol_polyorder) if s.polynomial_filtering_enabled else None
+        return fir_coeffs, savgol
+
+    def has_accumulators(self):
+        """True if any channel accumulates events, with persistence (lines, average or heatmap) or peak detect."""
         s = self.state
-
-        # Create a copy to store stabilized data for math channels
-        self.stabilized_data = [None] * self.nlines
-        # Store non-resampled data for math channel calculations (before doresamp)
-        self.stabilized_data_noresamp = [None] * self.nlines
-
-        # Store processed data before applying extra trig stabilizer
-        processed_data = [None] * self.nlines
-        # Store non-resampled processed data (for math channels)
-        processed_data_noresamp = [None] * self.nlines
-
-        # First pass: process all data (interleaving, resampling)
         for li in range(self.nlines):
-            board_idx = li // s.num_chan_per_board
-            xdatanew, ydatanew = None, None
-
-            # --- LOGIC FOR NON-INTERLEAVED BOARDS ---
-            if not s.dointerleaved[board_idx]:
-                x_data_full = xy_data[li][0]
-                y_data_full = xy_data[li][1]
-
-                # Check the mode for the board this line belongs to
-                if s.dotwochannel[board_idx]:
-                    # For two-channel boards, we have half the samples.
-                    # In two-channel mode, samples are spaced 2x further apart in time.
-                    num_valid_samples = xy_data.shape[2] // 2
-                    y_to_plot = y_data_full[:num_valid_samples]
-
-                    # Use the raw x values directly but multiply by 2 to get correct sample spacing.
-                    # The raw x-axis has corrections applied but wrong spacing (x_step1 instead of 2*x_step1).
-                    # Multiplying by 2 gives correct spacing AND preserves corrections.
-                    x_to_plot = x_data_full[:num_valid_samples] * 2.0
-                    xdatanew, ydatanew = x_to_plot, y_to_plot
-                else:
-                    # For single-channel boards, use the data as is.
-                    xdatanew, ydatanew = x_data_full, y_data_full
-
-            # --- LOGIC FOR INTERLEAVED BOARDS ---
-            else:
-                if li % 4 == 0:
-                    primary_data = xy_data[li][1]
-                    secondary_data = xy_data[li + s.num_chan_per_board][1]
-                    xydatainterleaved[board_idx][1][0::2] = primary_data
-                    xydatainterleaved[board_idx][1][1::2] = secondary_data
-
-                    x_interleaved = xydatainterleaved[board_idx][0]
-                    y_interleaved = xydatainterleaved[board_idx][1]
-
-                    # Interpolate to create a smooth, high-density trace
-                    xdatanew = np.linspace(x_interleaved.min(), x_interleaved.max(), len(x_interleaved))
-                    f_int = interp1d(x_interleaved, y_interleaved, kind='linear', bounds_error=False, fill_value=0.0)
-                    ydatanew = f_int(xdatanew)
-
-            if xdatanew is None:
-                continue  # Skip if no data for this line (e.g., secondary interleaved line)
-
-            # Store non-resampled data (before doresamp) for math channel calculations
-            processed_data_noresamp[li] = (xdatanew.copy(), ydatanew.copy())
-
-            # --- Resampling (if enabled) ---
-            if s.doresamp[li]:
-                if s.polyphase_upsampling_enabled:
-                    # Use polyphase resampling to reduce ringing artifacts on sharp edges
-                    ydatanew = resample_poly(ydatanew, s.doresamp[li], 1)
-                    # Reconstruct time axis with proper spacing to avoid time shift
-                    # Calculate the original sample spacing, then divide by upsampling factor
-                    dt_orig = (xdatanew[-1] - xdatanew[0]) / (len(xdatanew) - 1)
-                    dt_new = dt_orig / s.doresamp[li]
-                    xdatanew = xdatanew[0] + np.arange(len(ydatanew)) * dt_new
-                else:
-                    # Use FFT-based resampling (faster, but with ringing on sharp edges)
-                    ydatanew, xdatanew = resample(ydatanew, len(xdatanew) * s.doresamp[li], t=xdatanew)
-
-            # Store the processed data (with resampling)
-            processed_data[li] = (xdatanew, ydatanew)
+            if (s.persist_time[li] > 0 and s.channel_enabled[li] and
+                    (s.persist_lines_enabled[li] or s.persist_avg_enabled[li] or s.persist_heatmap_enabled[li])):
+                return True
+        return any(self.peak_detect_enabled.values())
 
-        # Calculate extra trig stabilizer correction using noextboard
-        extra_trig_correction = None
+    @profiler.timed('extra stabilizer')
+    def _extra_trig_correction(self, processed_data, edge_indexes):
+        """
+        The time correction for all boards from the trigger edge of the noextboard, or None. The EdgeIndex
+        it makes of the noextboard's trace is added to edge_indexes, to be shared with the measurements.
+        """
+        s = self.state
         if s.extra_trig_stabilizer_enabled and s.noextboard != -1: # and s.downsamplefactor==1: # disable at less zoom?
             # Use the first channel of the noextboard for correction calculation
             noext_li = s.noextboard * s.num_chan_per_board
@@ -417,22 +420,27 @@ class PlotManager(pg.QtCore.QObject):
                 # Include triggerdelta in the threshold (per-board setting)
                 hline_threshold = hline_pos + s.triggerdelta[s.noextboard] * s.yscale * 256
 
+                def window(width):
+                    # The x data is sorted, so the samples within width of the trigger are a slice
+                    return slice(np.searchsorted(xdatanew, vline_time - width, side='right'),
+                                 np.searchsorted(xdatanew, vline_time + width, side='left'))
+
                 fitwidth = (s.max_x - s.min_x)
-                xc = xdatanew[(xdatanew > vline_time - fitwidth) & (xdatanew < vline_time + fitwidth)]
+                xc = xdatanew[window(fitwidth)]
 
                 if xc.size > 2:
                     numsamp = s.distcorrsamp*10
                     if s.doresamp[noext_li]: numsamp *= s.doresamp[noext_li]
                     fitwidth *= numsamp / xc.size
 
-                    xc = xdatanew[(xdatanew > vline_time - fitwidth) & (xdatanew < vline_time + fitwidth)]
-                    yc = ydatanew[(xdatanew > vline_time - fitwidth) & (xdatanew < vline_time + fitwidth)]
+                    xc = xdatanew[window(fitwidth)]
+                    yc = ydatanew[window(fitwidth)]
 
-                    # For falling edges, invert both the signal and the threshold
+                    # For falling edges, look for falling crossings (and the pulse edge of the inverted signal)
+                    rising = not s.fallingedge[s.noextboard]
                     threshold_to_use = hline_threshold
-                    if s.fallingedge[s.noextboard]:
+                    if not rising:
                         yc = -yc
-                        threshold_to_use = -hline_threshold
 
                     # Pulse stabilizer mode: use edge midpoint instead of threshold crossing
                     if s.pulse_stabilizer_enabled[s.noextboard] and yc.size > 0:
@@ -457,17 +465,115 @@ class PlotManager(pg.QtCore.QObject):
                                 break
 
                         threshold_to_use = (edge_min + edge_max) / 2.0
+                        if not rising: threshold_to_use = -threshold_to_use
                         #print(edge_max, edge_min)
 
                     if xc.size > 1:
-                        distcorrtemp = find_crossing_distance(yc, threshold_to_use, vline_time, xc[0], xc[1] - xc[0])
+                        edges = edge_indexes[noext_li] = EdgeIndex.from_xy(xdatanew, ydatanew)
+                        crossing = edges.nearest(threshold_to_use, vline_time, rising)
+                        # Only a crossing within the window counts, as if only the window had been searched
+                        distcorrtemp = crossing - vline_time if crossing is not None and xc[0] <= crossing <= xc[-1] else None
                         #print("distcorrtemp", distcorrtemp)
                         max_correction = s.distcorrtol * 10 * s.downsamplefactor / s.nsunits
                         #print("max_correction", max_correction)
                         if distcorrtemp is not None and abs(distcorrtemp) < max_correction:
                             # No need to clamp the correction to stay within the limit, since it is starting fresh every time
-                            # Store the correction to apply to all boards
-                            extra_trig_correction = distcorrtemp
+                            # The correction to apply to all boards
+                            return distcorrtemp
+        return None
+
+    def update_plots(self, xy_data, xydatainterleaved, display=True):
+        """
+        Updates all visible waveform plots with new data.
+
+        With display=False the event is only processed and fed into persistence, averaging and peak
+        detect, for events acquired in between redraws (see RenderScheduler).
+        """
+        if not self.state.dodrawing:
+            return
+        s = self.state
+
+        # Create a copy to store stabilized data for math channels
+        self.stabilized_data = [None] * self.nlines
+        self.edge_indexes = {}
+        # Store non-resampled data for math channel calculations (before doresamp)
+        self.stabilized_data_noresamp = [None] * self.nlines
+
+        # Store processed data before applying extra trig stabilizer
+        processed_data = [None] * self.nlines
+        # Store non-resampled processed data (for math channels)
+        processed_data_noresamp = [None] * self.nlines
+
+        # First pass: process all data (interleaving, resampling)
+        for li in range(self.nlines):
+            board_idx = li // s.num_chan_per_board
+            xdatanew, ydatanew = None, None
+
+            # --- LOGIC FOR NON-INTERLEAVED BOARDS ---
+            if not s.dointerleaved[board_idx]:
+                y_data_full = xy_data.y[li]
+
+                # Check the mode for the board this line belongs to
+                if s.dotwochannel[board_idx]:
+                    # For two-channel boards, we have half the samples.
+                    # In two-channel mode, samples are spaced 2x further apart in time.
+                    num_valid_samples = xy_data.num_samples // 2
+                    y_to_plot = y_data_full[:num_valid_samples]
+
+                    # Use the raw x values directly but multiply by 2 to get correct sample spacing.
+                    # The raw x-axis has corrections applied but wrong spacing (x_step1 instead of 2*x_step1).
+                    # Multiplying by 2 gives correct spacing AND preserves corrections.
+                    x_to_plot = xy_data.x(li, num_valid_samples) * 2.0
+                    xdatanew, ydatanew = x_to_plot, y_to_plot
+                else:
+                    # For single-channel boards, use the data as is.
+                    xdatanew, ydatanew = xy_data.x(li), y_data_full
+
+            # --- LOGIC FOR INTERLEAVED BOARDS ---
+            else:
+                if li % 4 == 0:
+                    # The secondary board samples halfway between the primary's samples (the TAD calibration
+                    # makes sure of that), so the merged samples are already on the uniform time axis of
+                    # xydatainterleaved, with no interpolation needed
+                    ydatanew = xydatainterleaved.y[board_idx]
+                    ydatanew[0::2] = xy_data.y[li]
+                    ydatanew[1::2] = xy_data.y[li + s.num_chan_per_board]
+                    xdatanew = xydatainterleaved.x(board_idx)
+
+            if xdatanew is None:
+                continue  # Skip if no data for this line (e.g., secondary interleaved line)
+
+            # Store non-resampled data (before doresamp) for math channel calculations
+            processed_data_noresamp[li] = (xdatanew.copy(), ydatanew.copy())
+            processed_data[li] = (xdatanew, ydatanew)
+
+        # --- Frequency response correction (FIR) and Savitzky-Golay filtering (if enabled) ---
+        # Done once, at the native sample rate the FIR coefficients are calibrated for, before resampling.
+        # All channels of the same length (and coefficients) are filtered together.
+        fir_coeffs, savgol = self.trace_filters()
+        if any(c is not None for c in fir_coeffs.values()) or savgol is not None:
+            to_filter = {li: data[1] for li, data in enumerate(processed_data_noresamp) if data is not None}
+            try:
+                filtered = filter_traces(to_filter, fir_coeffs, savgol)
+            except Exception as e:
+                # If filtering fails, continue without filtering
+                filtered = to_filter
+            for li, ydatanew in filtered.items():
+                processed_data_noresamp[li] = (processed_data_noresamp[li][0], ydatanew)
+                processed_data[li] = processed_data_noresamp[li]
+
+        # --- Resampling (if enabled) ---
+        # All channels of the same length and factor are resampled together, with a cached resampler.
+        # Polyphase resampling reduces ringing artifacts on sharp edges, FFT-based resampling is faster.
+        to_resample = {li: data for li, data in enumerate(processed_data_noresamp) if data is not None and s.doresamp[li]}
+        if to_resample:
+            resampled = resample_traces(to_resample, dict(enumerate(s.doresamp)), s.polyphase_upsampling_enabled)
+            for li, data in resampled.items():
+                processed_data[li] = data
+
+        # Calculate extra trig stabilizer correction using noextboard
+        edge_indexes = {}  # Dictionary: {line index: EdgeIndex of processed_data}
+        extra_trig_correction = self._extra_trig_correction(processed_data, edge_indexes)
 
         # Second pass: apply correction and plot
         for li in range(self.nlines):
@@ -498,75 +604,23 @@ class PlotManager(pg.QtCore.QObject):
             if xdata_noresamp is not None:
                 xdata_noresamp = xdata_noresamp + time_skew_offset
 
-            # Apply frequency response correction (FIR filter) if enabled
-            if s.fir_correction_enabled:
-                # Determine which FIR coefficients to use
-                fir_coeffs = None
-
-                if s.dooversample[board_idx] and s.dointerleaved[board_idx]:
-                    # Interleaved oversampling mode: use interleaved coefficients (6.4 GHz)
-                    fir_coeffs = s.fir_coefficients_interleaved
-                elif s.dooversample[board_idx]:
-                    # Oversampling only (not interleaved): use board-specific coefficients
-                    # Board N uses oversample[0], Board N+1 uses oversample[1]
-                    if board_idx % 2 == 0:
-                        fir_coeffs = s.fir_coefficients_oversample[0]
-                    else:
-                        fir_coeffs = s.fir_coefficients_oversample[1]
-                elif s.dotwochannel[board_idx]:
-                    # Two-channel mode: use two-channel coefficients (1.6 GHz per channel)
-                    fir_coeffs = s.fir_coefficients_twochannel
-                else:
-                    # Non-oversampling, single-channel mode: use regular coefficients (3.2 GHz)
-                    fir_coeffs = s.fir_coefficients
-
-                if fir_coeffs is not None:
-                    ydatanew = filtfilt(fir_coeffs, [1.0], ydatanew)
-                    if ydata_noresamp is not None:
-                        ydata_noresamp = filtfilt(fir_coeffs, [1.0], ydata_noresamp)
-
-            # Apply Savitzky-Golay polynomial filtering if enabled
-            if s.polynomial_filtering_enabled:
-                # Ensure window length is valid (odd and <= data length)
-                window_length = s.savgol_window_length
-                polyorder = s.savgol_polyorder
-
-                # Validate and adjust window length if needed
-                if window_length >= len(ydatanew):
-                    window_length = len(ydatanew) - 1 if len(ydatanew) % 2 == 0 else len(ydatanew) - 2
-                if window_length < 3:
-                    window_length = 3
-                if window_length % 2 == 0:  # Must be odd
-                    window_length += 1
-
-                # Ensure polyorder < window_length
-                if polyorder >= window_length:
-                    polyorder = window_length - 1
-
-                # Apply filter
-                try:
-                    ydatanew = savgol_filter(ydatanew, window_length, polyorder, mode='interp')
-                    if ydata_noresamp is not None:
-                        # Apply same validation for noresamp data
-                        wl_noresamp = window_length
-                        if wl_noresamp >= len(ydata_noresamp):
-                            wl_noresamp = len(ydata_noresamp) - 1 if len(ydata_noresamp) % 2 == 0 else len(ydata_noresamp) - 2
-                        if wl_noresamp < 3:
-                            wl_noresamp = 3
-                        if wl_noresamp % 2 == 0:
-                            wl_noresamp += 1
-                        po_noresamp = polyorder if polyorder < wl_noresamp else wl_noresamp - 1
-                        ydata_noresamp = savgol_filter(ydata_noresamp, wl_noresamp, po_noresamp, mode='interp')
-                except Exception as e:
-                    # If filter fails, continue without filtering
-                    pass
+            # Resampling and the filters can work in float64, go back to the waveform dtype
+            # for the display, persistence, measurements and math channels
+            dtype = s.waveform_dtype
+            xdatanew, ydatanew = xdatanew.astype(dtype, copy=False), ydatanew.astype(dtype, copy=False)
+            if xdata_noresamp is not None:
+                xdata_noresamp = xdata_noresamp.astype(dtype, copy=False)
+                ydata_noresamp = ydata_noresamp.astype(dtype, copy=False)
 
             # --- Final plotting and persistence ---
-            # Optimization: Use skipFiniteCheck for faster setData
-            self.lines[li].setData(xdatanew, ydatanew, skipFiniteCheck=True)
+            if display:
+                self.set_display_data(self.lines[li], xdatanew, ydatanew)
 
             # Store stabilized data for math channel calculations
             self.stabilized_data[li] = (xdatanew, ydatanew)
+            if li in edge_indexes:
+                # Same samples, only moved in time by the corrections
+                self.edge_indexes[li] = edge_indexes[li].moved(xdatanew[0])
             if xdata_noresamp is not None:
                 self.stabilized_data_noresamp[li] = (xdata_noresamp, ydata_noresamp)
             else:
@@ -582,12 +636,61 @@ class PlotManager(pg.QtCore.QObject):
             if li in self.peak_detect_enabled and self.peak_detect_enabled[li]:
                 self._update_peak_data(li, xdatanew, ydatanew)
 
+        if not display:
+            return
         self.update_persist_average()
 
         # Update peak detect lines for all enabled channels
         if self.peak_detect_enabled:  # Check if dictionary is not empty
             self._update_peak_lines()
 
+    @profiler.timed('set data')
+    def set_display_data(self, item, x, y):
+        """
+        Sets the data of a trace's plot item, decimated to a min/max pair per pixel column of the view,
+        so pyqtgraph never gets many more points than there are pixels. The full-resolution data stays
+        available through full_data() and is decimated again when the view changes.
+        """
+        self.display_data[item] = (x, y)
+        view_box = self.plot.getViewBox()
+        x_display, y_display = minmax_decimate(x, y, view_box.viewRange()[0], int(view_box.width()))
+        # Optimization: Use skipFiniteCheck for faster setData
+        item.setData(x_display, y_display, skipFiniteCheck=True)
+
+    def clear_display_data(self, item):
+        """Clears a plot item that was set with set_display_data()."""
+        self.display_data.pop(item, None)
+        item.clear()
+
+    def full_data(self, item):
+        """The full-resolution (x, y) data of a plot item, which may be showing a decimated version."""
+        if item in self.display_data:
+            return self.display_data[item]
+        return item.getData()
+
+    def edge_index(self, li):
+        """
+        The EdgeIndex of a line's stabilized_data, made the first time it's asked for in an event and shared
+        by the stabilizer, the measurements and cursor snapping. None if there's no data.
+        """
+        edges = self.edge_indexes.get(li)
+        if edges is None:
+            if self.stabilized_data[li] is None or len(self.stabilized_data[li][1]) < 2:
+                return None
+            edges = self.edge_indexes[li] = EdgeIndex.from_xy(*self.stabilized_data[li])
+        return edges
+
+    def _schedule_redecimate(self, *args):
+        if not self._redecimate_pending:
+            self._redecimate_pending = True
+            QtCore.QTimer.singleShot(0, self._redecimate)
+
+    def _redecimate(self):
+        """Decimates all traces again for the current view, e.g. when zooming in while stopped."""
+        self._redecimate_pending = False
+        for item, (x, y) in list(self.display_data.items()):
+            self.set_display_data(item, x, y)
+
     def update_reference_line_color(self, channel_index):
         """Update the reference line color to match the channel color."""
         if 0 <= channel_index < len(self.reference_lines) and channel_index < len(self.linepens):
@@ -695,6 +798,7 @@ class PlotManager(pg.QtCore.QObject):
             if math_name not in current_math_names:
                 line = self.math_channel_lines[math_name]
                 self.plot.removeItem(line)
+                self.display_data.pop(line, None)
                 del self.math_channel_lines[math_name]
 
         # Create or update lines for math channels
@@ -746,10 +850,10 @@ class PlotManager(pg.QtCore.QObject):
         Args:
             math_results: Dictionary mapping math channel names to (x_data, y_data) tuples
         """
+        self.math_channel_data = dict(math_results)
         for math_name, (x_data, y_data) in math_results.items():
             if math_name in self.math_channel_lines:
-                # Optimization: Use skipFiniteCheck for faster setData
-                self.math_channel_lines[math_name].setData(x_data, y_data, skipFiniteCheck=True)
+                self.set_display_data(self.math_channel_lines[math_name], x_data, y_data)
 
     def update_math_reference_lines(self, math_window, main_window):
         """Updates the set of math reference lines based on reference data.
@@ -805,16 +909,9 @@ class PlotManager(pg.QtCore.QObject):
             # Use stored doresamp if available (for backward compatibility and for references)
             doresamp_to_use = ref_data.get('doresamp', 1)
             if doresamp_to_use > 1:
-                if self.state.polyphase_upsampling_enabled:
-                    # Use polyphase resampling to reduce ringing artifacts
-                    y_resampled = resample_poly(y_data, doresamp_to_use, 1)
-                    # Reconstruct time axis with proper spacing to avoid time shift
-                    dt_orig = (x_data[-1] - x_data[0]) / (len(x_data) - 1)
-                    dt_new = dt_orig / doresamp_to_use
-                    x_resampled = x_data[0] + np.arange(len(y_resampled)) * dt_new
-                else:
-                    # Use FFT-based resampling
-                    y_resampled, x_resampled = resample(y_data, len(x_data) * doresamp_to_use, t=x_data)
+                # Polyphase resampling reduces ringing artifacts, FFT-based resampling is faster
+                x_resampled, y_resampled = resample_trace(x_data, y_data, doresamp_to_use,
+                                                          self.state.polyphase_upsampling_enabled)
                 self.math_reference_lines[math_name].setData(x_resampled, y_resampled, skipFiniteCheck=True)
             else:
                 self.math_reference_lines[math_name].setData(x_data, y_data, skipFiniteCheck=True)
@@ -959,12 +1056,20 @@ class PlotManager(pg.QtCore.QObject):
         self.current_vline_pos = vline_pos
 
     # Persistence Methods
+    def persist_time_for(self, value):
+        """The persistence time in ms for a persistence spinbox value: 50*2^value, off at 0 and infinite at the maximum."""
+        if value <= 0:
+            return 0
+        if value >= self.ui.persistTbox.maximum():
+            return math.inf
+        return 50 * pow(2, value)
+
     def set_persistence(self, value, channel_index=None):
         """Set persistence time for a specific channel."""
         if channel_index is None:
             channel_index = self.state.activexychannel
 
-        persist_time_ms = 50 * pow(2, value) if value > 0 else 0
+        persist_time_ms = self.persist_time_for(value)
         self.state.persist_time[channel_index] = persist_time_ms
 
         # Start/stop timer based on whether ANY channel has persistence active
@@ -977,11 +1082,15 @@ class PlotManager(pg.QtCore.QObject):
             self.clear_persist(channel_index)
 
         # Update the spinbox tooltip to show the actual time value
-        time_str = f"{persist_time_ms / 1000.0:.1f} s" if persist_time_ms > 0 else "Off"
+        if math.isinf(persist_time_ms):
+            time_str = "Infinite"
+        else:
+            time_str = f"{persist_time_ms / 1000.0:.1f} s" if persist_time_ms > 0 else "Off"
         self.ui.persistTbox.setToolTip(f"Persistence time: {time_str}")
 
+    @profiler.timed('persistence')
     def _add_to_persistence(self, x, y, line_idx):
-        """Add a trace to the persistence buffer for a specific channel."""
+        """Add a trace to the persistence buffer and the persistence image of a specific channel."""
         # Initialize deque for this channel if needed
         if line_idx not in self.persist_lines_per_channel:
             self.persist_lines_per_channel[line_idx] = deque(maxlen=self.max_persist_lines)
@@ -990,8 +1099,7 @@ class PlotManager(pg.QtCore.QObject):
 
         # If we're about to remove the oldest line, remove it from heatmap first
         if len(persist_lines) >= self.max_persist_lines:
-            oldest_item, _, _, oldest_x, oldest_y = persist_lines.popleft()
-            self.plot.removeItem(oldest_item)
+            _, oldest_x, oldest_y = persist_lines.popleft()
             # Remove from heatmap
             if self.state.persist_heatmap_enabled[line_idx]:
                 self.heatmap_manager.remove_trace(oldest_x, oldest_y, line_idx)
@@ -1001,10 +1109,9 @@ class PlotManager(pg.QtCore.QObject):
             # Check if gain/offset changed - need to clear everything
             if self.heatmap_manager.check_gain_offset_changed(line_idx):
                 # Clear all persist lines for this channel since they're in the old scale
-                for item_data in list(persist_lines):
-                    item = item_data[0]
-                    self.plot.removeItem(item)
                 persist_lines.clear()
+                if line_idx in self.persist_averages:
+                    self.persist_averages[line_idx].clear()
                 # Just clear the heatmap - don't regenerate with empty data
                 # It will rebuild naturally as new traces come in
                 self.heatmap_manager.clear_for_settings_change(line_idx)
@@ -1015,16 +1122,14 @@ class PlotManager(pg.QtCore.QObject):
                 # Regenerate heatmap with new view range
                 self.heatmap_manager.regenerate(line_idx, persist_lines)
 
-        pen = self.linepens[line_idx]
-        color = pen.color()
-        color.setAlpha(100)
-        new_pen = pg.mkPen(color, width=1)
-        persist_item = self.plot.plot(x, y, pen=new_pen, skipFiniteCheck=True, connect="finite")
-        # If heatmap mode is enabled, hide the individual persist lines
-        persist_item.setVisible(self.state.persist_lines_enabled[line_idx] and not self.state.persist_heatmap_enabled[line_idx])
+        # Draw it into the persistence image, which is shown instead of the faint persist lines
+        if self.state.persist_lines_enabled[line_idx] and not self.state.persist_heatmap_enabled[line_idx]:
+            self.phosphor_manager.add_trace(x, y, line_idx, self.linepens[line_idx].color())
 
-        # Store a copy of the data for later heatmap removal
-        persist_lines.append((persist_item, time.time(), line_idx, x.copy(), y.copy()))
+        # Store a copy of the data for the heatmap (including later removal)
+        timestamp = time.time()
+        persist_lines.append((timestamp, x.copy(), y.copy()))
+        self._add_to_persist_average(x, y, timestamp, line_idx)
 
         # If heatmap mode is enabled, add this trace to the heatmap
         if self.state.persist_heatmap_enabled[line_idx]:
@@ -1033,11 +1138,13 @@ class PlotManager(pg.QtCore.QObject):
             self.heatmap_manager.add_trace(x, y, line_idx, persist_lines)
 
     def update_persist_effect(self):
-        """Updates the alpha/transparency of persistent lines for all channels."""
-        if not self.persist_lines_per_channel:
+        """Fades the persistence images and expires old persist lines for all channels."""
+        if not self.persist_lines_per_channel and not self.phosphor_manager.accumulators:
             self.persist_timer.stop()
             return
 
+        self.phosphor_manager.decay()
+
         current_time = time.time()
 
         # Update each channel's persist lines
@@ -1047,57 +1154,42 @@ class PlotManager(pg.QtCore.QObject):
             if channel_persist_time == 0:
                 continue
 
-            items_to_remove = []
-            # Only show the last max_visible_persist_lines (16) for performance
-            # But keep all 100 in the buffer for heatmap
-            total_lines = len(persist_lines)
-            visible_start_idx = max(0, total_lines - self.max_visible_persist_lines)
-
-            for idx, item_data in enumerate(persist_lines):
-                item = item_data[0]
-                creation_time = item_data[1]
-                li = item_data[2]
-                age = (current_time - creation_time) * 1000.0
-                if age > channel_persist_time:
-                    items_to_remove.append(item_data)
-                else:
-                    # Only make the last 16 lines visible
-                    should_be_visible = (idx >= visible_start_idx and
-                                        self.state.persist_lines_enabled[channel_idx] and
-                                        not self.state.persist_heatmap_enabled[channel_idx])
-
-                    if should_be_visible:
-                        # Update alpha for visible lines
-                        alpha = int(100 * (1 - (age / channel_persist_time)))
-                        pen = self.linepens[li]
-                        color = pen.color()
-                        color.setAlpha(alpha)
-                        new_pen = pg.mkPen(color, width=1)
-                        item.setPen(new_pen)
-                        item.setVisible(True)
-                    else:
-                        # Hide older lines to improve performance
-                        item.setVisible(False)
-
-            # Remove expired items
-            for item_data in items_to_remove:
-                item, _, _, x_data, y_data = item_data
-                self.plot.removeItem(item)
-                persist_lines.remove(item_data)
+            if channel_idx in self.persist_averages:
+                self.persist_averages[channel_idx].expire(current_time - channel_persist_time / 1000.0)
+
+            # Remove expired lines, which are the oldest ones
+            while persist_lines and (current_time - persist_lines[0][0]) * 1000.0 > channel_persist_time:
+                _, x_data, y_data = persist_lines.popleft()
                 # Remove from heatmap incrementally
                 if self.state.persist_heatmap_enabled[channel_idx]:
                     self.heatmap_manager.remove_trace(x_data, y_data, channel_idx)
 
+    def _add_to_persist_average(self, x, y, timestamp, line_idx):
+        """Add a trace to the running persist average of a channel."""
+        s = self.state
+        if line_idx not in self.persist_averages:
+            self.persist_averages[line_idx] = RunningAverage()
+        average = self.persist_averages[line_idx]
+        average.mode, average.depth = s.persist_avg_mode, s.persist_avg_depth
+
+        board_idx = line_idx // s.num_chan_per_board
+        num_points = s.expect_samples * 40 * (2 if s.dointerleaved[board_idx] else 1)
+        # Account for doresamp - the stored lines are already resampled, so we need to match that resolution
+        if s.doresamp[line_idx]:
+            num_points *= s.doresamp[line_idx]
+        average.add(x, y, timestamp, num_points)
+
     def update_persist_average(self):
-        """Calculates and plots the average of persistent traces for all channels with data."""
+        """Plots the running average of persistent traces for all channels with data."""
         s = self.state
 
-        # Iterate over all channels that have persist lines
-        for channel_idx, persist_lines in self.persist_lines_per_channel.items():
-            if len(persist_lines) < 1:
+        for channel_idx, average in self.persist_averages.items():
+            y_average = average.mean()
+            if y_average is None:
                 # Clear the average line for this channel if it exists
                 if channel_idx in self.average_lines:
-                    self.average_lines[channel_idx].clear()
+                    self.clear_display_data(self.average_lines[channel_idx])
+                self._clear_envelope(channel_idx)
                 continue
 
             # Create average line for this channel if it doesn't exist
@@ -1112,27 +1204,36 @@ class PlotManager(pg.QtCore.QObject):
                 # Set initial visibility based on state
                 avg_line.setVisible(s.persist_avg_enabled[channel_idx])
 
-            # Only use the last 16 lines for averaging (for performance)
-            lines_to_average = list(persist_lines)[-self.max_visible_persist_lines:]
-
-            first_line_item = lines_to_average[0][0]
-            min_x, max_x = first_line_item.xData.min(), first_line_item.xData.max()
-
-            board_idx = channel_idx // s.num_chan_per_board
-            num_points = s.expect_samples * 40 * (2 if s.dointerleaved[board_idx] else 1)
-            # Account for doresamp - the stored lines are already resampled, so we need to match that resolution
-            if s.doresamp[channel_idx]:
-                num_points *= s.doresamp[channel_idx]
-            common_x_axis = np.linspace(min_x, max_x, num_points)
-
-            resampled_y_values = [np.interp(common_x_axis, item.xData, item.yData) for item, _, _, _, _ in lines_to_average]
+            # Note: Do NOT resample here - the persist lines are already resampled when stored
+            # Resampling again would cause time shift artifacts
+            self.set_display_data(self.average_lines[channel_idx], average.x, y_average)
+            self._update_envelope(channel_idx, average)
 
-            if resampled_y_values:
-                y_average = np.mean(resampled_y_values, axis=0)
-                # Note: Do NOT resample here - the persist lines are already resampled when stored
-                # Resampling again would cause time shift artifacts
-                # Optimization: Use skipFiniteCheck for faster setData
-                self.average_lines[channel_idx].setData(common_x_axis, y_average, skipFiniteCheck=True)
+    def _update_envelope(self, channel_idx, average):
+        """Draws the persist average +- one standard deviation of a channel, if the envelope is on."""
+        if not self.state.persist_avg_envelope:
+            self._clear_envelope(channel_idx)
+            return
+        if channel_idx not in self.envelope_lines:
+            pen = pg.mkPen(color=self.linepens[channel_idx].color(), width=1, style=QtCore.Qt.DotLine)
+            self.envelope_lines[channel_idx] = (self.plot.plot(pen=pen, name=f"persist_env_hi_ch{channel_idx}"),
+                                                self.plot.plot(pen=pen, name=f"persist_env_lo_ch{channel_idx}"))
+        lower, upper = average.envelope()
+        upper_line, lower_line = self.envelope_lines[channel_idx]
+        self.set_display_data(upper_line, average.x, upper)
+        self.set_display_data(lower_line, average.x, lower)
+        self.update_envelope_visibility(channel_idx)
+
+    def _clear_envelope(self, channel_idx):
+        for line in self.envelope_lines.get(channel_idx, ()):
+            self.clear_display_data(line)
+
+    def update_envelope_visibility(self, channel_idx):
+        """The envelope is shown along with the channel's average line."""
+        average_line = self.average_lines.get(channel_idx)
+        visible = average_line is not None and average_line.isVisible() and self.state.persist_avg_envelope
+        for line in self.envelope_lines.get(channel_idx, ()):
+            line.setVisible(visible)
 
     def clear_persist(self, channel_index=None):
         """Clear persistence for a specific channel or all channels.
@@ -1143,21 +1244,17 @@ class PlotManager(pg.QtCore.QObject):
         if channel_index is not None:
             # Clear only the specified channel
             if channel_index in self.persist_lines_per_channel:
-                persist_lines = self.persist_lines_per_channel[channel_index]
-                for item_data in list(persist_lines):
-                    item = item_data[0]
-                    self.plot.removeItem(item)
-                persist_lines.clear()
-            # Clear heatmap for this channel
+                self.persist_lines_per_channel[channel_index].clear()
+            if channel_index in self.persist_averages:
+                self.persist_averages[channel_index].clear()
+            # Clear persistence image and heatmap for this channel
+            self.phosphor_manager.clear_channel(channel_index)
             self.heatmap_manager.clear_channel(channel_index)
         else:
             # Clear all channels
-            for channel_idx, persist_lines in list(self.persist_lines_per_channel.items()):
-                for item_data in list(persist_lines):
-                    item = item_data[0]
-                    self.plot.removeItem(item)
-                persist_lines.clear()
             self.persist_lines_per_channel.clear()
+            self.persist_averages.clear()
+            self.phosphor_manager.clear_all()
             # Clear all heatmaps
             for channel_idx in list(self.heatmap_manager.persist_heatmap_data.keys()):
                 self.heatmap_manager.clear_channel(channel_idx)
@@ -1166,11 +1263,14 @@ class PlotManager(pg.QtCore.QObject):
         if channel_index is not None:
             # Clear only the specified channel's average line
             if channel_index in self.average_lines:
-                self.average_lines[channel_index].clear()
+                self.clear_display_data(self.average_lines[channel_index])
+            self._clear_envelope(channel_index)
         else:
             # Clear all channels' average lines
             for avg_line in self.average_lines.values():
-                avg_line.clear()
+                self.clear_display_data(avg_line)
+            for channel_idx in self.envelope_lines:
+                self._clear_envelope(channel_idx)
 
     # Peak Detect Methods
     def set_peak_detect(self, enabled):
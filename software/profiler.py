@@ -0,0 +1,177 @@
+# profiler.py
+
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class SpanRing:
+    """
+    The last capacity timings of one span on one thread, as start times and durations in ns.
+
+    Only its own thread writes to it, and it bumps count after writing the entry, so readers on other
+    threads can take snapshots without a lock. A snapshot taken while the ring wraps can have one entry
+    from the next lap, which doesn't matter for statistics.
+    """
+
+    def __init__(self, name, thread, capacity):
+        self.name = name
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.starts = np.zeros(capacity, dtype=np.int64)
+        self.durations = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def add(self, start, duration):
+        i = self.count % len(self.starts)
+        self.starts[i] = start
+        self.durations[i] = duration
+        self.count += 1
+
+    def snapshot(self):
+        """The (starts, durations) currently in the ring, oldest first."""
+        count, capacity = self.count, len(self.starts)
+        if count <= capacity:
+            return self.starts[:count].copy(), self.durations[:count].copy()
+        i = count % capacity
+        return np.roll(self.starts, -i), np.roll(self.durations, -i)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        self.profiler.record(self.name, self.start, end - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Profiler:
+    """
+    Named timing spans for the stages of the event pipeline, e.g.
+
+        with profiler.span('decode'):
+            ...
+
+    or @profiler.timed('measurements') on a method. Each (span, thread) has its own SpanRing, so the
+    acquisition, board reader and GUI threads record without locking. summary() gives the count and
+    p50/p99/max per span, chrome_trace() the recent spans in the Chrome trace event format (for
+    chrome://tracing or Perfetto). While disabled, spans cost next to nothing.
+    """
+
+    def __init__(self, capacity=4096, enabled=False):
+        self.capacity = capacity  # Timings kept per span and thread
+        self.enabled = enabled
+        self.origin = time.perf_counter_ns()  # Time zero of the Chrome trace
+        self._rings = {}  # Dictionary: {(span name, thread id): SpanRing}
+
+    def span(self, name):
+        """A context manager timing its block as span name, if enabled."""
+        return _Span(self, name) if self.enabled else _NO_SPAN
+
+    def timed(self, name):
+        """A decorator timing every call of the function as span name, if enabled."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter_ns() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name, start, duration):
+        """Record a span that started at perf_counter_ns() start and took duration ns."""
+        thread = threading.current_thread()
+        ring = self._rings.get((name, thread.ident))
+        if ring is None:
+            ring = self._rings[(name, thread.ident)] = SpanRing(name, thread, self.capacity)
+        ring.add(start, duration)
+
+    def reset(self):
+        """Drop all recorded spans (the rings of other threads are dropped, not cleared under them)."""
+        self._rings = {}
+        self.origin = time.perf_counter_ns()
+
+    def summary(self):
+        """
+        Statistics of the recent timings of each span, over all threads.
+
+        Returns:
+            Dictionary {span name: {'count', 'mean', 'p50', 'p99', 'max'}}, the count of all calls since the
+            last reset and the others in ms over the ones still in the rings, sorted by name
+        """
+        durations, counts = {}, {}
+        for ring in list(self._rings.values()):
+            counts[ring.name] = counts.get(ring.name, 0) + ring.count
+            durations.setdefault(ring.name, []).append(ring.snapshot()[1])
+        result = {}
+        for name in sorted(durations):
+            ms = np.concatenate(durations[name]) / 1e6
+            if not len(ms):
+                continue
+            p50, p99 = np.percentile(ms, (50, 99))
+            result[name] = {'count': counts[name], 'mean': float(ms.mean()), 'p50': float(p50),
+                            'p99': float(p99), 'max': float(ms.max())}
+        return result
+
+    def summary_text(self):
+        """The summary as CSV lines: name,count,mean_ms,p50_ms,p99_ms,max_ms."""
+        lines = ["name,count,mean_ms,p50_ms,p99_ms,max_ms"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name},{stats['count']},{stats['mean']:.4f},{stats['p50']:.4f},"
+                         f"{stats['p99']:.4f},{stats['max']:.4f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """The spans still in the rings as a Chrome trace event format dictionary."""
+        pid = os.getpid()
+        events, threads = [], {}
+        for ring in list(self._rings.values()):
+            threads[ring.thread_id] = ring.thread_name
+            starts, durations = ring.snapshot()
+            for start, duration in zip(((starts - self.origin) / 1e3).tolist(), (durations / 1e3).tolist()):
+                events.append({'name': ring.name, 'ph': 'X', 'ts': start, 'dur': duration,
+                               'pid': pid, 'tid': ring.thread_id})
+        events.sort(key=lambda event: event['ts'])
+        for thread_id, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, filename):
+        """Write chrome_trace() to a JSON file."""
+        with open(filename, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# The profiler of the application, for the modules to record their spans in
+profiler = Profiler()
@@ -0,0 +1,98 @@
+# profiler_window.py
+
+import sys
+import os
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QPushButton, QCheckBox, QFileDialog, QMessageBox, QHeaderView)
+from PyQt5.QtCore import Qt, QTimer
+from profiler import profiler
+
+
+class ProfilerWindow(QDockWidget):
+    """Dockable panel showing the timing statistics of the event pipeline stages, see profiler.py."""
+
+    COLUMNS = ["Stage", "Count", "Mean (ms)", "p50 (ms)", "p99 (ms)", "Max (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__("Profiler", parent)
+        self.setObjectName("ProfilerWindow")
+        self.setAllowedAreas(Qt.AllDockWidgetAreas)
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.enable_check = QCheckBox("Enabled")
+        self.enable_check.setChecked(profiler.enabled)
+        self.enable_check.toggled.connect(self.set_enabled)
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.reset)
+        self.export_button = QPushButton("Export trace")
+        self.export_button.setToolTip("Save the recent spans as Chrome trace JSON, for chrome://tracing or Perfetto")
+        self.export_button.clicked.connect(self.export_trace)
+        button_layout.addWidget(self.enable_check)
+        button_layout.addWidget(self.reset_button)
+        button_layout.addWidget(self.export_button)
+        layout.addLayout(button_layout)
+        self.setWidget(widget)
+
+        # Refresh the table once a second while shown
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def on_visibility_changed(self, visible):
+        if visible:
+            # Profiling is what the panel is for, so start it when it's opened
+            if not profiler.enabled:
+                self.enable_check.setChecked(True)
+            self.refresh()
+            self.refresh_timer.start(1000)
+        else:
+            self.refresh_timer.stop()
+
+    def set_enabled(self, enabled):
+        profiler.enabled = enabled
+
+    def reset(self):
+        profiler.reset()
+        self.refresh()
+
+    def refresh(self):
+        """Update the table from the profiler's current summary."""
+        self.enable_check.blockSignals(True)
+        self.enable_check.setChecked(profiler.enabled)  # Could have been changed over SCPI
+        self.enable_check.blockSignals(False)
+        summary = profiler.summary()
+        self.table.setRowCount(len(summary))
+        for row, (name, stats) in enumerate(summary.items()):
+            values = [name, str(stats['count'])] + [f"{stats[key]:.3f}" for key in ('mean', 'p50', 'p99', 'max')]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def export_trace(self):
+        """Save the recent spans to a Chrome trace JSON file."""
+        options = QFileDialog.Options()
+        if sys.platform.startswith('linux'):
+            options |= QFileDialog.DontUseNativeDialog
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "",
+                                                   "Chrome Trace Files (*.json);;All Files (*)", options=options)
+        if not file_path:
+            return  # User cancelled
+        if not os.path.splitext(file_path)[1]:
+            file_path += ".json"
+        try:
+            profiler.export_chrome_trace(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export trace: {str(e)}")
@@ -0,0 +1,76 @@
+"""
+Render Scheduler for HaasoscopePro
+Decides which acquired events get drawn, so the acquisition rate isn't limited by the redraw rate
+"""
+
+import time
+
+
+class RenderScheduler:
+    """
+    Limits how often the views are redrawn, independent of how fast events are acquired.
+
+    Every event is still decoded, recorded, kept in the history and fed into persistence, averaging and
+    peak detect, but the main plot is only redrawn up to state.max_display_fps times a second, and the
+    zoom, XY and FFT views can be limited further with state.max_view_fps. Redraws are spaced on a fixed
+    cadence rather than from the previous one, so the average rate holds even though the event loop only
+    gets to check now and then. Also measures the acquisition and display rates for the status bar.
+    """
+
+    def __init__(self, state):
+        """
+        Initialize the RenderScheduler.
+
+        Args:
+            state: The ScopeState object containing application state
+        """
+        self.state = state
+        self.next_render = {}  # Dictionary: {view: time when it can next be redrawn}
+
+        # Acquisition and display rates (per second), averaged over rate_interval
+        self.rate_interval = 1.0
+        self.acquisition_rate = 0.0
+        self.display_rate = 0.0
+        self._counts = {'events': 0, 'frames': 0}
+        self._count_start = time.perf_counter()
+
+    def max_fps(self, view):
+        """The highest redraw rate of a view ('plot', 'zoom', 'xy' or 'fft'), 0 for no limit."""
+        limits = [fps for fps in (self.state.max_display_fps, self.state.max_view_fps.get(view, 0)) if fps]
+        return min(limits) if limits else 0
+
+    def should_render(self, view, now=None):
+        """True if a view is due to be redrawn, in which case its next redraw is scheduled."""
+        fps = self.max_fps(view)
+        if not fps:
+            return True
+        now = time.perf_counter() if now is None else now
+        due = self.next_render.get(view)
+        if due is not None and now < due:
+            return False
+        # Keep the cadence, but don't try to catch up on redraws missed while nothing was acquired
+        interval = 1.0 / fps
+        next_render = (now if due is None else due) + interval
+        self.next_render[view] = next_render if next_render > now else now + interval
+        return True
+
+    def reset(self):
+        """Let all views redraw with the next event, e.g. after a settings change."""
+        self.next_render.clear()
+
+    def event_acquired(self):
+        self._counts['events'] += 1
+        self._update_rates()
+
+    def frame_drawn(self):
+        self._counts['frames'] += 1
+        self._update_rates()
+
+    def _update_rates(self):
+        now = time.perf_counter()
+        elapsed = now - self._count_start
+        if elapsed >= self.rate_interval:
+            self.acquisition_rate = self._counts['events'] / elapsed
+            self.display_rate = self._counts['frames'] / elapsed
+            self._counts = {'events': 0, 'frames': 0}
+            self._count_start = now
@@ -0,0 +1,103 @@
+# resampler.py
+
+import functools
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import firwin, resample
+from profiler import profiler
+
+
+class Resampler:
+    """
+    Upsamples traces of a given length by an integer factor, with the filter and the time axis ramp
+    computed once.
+
+    The polyphase method gives the same result as scipy.signal.resample_poly(y, factor, 1): a Kaiser
+    window (beta 5) FIR with 10 zero crossings per side. Here the filter is designed once and kept as a
+    (taps, factor) bank, so all phases of all channels come out of one matrix product. The FFT method
+    is scipy.signal.resample. Both take one trace or a (channels, length) batch.
+    """
+
+    def __init__(self, length, factor, polyphase=True):
+        self.length = length
+        self.factor = factor
+        self.polyphase = polyphase
+        self.ramp = np.arange(length * factor, dtype=float)  # Output sample numbers, for the time axis
+        if polyphase and factor > 1:
+            half_len = 10 * factor
+            h = firwin(2 * half_len + 1, 1.0 / factor, window=('kaiser', 5.0)) * factor
+            # resample_poly pads the filter with a leading zero, to center the output samples on the input ones
+            h = np.concatenate(([0.0], h))
+            self.taps = -(-len(h) // factor)
+            bank = np.zeros(self.taps * factor)
+            bank[:len(h)] = h
+            self.bank = bank.reshape(self.taps, factor)  # bank[j, p] = h[j * factor + p]
+            self.skip = half_len + 1  # Leading output samples that come from the zero padding
+
+    def resample(self, y):
+        """Upsamples a trace, or a (channels, length) batch of them."""
+        y = np.asarray(y)
+        if self.factor == 1:
+            return y.copy()
+        if not self.polyphase:
+            return resample(y, self.length * self.factor, axis=-1)
+
+        dtype = np.result_type(y.dtype, np.float32)
+        batch = np.atleast_2d(y)
+        padded = np.zeros((len(batch), self.length + 2 * (self.taps - 1)), dtype=dtype)
+        padded[:, self.taps - 1:self.taps - 1 + self.length] = batch
+        # windows[c, k, j] = y[c, k - j], so windows @ bank has the output of every phase p for input sample k
+        windows = sliding_window_view(padded, self.taps, axis=-1)[:, :, ::-1]
+        out = (windows @ self.bank.astype(dtype)).reshape(len(batch), -1)
+        out = out[:, self.skip:self.skip + self.length * self.factor]
+        return out if y.ndim > 1 else out[0]
+
+    def time_axis(self, x):
+        """The time axis of the upsampled trace, for the (uniformly spaced) time axis x of the original."""
+        if self.polyphase:
+            dt = (x[-1] - x[0]) / (len(x) - 1) / self.factor
+        else:
+            dt = (x[1] - x[0]) / self.factor  # As scipy.signal.resample(..., t=x) makes it
+        return x[0] + self.ramp * dt
+
+
+@functools.lru_cache(maxsize=32)
+def get_resampler(length, factor, polyphase=True):
+    """The Resampler for (length, factor, method), shared by the main plot, math channels and zoom window."""
+    return Resampler(length, factor, polyphase)
+
+
+@profiler.timed('resample')
+def resample_trace(x, y, factor, polyphase=True):
+    """Upsamples one trace by an integer factor, returns the new (x, y)."""
+    resampler = get_resampler(len(y), int(factor), bool(polyphase))
+    return resampler.time_axis(x), resampler.resample(y)
+
+
+@profiler.timed('resample')
+def resample_traces(traces, factors, polyphase=True):
+    """
+    Upsamples several traces, those of the same length and factor in one batched call.
+
+    Args:
+        traces: Dictionary {key: (x_data, y_data)}
+        factors: Dictionary {key: upsampling factor}, traces with a factor of 0 or 1 (or none) are passed through
+        polyphase: Polyphase filtering (less ringing on sharp edges) rather than FFT resampling
+
+    Returns:
+        Dictionary {key: (x_data, y_data)}
+    """
+    resampled = {}
+    groups = {}
+    for key, (x, y) in traces.items():
+        factor = int(factors.get(key) or 1)
+        if factor > 1:
+            groups.setdefault((len(y), factor), []).append(key)
+        else:
+            resampled[key] = (x, y)
+    for (length, factor), keys in groups.items():
+        resampler = get_resampler(length, factor, bool(polyphase))
+        ys = resampler.resample(np.stack([traces[key][1] for key in keys]))
+        for key, y in zip(keys, ys):
+            resampled[key] = (resampler.time_axis(traces[key][0]), y)
+    return {key: resampled[key] for key in traces}
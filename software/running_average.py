@@ -0,0 +1,123 @@
+# running_average.py
+
+from collections import deque
+import numpy as np
+
+
+class RunningAverage:
+    """
+    The streaming average of a channel's traces on a fixed time grid, with a per-sample standard deviation.
+
+    Each trace is interpolated onto the grid once, when it's added. In 'window' mode the average is
+    over the last depth traces, kept as a running sum and sum of squares: the newest trace is added and
+    the one falling out of the window subtracted, so an update costs O(grid) however deep the average.
+    In 'exponential' mode each trace gets weight 1/depth and older ones fade geometrically, with the
+    variance updated the same way. The grid is (re)made from the first trace's time range, and again
+    when traces stop matching it (timebase, trigger position or resampling changes).
+    """
+
+    def __init__(self, mode='window', depth=16):
+        self.mode = mode
+        self.depth = depth
+        self.x = None  # The time grid
+        self.clear()
+
+    def clear(self):
+        self._mode = self.mode  # The mode the sums are for
+        self.count = 0
+        self.sum = None  # Window mode: sums of the traces and their squares on the grid
+        self.sumsq = None
+        self.ewm = None  # Exponential mode: running mean and variance
+        self.ewv = None
+        self.window = deque()  # Window mode: (timestamp, gridded y) of the traces in the window
+        self.last_timestamp = None
+
+    def _matches_grid(self, x, num_points):
+        if self.x is None or len(self.x) != num_points:
+            return False
+        tolerance = 0.01 * (self.x[-1] - self.x[0])
+        return abs(x[0] - self.x[0]) <= tolerance and abs(x[-1] - self.x[-1]) <= tolerance
+
+    def add(self, x, y, timestamp, num_points):
+        """
+        Add a trace. Starts over on a new grid of num_points from its time range if it doesn't match the
+        current one, and when the mode changed.
+
+        Args:
+            x: x-coordinate data (time), increasing
+            y: y-coordinate data (voltage)
+            timestamp: When the trace was acquired, for expire()
+            num_points: Number of grid points
+        """
+        if not self._matches_grid(x, num_points):
+            self.x = np.linspace(float(x[0]), float(x[-1]), num_points)
+            self.clear()
+        elif self.mode != self._mode:
+            self.clear()
+
+        gridded = np.interp(self.x, x, y)
+        self.last_timestamp = timestamp
+        if self.mode == 'exponential':
+            if self.ewm is None:
+                self.ewm = gridded
+                self.ewv = np.zeros_like(gridded)
+            else:
+                # The usual exponentially weighted mean and variance recurrences
+                alpha = 1.0 / max(self.depth, 1)
+                delta = gridded - self.ewm
+                self.ewm += alpha * delta
+                self.ewv *= 1 - alpha
+                self.ewv += (alpha * (1 - alpha)) * delta * delta
+            self.count = min(self.count + 1, self.depth)
+            return
+
+        if self.sum is None:
+            self.sum = np.zeros(len(self.x))
+            self.sumsq = np.zeros(len(self.x))
+        self.window.append((timestamp, gridded))
+        self.sum += gridded
+        self.sumsq += gridded * gridded
+        while len(self.window) > self.depth:
+            self._drop_oldest()
+        self.count = len(self.window)
+
+    def _drop_oldest(self):
+        _, gridded = self.window.popleft()
+        self.sum -= gridded
+        self.sumsq -= gridded * gridded
+
+    def expire(self, cutoff):
+        """Drop the traces acquired before cutoff (in exponential mode, everything once the newest one is)."""
+        if self._mode == 'exponential':
+            if self.last_timestamp is not None and self.last_timestamp < cutoff:
+                self.clear()
+            return
+        while self.window and self.window[0][0] < cutoff:
+            self._drop_oldest()
+        self.count = len(self.window)
+        if not self.window:
+            self.clear()
+
+    def mean(self):
+        """The average on the grid, or None if there are no traces."""
+        if not self.count:
+            return None
+        if self._mode == 'exponential':
+            return self.ewm
+        return self.sum / self.count
+
+    def std(self):
+        """The per-sample standard deviation of the traces on the grid, or None if there are no traces."""
+        if not self.count:
+            return None
+        if self._mode == 'exponential':
+            return np.sqrt(self.ewv)
+        variance = self.sumsq / self.count - (self.sum / self.count) ** 2
+        return np.sqrt(np.maximum(variance, 0, out=variance))
+
+    def envelope(self):
+        """The (mean - std, mean + std) band on the grid, or None if there are no traces."""
+        mean, std = self.mean(), self.std()
+        if mean is None:
+            return None
+        return mean - std, mean + std
@@ -21,6 +21,9 @@ class ScopeState:
         self.isrolling = 1  # Start in Auto (rolling) mode
         self.getone = False
         self.dodrawing = True
+        self.max_display_fps = 60  # Redraws per second at most, events in between only feed persistence and averaging (0 for no limit)
+        self.max_view_fps = {'zoom': 0, 'xy': 0, 'fft': 0}  # Lower limits for the other views, e.g. {'fft': 5} (0 for none)
+        self.measure_all_events = False  # Measure every acquired event for the statistics, not just the displayed one
         self.dopattern = 0
         self.pll_reset_grace_period = 0
         self.dooverrange = False
@@ -28,6 +31,11 @@ class ScopeState:
         self.dorecordtofile = False
         self.outf = None
         self.numrecordeventsperfile = 1000
+        self.batched_readout = True  # Pipeline the per-event USB commands into fewer round trips
+        self.waveform_dtype = 'float32'  # dtype of xydata and the display pipeline, 'float64' for full precision
+        self.history_depth = 1000  # Events kept in the history buffer (as raw payloads, re-decoded when selected)
+        self.history_max_mbytes = 512  # ... but no more than this, for deep memory settings
+        self.recorder_format = 'float32'  # Recording file format: 'float32' or 'int16' (binary .hsr), or 'csv'
 
         # Board/Channel Specific States
         self.activeboard = 0
@@ -60,6 +68,9 @@ class ScopeState:
         self.persist_lines_enabled = [False] * (num_boards * num_chan_per_board)  # Show faint persist lines
         self.persist_avg_enabled = [True] * (num_boards * num_chan_per_board)  # Show persist average
         self.persist_heatmap_enabled = [True] * (num_boards * num_chan_per_board)  # Show heatmap instead of lines
+        self.persist_avg_mode = 'window'  # Persist average over the last persist_avg_depth events, or 'exponential'
+        self.persist_avg_depth = 16  # Events in the persist average (the time constant, in events, if exponential)
+        self.persist_avg_envelope = False  # Draw the persist average +- one standard deviation
 
         # Triggering Parameters
         self.triggerlevel = 127
@@ -79,6 +79,8 @@ def save_setup(main_window):
 
         # Display settings
         'dodrawing': s.dodrawing,
+        'max_display_fps': s.max_display_fps,
+        'max_view_fps': s.max_view_fps,
         'downsamplezoom': s.downsamplezoom,
         'min_x': s.min_x,
         'max_x': s.max_x,
@@ -142,6 +144,9 @@ def save_setup(main_window):
         'persist_lines_enabled': main_window.state.persist_lines_enabled,
         'persist_avg_enabled': main_window.state.persist_avg_enabled,
         'persist_heatmap_enabled': main_window.state.persist_heatmap_enabled,
+        'persist_avg_mode': main_window.state.persist_avg_mode,
+        'persist_avg_depth': main_window.state.persist_avg_depth,
+        'persist_avg_envelope': main_window.state.persist_avg_envelope,
         'heatmap_smoothing_sigma': main_window.plot_manager.heatmap_manager.heatmap_smoothing_sigma,
 
         # Channel enabled state (per-channel, from chanonCheck)
@@ -179,6 +184,7 @@ def save_setup(main_window):
         'measure_risetime': main_window.ui.actionRisetime.isChecked(),
         'measure_risetime_error': main_window.ui.actionRisetime_error.isChecked(),
         'measure_edge_fit': main_window.ui.actionEdge_fit_method.isChecked(),
+        'measure_all_events': s.measure_all_events,
         'measure_trig_thresh': main_window.ui.actionTrigger_thresh.isChecked(),
         'measure_n_persist': main_window.ui.actionN_persist_lines.isChecked(),
         'measure_adc_temp': main_window.ui.actionADC_temperature.isChecked(),
@@ -388,6 +394,10 @@ def load_setup(main_window):
     if 'dodrawing' in setup:
         s.dodrawing = setup['dodrawing']
         main_window.ui.actionDrawing.setChecked(s.dodrawing)
+    if 'max_display_fps' in setup:
+        s.max_display_fps = setup['max_display_fps']
+    if 'max_view_fps' in setup:
+        s.max_view_fps.update(setup['max_view_fps'])
     if 'downsamplezoom' in setup:
         s.downsamplezoom = setup['downsamplezoom']
     if 'min_x' in setup:
@@ -470,6 +480,14 @@ def load_setup(main_window):
             # New format: per-channel list
             main_window.state.persist_heatmap_enabled = persist_heatmap
 
+    if 'persist_avg_mode' in setup:
+        main_window.state.persist_avg_mode = setup['persist_avg_mode']
+    if 'persist_avg_depth' in setup:
+        main_window.state.persist_avg_depth = setup['persist_avg_depth']
+    if 'persist_avg_envelope' in setup:
+        main_window.state.persist_avg_envelope = setup['persist_avg_envelope']
+    main_window.update_persist_average_menu()
+
     if 'heatmap_smoothing_sigma' in setup:
         main_window.plot_manager.heatmap_manager.heatmap_smoothing_sigma = setup['heatmap_smoothing_sigma']
 
@@ -600,6 +618,9 @@ def load_setup(main_window):
         main_window.ui.actionRisetime_error.setChecked(setup['measure_risetime_error'])
     if 'measure_edge_fit' in setup:
         main_window.ui.actionEdge_fit_method.setChecked(setup['measure_edge_fit'])
+    if 'measure_all_events' in setup:
+        s.measure_all_events = setup['measure_all_events']
+        main_window.ui.actionMeasure_all_events.setChecked(s.measure_all_events)
     if 'measure_trig_thresh' in setup:
         main_window.ui.actionTrigger_thresh.setChecked(setup['measure_trig_thresh'])
     if 'measure_n_persist' in setup:
@@ -0,0 +1,161 @@
+# trace_filters.py
+
+import functools
+import numpy as np
+from scipy import fft
+from scipy.ndimage import correlate1d
+from scipy.signal import savgol_coeffs
+from profiler import profiler
+
+
+class FirFilter:
+    """
+    Zero-phase FIR filtering, the same as scipy.signal.filtfilt(coeffs, [1.0], y), done with FFTs.
+
+    Filtering forward and then backward with an FIR is a single convolution with the filter convolved
+    with its own reverse, and past the filter length the odd extension and initial conditions filtfilt
+    uses at the ends don't matter. So each trace is odd-extended by that much and convolved with the
+    combined kernel in the frequency domain, where the kernel's spectrum is computed once per FFT size.
+    Takes one trace or a (channels, length) batch.
+    """
+
+    def __init__(self, coeffs):
+        self.coeffs = np.asarray(coeffs, dtype=float)
+        self.kernel = np.convolve(self.coeffs, self.coeffs[::-1])
+        self.pad = len(self.coeffs) - 1  # Samples of extension needed at each end
+        self.min_length = 3 * len(self.coeffs) + 1  # filtfilt needs more samples than its padding
+        self._spectra = {}  # Dictionary: {(nfft, dtype): rfft of the kernel}
+
+    def _spectrum(self, nfft, dtype):
+        key = (nfft, dtype)
+        if key not in self._spectra:
+            self._spectra[key] = fft.rfft(self.kernel.astype(dtype), nfft)
+        return self._spectra[key]
+
+    def apply(self, y):
+        """Filters a trace, or a (channels, length) batch of them. Traces shorter than min_length are returned as they are."""
+        y = np.asarray(y)
+        length = y.shape[-1]
+        if length < self.min_length:
+            return y.copy()
+
+        dtype = np.result_type(y.dtype, np.float32)
+        batch = np.atleast_2d(y).astype(dtype, copy=False)
+        pad = self.pad
+        if pad:
+            # Odd extension about the end points, as filtfilt pads
+            left = 2 * batch[:, :1] - batch[:, pad:0:-1]
+            right = 2 * batch[:, -1:] - batch[:, -2:-pad - 2:-1]
+            batch = np.concatenate((left, batch, right), axis=-1)
+
+        # Circular convolution is exact for the outputs we keep when nfft covers the extended trace
+        nfft = fft.next_fast_len(length + 2 * pad, real=True)
+        out = fft.irfft(fft.rfft(batch, nfft, axis=-1) * self._spectrum(nfft, dtype), nfft, axis=-1)
+        out = out[:, 2 * pad:2 * pad + length]
+        return out if y.ndim > 1 else out[0]
+
+
+class SavgolFilter:
+    """
+    Savitzky-Golay smoothing, the same as scipy.signal.savgol_filter(y, window_length, polyorder,
+    mode='interp'), with its coefficients computed once.
+
+    Inside the trace it's a correlation with the coefficients. In the first and last half windows,
+    where 'interp' mode evaluates a polynomial fit to the first and last window, the fit and evaluation
+    are a fixed matrix applied to those windows. Takes one trace or a (channels, length) batch, of at
+    least window_length samples.
+    """
+
+    def __init__(self, window_length, polyorder):
+        self.window_length = window_length
+        self.polyorder = polyorder
+        self.half = window_length // 2
+        self.coeffs = savgol_coeffs(window_length, polyorder, use='dot')
+
+        # Least squares polynomial fit to a window, and its values in the first and last half window
+        t = np.arange(window_length) - self.half
+        fit = np.linalg.pinv(np.vander(t, polyorder + 1))
+        self.left = np.vander(t[:self.half], polyorder + 1) @ fit
+        self.right = np.vander(t[window_length - self.half:], polyorder + 1) @ fit
+
+    def apply(self, y):
+        """Smooths a trace, or a (channels, length) batch of them."""
+        y = np.asarray(y)
+        dtype = np.result_type(y.dtype, np.float32)
+        batch = np.atleast_2d(y).astype(dtype, copy=False)
+        half, window_length = self.half, self.window_length
+        out = correlate1d(batch, self.coeffs.astype(dtype), axis=-1, mode='constant')
+        if half:
+            out[:, :half] = batch[:, :window_length] @ self.left.T.astype(dtype)
+            out[:, -half:] = batch[:, -window_length:] @ self.right.T.astype(dtype)
+        return out if y.ndim > 1 else out[0]
+
+    @staticmethod
+    def valid_parameters(window_length, polyorder, length):
+        """The window length (odd, at least 3 and less than length) and order (less than it) to use for a trace of length samples."""
+        if window_length >= length:
+            window_length = length - 1 if length % 2 == 0 else length - 2
+        if window_length < 3:
+            window_length = 3
+        if window_length % 2 == 0:  # Must be odd
+            window_length += 1
+        if polyorder >= window_length:
+            polyorder = window_length - 1
+        return window_length, polyorder
+
+
+@functools.lru_cache(maxsize=8)
+def _fir_filter(coeffs_bytes):
+    return FirFilter(np.frombuffer(coeffs_bytes))
+
+
+def get_fir_filter(coeffs):
+    """The FirFilter for a set of coefficients, shared so that its kernel spectra are only computed once."""
+    return _fir_filter(np.asarray(coeffs, dtype=float).tobytes())
+
+
+@functools.lru_cache(maxsize=8)
+def get_savgol_filter(window_length, polyorder):
+    """The SavgolFilter for (window_length, polyorder)."""
+    return SavgolFilter(window_length, polyorder)
+
+
+@profiler.timed('filters')
+def filter_traces(traces, fir_coeffs=None, savgol=None):
+    """
+    Applies the frequency response correction and Savitzky-Golay smoothing to several traces, those
+    of the same length (and FIR coefficients) in one batched call.
+
+    Args:
+        traces: Dictionary {key: y_data}
+        fir_coeffs: Dictionary {key: FIR coefficients}, traces without any (or None) aren't corrected
+        savgol: (window_length, polyorder) to smooth all the traces with, or None
+
+    Returns:
+        Dictionary {key: y_data}, with new arrays for the traces that were filtered
+    """
+    filtered = dict(traces)
+    fir_coeffs = fir_coeffs or {}
+
+    groups = {}
+    for key, y in traces.items():
+        if fir_coeffs.get(key) is not None:
+            fir = get_fir_filter(fir_coeffs[key])
+            groups.setdefault((fir, len(y)), []).append(key)
+    for (fir, length), keys in groups.items():
+        ys = fir.apply(np.stack([filtered[key] for key in keys]))
+        filtered.update(zip(keys, ys))
+
+    if savgol is not None:
+        groups = {}
+        for key, y in traces.items():
+            if len(y) >= 3:
+                groups.setdefault(len(y), []).append(key)
+        for length, keys in groups.items():
+            window_length, polyorder = SavgolFilter.valid_parameters(*savgol, length)
+            if window_length > length:
+                continue
+            ys = get_savgol_filter(window_length, polyorder).apply(np.stack([filtered[key] for key in keys]))
+            filtered.update(zip(keys, ys))
+
+    return filtered
@@ -0,0 +1,79 @@
+# waveform_data.py
+
+import numpy as np
+
+
+class WaveformData:
+    """
+    The per-channel waveforms of one event: y samples plus a compact time axis.
+
+    Every channel's time axis is an affine ramp x = x0 + i * dx (the stabilizer correction lives in x0),
+    so only (x0, dx) is stored per channel and dense x arrays are built on demand with x(), for the
+    consumers that need them (pyqtgraph, interpolation, CSV export). Copies for the history buffer are
+    therefore about half the size, and moving a channel in time is O(1).
+    """
+
+    def __init__(self, num_ch, num_samples, dtype, dx=1.0):
+        self.y = np.zeros((num_ch, num_samples), dtype=dtype)
+        self.x0 = np.zeros(num_ch)
+        self.dx = np.full(num_ch, float(dx))
+
+    @classmethod
+    def from_arrays(cls, y, x0, dx):
+        """Wraps existing (num_ch, num_samples) y samples and per-channel x0, dx arrays without copying."""
+        data = cls.__new__(cls)
+        data.y = np.asarray(y)
+        data.x0 = np.asarray(x0, dtype=float)
+        data.dx = np.asarray(dx, dtype=float)
+        return data
+
+    @classmethod
+    def from_xy(cls, xydata):
+        """Builds it from a dense (num_ch, 2, num_samples) xydata array, as in history files from older versions."""
+        xydata = np.asarray(xydata)
+        return cls.from_arrays(xydata[:, 1].copy(), xydata[:, 0, 0], xydata[:, 0, 1] - xydata[:, 0, 0])
+
+    def __len__(self):
+        return self.y.shape[0]
+
+    @property
+    def num_samples(self):
+        return self.y.shape[1]
+
+    @property
+    def dtype(self):
+        return self.y.dtype
+
+    @property
+    def nbytes(self):
+        return self.y.nbytes + self.x0.nbytes + self.dx.nbytes
+
+    def set_time_axis(self, dx, x0=0.0, channels=None):
+        """Resets the time axis of the given channels (all by default)."""
+        channels = slice(None) if channels is None else channels
+        self.x0[channels] = x0
+        self.dx[channels] = dx
+
+    def x(self, ch, n=None, dtype=None):
+        """Materializes the dense time axis of a channel, optionally only its first n samples."""
+        n = self.num_samples if n is None else n
+        x = np.arange(n, dtype=float)
+        x *= self.dx[ch]
+        x += self.x0[ch]
+        return x.astype(dtype or self.dtype, copy=False)
+
+    def index_range(self, ch, lo, hi):
+        """The slice of samples of a channel whose time is strictly between lo and hi."""
+        x0, dx = self.x0[ch], self.dx[ch]
+        start = max(int(np.floor((lo - x0) / dx)) + 1, 0)
+        stop = min(int(np.ceil((hi - x0) / dx)), self.num_samples)
+        return slice(start, max(start, stop))
+
+    def copy(self):
+        return WaveformData.from_arrays(self.y.copy(), self.x0.copy(), self.dx.copy())
+
+    def astype(self, dtype):
+        """Returns itself if already in dtype, otherwise a copy with the y samples converted."""
+        if self.y.dtype == dtype:
+            return self
+        return WaveformData.from_arrays(self.y.astype(dtype), self.x0.copy(), self.dx.copy())
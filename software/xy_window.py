@@ -5,6 +5,7 @@ from pyqtgraph.Qt import QtCore, QtWidgets
 from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QHBoxLayout, QLabel, QComboBox
 from PyQt5.QtCore import pyqtSignal
+from profiler import profiler
 
 
 class XYWindow(QtWidgets.QWidget):
@@ -231,6 +232,7 @@ class XYWindow(QtWidgets.QWidget):
                     return QColor(math_def['color'])
         return QColor('grey')  # Default color if not found
 
+    @profiler.timed('xy')
     def update_xy_plot(self, xydata, math_results=None):
         """Update the XY plot with new data.
 
@@ -252,7 +254,7 @@ class XYWindow(QtWidgets.QWidget):
         else:
             # Physical channel
             if self.x_channel < len(xydata):
-                x_data = xydata[self.x_channel][1]  # Use Y data (voltage) from X channel
+                x_data = xydata.y[self.x_channel]  # Use Y data (voltage) from X channel
             else:
                 return
 
@@ -266,7 +268,7 @@ class XYWindow(QtWidgets.QWidget):
         else:
             # Physical channel
             if self.y_channel < len(xydata):
-                y_data = xydata[self.y_channel][1]  # Use Y data (voltage) from Y channel
+                y_data = xydata.y[self.y_channel]  # Use Y data (voltage) from Y channel
             else:
                 return
 
@@ -1,11 +1,14 @@
 # zoom_window.py
 
+import weakref
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtWidgets
 from PyQt5.QtGui import QColor, QPen
 from PyQt5.QtCore import pyqtSignal
-from plot_manager import add_secondary_axis
+from plot_manager import add_secondary_axis, minmax_decimate
 from heatmap_manager import HeatmapManager
+from resampler import resample_trace
+from profiler import profiler
 
 
 class ZoomWindow(QtWidgets.QWidget):
@@ -138,9 +141,15 @@ class ZoomWindow(QtWidgets.QWidget):
         self.math_reference_lines = {}  # {math_name: plot_line} for math channel references
         self.peak_max_lines = {}  # {channel_index: plot_line} for peak max lines
         self.peak_min_lines = {}  # {channel_index: plot_line} for peak min lines
-        self.persist_lines = {}  # {channel_index: [plot_line, ...]} for persist lines
+        self.persist_images = {}  # {channel_index: ImageItem} for persistence images
         self.average_persist_lines = {}  # {channel_index: plot_line} for average persist lines
 
+        # Full-resolution data of the lines that show a display-decimated version, see set_display_data()
+        self.display_data = weakref.WeakKeyDictionary()
+        self._redecimate_pending = False
+        self.plot.getViewBox().sigXRangeChanged.connect(self._schedule_redecimate)
+        self.plot.getViewBox().sigResized.connect(self._schedule_redecimate)
+
         # Create heatmap manager for this zoom window
         # We'll adjust bin counts to match main plot's bin size
         self.heatmap_manager = HeatmapManager(self.plot, self.state)
@@ -262,6 +271,31 @@ class ZoomWindow(QtWidgets.QWidget):
         self.heatmap_manager._base_heatmap_bins_x = zoom_bins_x
         self.heatmap_manager.heatmap_bins_y = zoom_bins_y
 
+    def set_display_data(self, item, x_data, y_data):
+        """Sets the part of a trace in the zoom view, decimated to a min/max pair per pixel column.
+        The full-resolution data is kept, and decimated again when the zoom region or window size changes."""
+        self.display_data[item] = (x_data, y_data)
+        view_box = self.plot.getViewBox()
+        item.setData(*minmax_decimate(x_data, y_data, view_box.viewRange()[0], int(view_box.width())),
+                     skipFiniteCheck=True)
+
+    def clear_display_data(self, item):
+        """Clears a line that was set with set_display_data()."""
+        self.display_data.pop(item, None)
+        item.clear()
+
+    def _schedule_redecimate(self, *args):
+        if not self._redecimate_pending:
+            self._redecimate_pending = True
+            QtCore.QTimer.singleShot(0, self._redecimate)
+
+    def _redecimate(self):
+        """Decimates all traces again for the current view, e.g. when the ROI is moved while stopped."""
+        self._redecimate_pending = False
+        for item, (x_data, y_data) in list(self.display_data.items()):
+            self.set_display_data(item, x_data, y_data)
+
+    @profiler.timed('zoom')
     def update_zoom_plot(self, stabilized_data, math_results=None):
         """Update the zoom plot with new data.
 
@@ -324,7 +358,7 @@ class ZoomWindow(QtWidgets.QWidget):
 
             # Show and update line data (hide if persistence is on)
             self.channel_lines[ch_idx].setVisible(not has_persistence)
-            self.channel_lines[ch_idx].setData(x=x_data, y=y_data, skipFiniteCheck=True)
+            self.set_display_data(self.channel_lines[ch_idx], x_data, y_data)
 
         # Update math channels
         if math_results:
@@ -379,13 +413,14 @@ class ZoomWindow(QtWidgets.QWidget):
                     self.math_channel_lines[math_name].setPen(pen)
 
                 # Update line data and visibility
-                self.math_channel_lines[math_name].setData(x=x_data, y=y_data, skipFiniteCheck=True)
+                self.set_display_data(self.math_channel_lines[math_name], x_data, y_data)
                 self.math_channel_lines[math_name].setVisible(is_displayed)
 
         # Remove math channel lines that no longer exist
         existing_math_names = set(math_results.keys()) if math_results else set()
         for math_name in list(self.math_channel_lines.keys()):
             if math_name not in existing_math_names:
+                self.display_data.pop(self.math_channel_lines[math_name], None)
                 self.plot.removeItem(self.math_channel_lines[math_name])
                 del self.math_channel_lines[math_name]
 
@@ -446,18 +481,9 @@ class ZoomWindow(QtWidgets.QWidget):
             # Use stored doresamp if available (for backward compatibility)
             doresamp_to_use = ref_data.get('doresamp', self.state.doresamp[ch_idx])
             if doresamp_to_use > 1:
-                from scipy.signal import resample_poly, resample
-                import numpy as np
-                if self.state.polyphase_upsampling_enabled:
-                    # Use polyphase resampling to reduce ringing artifacts
-                    y_resampled = resample_poly(y_data, doresamp_to_use, 1)
-                    # Reconstruct time axis with proper spacing to avoid time shift
-                    dt_orig = (x_data[-1] - x_data[0]) / (len(x_data) - 1)
-                    dt_new = dt_orig / doresamp_to_use
-                    x_resampled = x_data[0] + np.arange(len(y_resampled)) * dt_new
-                else:
-                    # Use FFT-based resampling
-                    y_resampled, x_resampled = resample(y_data, len(x_data) * doresamp_to_use, t=x_data)
+                # Polyphase resampling reduces ringing artifacts, FFT-based resampling is faster
+                x_resampled, y_resampled = resample_trace(x_data, y_data, doresamp_to_use,
+                                                          self.state.polyphase_upsampling_enabled)
                 self.reference_lines[ch_idx].setData(x=x_resampled, y=y_resampled, skipFiniteCheck=True)
             else:
                 self.reference_lines[ch_idx].setData(x=x_data, y=y_data, skipFiniteCheck=True)
@@ -505,18 +531,9 @@ class ZoomWindow(QtWidgets.QWidget):
             # Use stored doresamp if available (for backward compatibility and for references)
             doresamp_to_use = ref_data.get('doresamp', 1)
             if doresamp_to_use > 1:
-                from scipy.signal import resample_poly, resample
-                import numpy as np
-                if self.state.polyphase_upsampling_enabled:
-                    # Use polyphase resampling to reduce ringing artifacts
-                    y_resampled = resample_poly(y_data, doresamp_to_use, 1)
-                    # Reconstruct time axis with proper spacing to avoid time shift
-                    dt_orig = (x_data[-1] - x_data[0]) / (len(x_data) - 1)
-                    dt_new = dt_orig / doresamp_to_use
-                    x_resampled = x_data[0] + np.arange(len(y_resampled)) * dt_new
-                else:
-                    # Use FFT-based resampling
-                    y_resampled, x_resampled = resample(y_data, len(x_data) * doresamp_to_use, t=x_data)
+                # Polyphase resampling reduces ringing artifacts, FFT-based resampling is faster
+                x_resampled, y_resampled = resample_trace(x_data, y_data, doresamp_to_use,
+                                                          self.state.polyphase_upsampling_enabled)
                 self.math_reference_lines[math_name].setData(x=x_resampled, y=y_resampled, skipFiniteCheck=True)
             else:
                 self.math_reference_lines[math_name].setData(x=x_data, y=y_data, skipFiniteCheck=True)
@@ -629,7 +646,7 @@ class ZoomWindow(QtWidgets.QWidget):
                     self.peak_min_lines[ch_idx].setVisible(False)
 
     def update_persist_lines(self, main_plot_manager):
-        """Update the zoom window's persist lines, heatmaps, and average persist lines to match the main plot.
+        """Update the zoom window's persistence images, heatmaps, and average persist lines to match the main plot.
 
         Args:
             main_plot_manager: The main window's plot manager to get persist data from
@@ -640,53 +657,26 @@ class ZoomWindow(QtWidgets.QWidget):
         # Update heatmap bin counts to match main plot's bin size
         self._update_heatmap_bins()
 
-        # Clear all existing persist lines
-        for ch_idx in list(self.persist_lines.keys()):
-            for persist_line in self.persist_lines[ch_idx]:
-                self.plot.removeItem(persist_line)
-            self.persist_lines[ch_idx] = []
-
         # Clear all existing heatmaps
         for ch_idx in list(self.heatmap_manager.persist_heatmap_items.keys()):
             self.heatmap_manager.clear_channel(ch_idx)
 
-        # Add persist lines from main plot manager
+        # Show the main plot's persistence images, the zoom view just shows part of them
+        phosphor_manager = main_plot_manager.phosphor_manager
+        for ch_idx, main_image in phosphor_manager.items.items():
+            if ch_idx not in self.persist_images:
+                self.persist_images[ch_idx] = pg.ImageItem()
+                self.plot.addItem(self.persist_images[ch_idx])
+            self.persist_images[ch_idx].setVisible(main_image.isVisible())
+            if main_image.isVisible():
+                phosphor_manager.show_image(ch_idx, self.persist_images[ch_idx])
+
+        # Regenerate heatmaps from the main plot manager's persist lines
         if hasattr(main_plot_manager, 'persist_lines_per_channel'):
             for ch_idx, persist_deque in main_plot_manager.persist_lines_per_channel.items():
-                if ch_idx not in self.persist_lines:
-                    self.persist_lines[ch_idx] = []
-
                 # Convert deque to list
                 persist_list = list(persist_deque)
 
-                # Only draw the last 16 persist lines for performance (matching main plot)
-                # But use all 100 for heatmap
-                max_visible_persist = 16
-                lines_to_draw = persist_list[-max_visible_persist:] if len(persist_list) > max_visible_persist else persist_list
-
-                # Iterate through the visible persist items only
-                for item_data in lines_to_draw:
-                    # Unpack the 5-tuple format (persist_item, timestamp, line_idx, x_data, y_data)
-                    persist_item = item_data[0]
-                    x_data = item_data[3] if len(item_data) >= 4 else None
-                    y_data = item_data[4] if len(item_data) >= 5 else None
-
-                    # Fallback to getData if x_data/y_data not in tuple (backwards compatibility)
-                    if x_data is None or y_data is None:
-                        x_data, y_data = persist_item.getData()
-
-                    if x_data is not None and y_data is not None:
-                        # Get the pen from the persist item to maintain the same alpha
-                        pen = persist_item.opts['pen']
-
-                        # Create a new persist line in the zoom window with the same pen
-                        zoom_persist_line = self.plot.plot(x=x_data, y=y_data, pen=pen,
-                                                          skipFiniteCheck=True, connect="finite")
-                        # Show persist lines only if heatmap is disabled
-                        is_heatmap_enabled = self.state.persist_heatmap_enabled[ch_idx]
-                        zoom_persist_line.setVisible(persist_item.isVisible() and not is_heatmap_enabled)
-                        self.persist_lines[ch_idx].append(zoom_persist_line)
-
                 # Regenerate heatmap if enabled for this channel (uses ALL persist lines, not just 16)
                 if self.state.persist_heatmap_enabled[ch_idx]:
                     # Sync smoothing settings from main plot manager
@@ -700,12 +690,13 @@ class ZoomWindow(QtWidgets.QWidget):
             # Remove average persist lines that no longer exist in main plot
             for ch_idx in list(self.average_persist_lines.keys()):
                 if ch_idx not in main_plot_manager.average_lines:
+                    self.display_data.pop(self.average_persist_lines[ch_idx], None)
                     self.plot.removeItem(self.average_persist_lines[ch_idx])
                     del self.average_persist_lines[ch_idx]
 
             # Update or create average persist lines
             for ch_idx, avg_line in main_plot_manager.average_lines.items():
-                x_data, y_data = avg_line.getData()
+                x_data, y_data = main_plot_manager.full_data(avg_line)
                 if x_data is not None and y_data is not None and len(x_data) > 0:
                     # Get the pen from the main average line
                     pen = avg_line.opts['pen']
@@ -713,19 +704,18 @@ class ZoomWindow(QtWidgets.QWidget):
                     # Create or update the average persist line
                     if ch_idx not in self.average_persist_lines:
                         self.average_persist_lines[ch_idx] = self.plot.plot(
-                            x=x_data, y=y_data, pen=pen,
-                            skipFiniteCheck=True, connect="finite"
+                            pen=pen, skipFiniteCheck=True, connect="finite"
                         )
                     else:
-                        self.average_persist_lines[ch_idx].setData(x=x_data, y=y_data, skipFiniteCheck=True)
                         self.average_persist_lines[ch_idx].setPen(pen)
+                    self.set_display_data(self.average_persist_lines[ch_idx], x_data, y_data)
 
                     # Match visibility to main plot
                     self.average_persist_lines[ch_idx].setVisible(avg_line.isVisible())
                 else:
                     # Main plot's average line has no data - clear the zoom window's line
                     if ch_idx in self.average_persist_lines:
-                        self.average_persist_lines[ch_idx].clear()
+                        self.clear_display_data(self.average_persist_lines[ch_idx])
 
     def update_right_axis(self):
         """Update the secondary Y-axis to show voltage for the active channel."""
@@ -796,6 +786,8 @@ class ZoomWindow(QtWidgets.QWidget):
 
     def clear_channel_lines(self):
         """Clear all channel lines when channel configuration changes."""
+        self.display_data.clear()
+
         # Remove physical channel lines
         for line in self.channel_lines.values():
             self.plot.removeItem(line)
@@ -816,11 +808,10 @@ class ZoomWindow(QtWidgets.QWidget):
             self.plot.removeItem(line)
         self.math_reference_lines.clear()
 
-        # Remove persist lines
-        for persist_list in self.persist_lines.values():
-            for line in persist_list:
-                self.plot.removeItem(line)
-        self.persist_lines.clear()
+        # Remove persistence images
+        for image_item in self.persist_images.values():
+            self.plot.removeItem(image_item)
+        self.persist_images.clear()
 
         # Remove average persist lines
         for line in self.average_persist_lines.values():